@@ -39,7 +39,10 @@ from flask_cors import CORS
 import os
 
 from controller.importer.importer import *
+from controller.importer.enricher import drain_enrichment_queue
 from controller.search.search import *
+from controller.search.query_simbad import get_simbad_cache_stats
+from controller.search.refresher import get_object_refresh_stats, start_refresh_scheduler
 from astropy.coordinates import SkyCoord
 from view.web_interface import *
 from view.vis import *
@@ -176,6 +179,7 @@ def imports() -> json:
         try:
             if import_mode_in == "manual":
                 import_report(atel_num_in)  # call manual import
+                background_enrich()
             elif import_mode_in == "auto":
                 background_import()
         except ReportAlreadyExistsError as e:
@@ -208,6 +212,9 @@ def search() -> json:
         reports_list: a list of ATel reports returned by search queries.
         nodes_list: a list of report nodes for the visualisation graph.
         edges_list: a list of edges for the visualisation graph.
+        next_cursor: the cursor to request the next page of reports with, or None if this is the last page.
+        total_estimate: the estimated number of reports across all pages, or None on pages after the first.
+        degraded: whether SIMBAD was too slow to look up every object of a coordinate search, so some reports may be missing.
 
     """
 
@@ -227,6 +234,12 @@ def search() -> json:
     dec = 0.0
     radius = 10.0
     sky_coord = None
+    limit = None
+    cursor = None
+    include_body = True
+    next_cursor = None
+    total_estimate = None
+    degraded = False
 
     # retrieving json imports
     term_in = request.json.get("term", None)
@@ -236,6 +249,11 @@ def search() -> json:
     keyword_mode_in = request.json.get("keyword_mode", None)
     start_date_in = request.json.get("start_date", None)
     end_date_in = request.json.get("end_date", None)
+    # optional paging fields
+    limit_in = request.json.get("limit", None)
+    cursor_in = request.json.get("cursor", None)
+    # optional projection field, "summary" omits report bodies
+    fields_in = request.json.get("fields", None)
 
     # if any fields are missing from the JSON request, flag 0
     try:
@@ -290,6 +308,16 @@ def search() -> json:
                 flag = 2
                 message = str(e)
 
+    # parsing the page size and cursor
+    if flag == 1:
+        try:
+            limit = parse_limit(limit_in)
+            cursor = parse_cursor(cursor_in)
+            include_body = parse_fields(fields_in)
+        except ValueError as e:
+            flag = 2
+            message = str(e)
+
     # set keywords_in to None if empty
     if flag == 1:
         if keywords_in == []:
@@ -400,13 +428,19 @@ def search() -> json:
 
     # CALLING SEARCH REPORTS BY NAME AND SEARCH REPORTS BY COORDS TO GET reports OUTPUT
     if flag == 1:
+        # request one extra report to check whether there is another page
+        page_limit = None if limit == None else limit + 1
         if search_mode_in == "coords" and search_data_in == None:
             search_mode_in = "name"
         if search_mode_in == "name":
             try:
                 reports = search_reports_by_name(
-                    search_filters, date_filter, search_data_in
+                    search_filters, date_filter, search_data_in, page_limit, cursor, include_body
                 )
+                if limit != None and cursor == None:
+                    total_estimate = count_reports_by_name(
+                        search_filters, date_filter, search_data_in
+                    )
             except ValueError as e:
                 if hasattr(e, "message"):
                     msg = e.message
@@ -418,26 +452,30 @@ def search() -> json:
             try:
                 radius_float = parse_radius(radius)
                 reports = search_reports_by_coords(
-                    search_filters, date_filter, sky_coord, radius_float
+                    search_filters, date_filter, sky_coord, radius_float, page_limit, cursor, include_body
                 )
+                degraded = reports.degraded
+                if limit != None and cursor == None:
+                    total_estimate = count_reports_by_coords(
+                        search_filters, date_filter, sky_coord, radius_float
+                    )
             except ValueError as e:
                 flag = 2  # user error
                 message = str(e)
 
+    # TRIMMING THE EXTRA REPORT AND CREATING THE NEXT PAGE CURSOR
+    if flag == 1:
+        if limit == None:
+            total_estimate = len(reports)
+        elif len(reports) > limit:
+            reports = reports[:limit]
+            next_cursor = format_cursor(reports[-1])
+
     # CALLING VISUALISATION FUNCTION TO GET NODES/EDGES LIST RESULT
     if flag == 1:
         list_result = create_nodes_list(reports)
         for report in reports:
-            report_dicts.append(
-                {
-                    "atel_num": report.atel_num,
-                    "title": report.title,
-                    "authors": report.authors,
-                    "body": report.body,
-                    "submission_date": str(report.submission_date),
-                    "referenced_reports": report.referenced_reports,
-                }
-            )
+            report_dicts.append(format_report(report))
 
     # SEARCH FUNCTION RETURN
     return jsonify(
@@ -446,11 +484,42 @@ def search() -> json:
             "report_list": report_dicts,
             "node_list": list_result[0],
             "edge_list": list_result[1],
+            "next_cursor": next_cursor,
+            "total_estimate": total_estimate,
+            "degraded": degraded,
             "message": message,
         }
     )
 
 
+@app.route("/report/<int:atel_num>", methods=["GET"])
+def load_report(atel_num: int) -> json:
+    """Fetches a single stored report, including its body. Used to show
+    the full report for a result of a summary search.
+
+    Args:
+        atel_num (int): The ATel number of the report.
+
+    Returns:
+        int: flag – 1 if the report was found, 2 if it is not stored.
+        report: the report, or None if not found.
+        message: the reason the report could not be returned.
+
+    """
+
+    flag = 1
+    message = ""
+    report_dict = None
+
+    try:
+        report_dict = format_report(db.get_report(atel_num))
+    except db.ReportNotFoundError as e:
+        flag = 2
+        message = str(e)
+
+    return jsonify({"flag": flag, "report": report_dict, "message": message})
+
+
 @app.route("/metadata", methods=["GET"])
 def load_metadata() -> json:
     """To get the data associated with imports, such as the last time
@@ -473,8 +542,40 @@ def load_metadata() -> json:
     )
 
 
+@app.route("/stats", methods=["GET"])
+@jwt_required()
+def load_stats() -> json:
+    """Performance statistics for the worker process that handled the request.
+    Each gunicorn worker keeps its own statistics, so repeated calls may be
+    answered by different workers.
+
+    Returns:
+        json: JSON object containing the database connection pool, report download, enrichment queue, SIMBAD cache and object refresh statistics.
+
+    """
+
+    return jsonify(
+        {
+            "db_pool": db.get_pool_stats(),
+            "fetch": get_fetch_stats(),
+            "enrichment_queue": db.get_enrichment_queue_stats(),
+            "simbad_cache": get_simbad_cache_stats(),
+            "object_refresh": get_object_refresh_stats(),
+        }
+    )
+
+
 def background_import():
-    process = Process(target=background_import_task, daemon=True)
+    # Not a daemon, since the import starts its own processes to parse reports
+    process = Process(target=background_import_task)
+    process.start()
+
+
+def background_enrich():
+    # Looks up the objects near newly imported coordinates on SIMBAD without
+    # holding up the request. Workers claim coordinates from the queue, so this
+    # can safely run alongside a background import.
+    process = Process(target=drain_enrichment_queue, daemon=True)
     process.start()
 
 
@@ -485,6 +586,7 @@ def background_import_task():
 
         try:
             import_all_reports()
+            drain_enrichment_queue()
         finally:
             print("Releasing lock", flush=True)
             lock.release()
@@ -503,5 +605,9 @@ print("Force releasing lock", flush=True)
 lock.release(forceRelease=True)
 
 if __name__ == "__main__":
+    # Refresh stale objects in the background, as the gunicorn master does
+    # when deployed (see gunicorn.conf.py)
+    start_refresh_scheduler()
+
     # Run the application
     app.run()
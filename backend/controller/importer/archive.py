@@ -0,0 +1,159 @@
+"""
+Contains functions that store downloaded ATel pages so they can be parsed again without downloading them.
+
+Author:
+    Nathan Sutardi
+
+License Terms and Copyright:
+    Copyright (C) 2021 Nathan Sutardi
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import gzip
+import os
+import re
+import tempfile
+
+# Constants
+_ARCHIVE_DIR = os.getenv('ATEL_ARCHIVE_DIR')
+"""
+Directory holding the archived pages. Pages are not archived if this isn't set.
+Configured with the ATEL_ARCHIVE_DIR environment variable.
+"""
+
+_SHARD_SIZE = 1000
+"""
+Number of consecutive ATel numbers stored in each subdirectory of the archive, keeping directories small enough to list quickly.
+"""
+
+_PAGE_FILE_REGEX = re.compile(r'^atel(\d+)\.html\.gz$')
+"""
+Matches the file name of an archived page, capturing its ATel number.
+"""
+
+# Archive functions
+def archive_enabled(archive_dir: str = None) -> bool:
+    """
+    Checks whether downloaded pages are being archived.
+
+    Args:
+        archive_dir (str, optional): Directory of the archive, defaults to the ATEL_ARCHIVE_DIR environment variable.
+
+    Returns:
+        bool: True if an archive directory is set, False otherwise.
+    """
+
+    return (archive_dir or _ARCHIVE_DIR) is not None
+
+def save_page(atel_num: int, html, archive_dir: str = None):
+    """
+    Stores the HTML of an ATel page in the archive, replacing any previously archived copy. Does nothing if no archive directory is set.
+    The page is written to a temporary file and moved into place, so a crash never leaves a partly written page behind.
+
+    Args:
+        atel_num (int): The ATel number of the page.
+        html (str | bytes): The HTML of the page.
+        archive_dir (str, optional): Directory of the archive, defaults to the ATEL_ARCHIVE_DIR environment variable.
+
+    Raises:
+        OSError: Thrown when the page could not be written.
+    """
+
+    if(not archive_enabled(archive_dir)):
+        return
+
+    if(isinstance(html, str)):
+        html = html.encode('utf-8')
+
+    path = page_path(atel_num, archive_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(gzip.compress(html, mtime=0))
+
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def load_page(atel_num: int, archive_dir: str = None) -> bytes:
+    """
+    Retrieves the archived HTML of an ATel page.
+
+    Args:
+        atel_num (int): The ATel number of the page.
+        archive_dir (str, optional): Directory of the archive, defaults to the ATEL_ARCHIVE_DIR environment variable.
+
+    Returns:
+        bytes: The HTML of the page, or None if the page has not been archived.
+    """
+
+    if(not archive_enabled(archive_dir)):
+        return None
+
+    try:
+        with open(page_path(atel_num, archive_dir), 'rb') as f:
+            return gzip.decompress(f.read())
+    except FileNotFoundError:
+        return None
+
+def archived_atel_nums(archive_dir: str = None) -> list[int]:
+    """
+    Lists the ATel numbers of every archived page.
+
+    Args:
+        archive_dir (str, optional): Directory of the archive, defaults to the ATEL_ARCHIVE_DIR environment variable.
+
+    Returns:
+        list[int]: The archived ATel numbers in ascending order.
+    """
+
+    if(not archive_enabled(archive_dir)):
+        return []
+
+    root = archive_dir or _ARCHIVE_DIR
+    atel_nums = []
+
+    if(not os.path.isdir(root)):
+        return atel_nums
+
+    for shard in os.scandir(root):
+        if(not shard.is_dir()):
+            continue
+
+        for entry in os.scandir(shard.path):
+            match = _PAGE_FILE_REGEX.match(entry.name)
+
+            if(match is not None):
+                atel_nums.append(int(match.group(1)))
+
+    return sorted(atel_nums)
+
+def page_path(atel_num: int, archive_dir: str = None) -> str:
+    """
+    Generates the path of an archived page, eg. '<archive>/00012/atel12345.html.gz'.
+
+    Args:
+        atel_num (int): The ATel number of the page.
+        archive_dir (str, optional): Directory of the archive, defaults to the ATEL_ARCHIVE_DIR environment variable.
+
+    Returns:
+        str: Path of the archived page.
+    """
+
+    return os.path.join(archive_dir or _ARCHIVE_DIR, f'{atel_num // _SHARD_SIZE:05d}', f'atel{atel_num}.html.gz')
@@ -0,0 +1,184 @@
+"""
+Contains functions that look up the objects near the coordinates of imported ATel reports on SIMBAD, working through the enrichment queue.
+
+Author:
+    Nathan Sutardi
+
+License Terms and Copyright:
+    Copyright (C) 2021 Nathan Sutardi
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+
+from model.db.db_interface import ExistingAliasError, ExistingObjectError, add_object, object_exists, claim_enrichments, complete_enrichment, fail_enrichment
+from controller.search.query_simbad import QuerySimbadError, query_simbad_region
+from controller.search.search import check_object_updates
+
+from astropy.coordinates import SkyCoord
+
+# Constants
+_ENRICH_WORKERS = int(os.getenv('SIMBAD_ENRICH_WORKERS', 4))
+"""
+Number of threads looking up queued coordinates on SIMBAD at once.
+Configured with the SIMBAD_ENRICH_WORKERS environment variable.
+"""
+
+_ENRICH_BATCH_SIZE = 20
+"""
+Number of coordinates claimed from the enrichment queue at once.
+"""
+
+_ENRICH_LEASE_SECONDS = 600
+"""
+Seconds a claimed coordinate is hidden from other workers. A coordinate whose worker dies is tried again once its lease runs out.
+"""
+
+_ENRICH_MAX_ATTEMPTS = int(os.getenv('SIMBAD_ENRICH_MAX_ATTEMPTS', 5))
+"""
+Number of failed lookups after which a coordinate is given up on, until retry_failed_enrichments() is called.
+Configured with the SIMBAD_ENRICH_MAX_ATTEMPTS environment variable.
+"""
+
+_ENRICH_BACKOFF_SECONDS = 60.0
+"""
+Seconds until a coordinate is tried again after its first failed lookup. The delay doubles with every further failure.
+"""
+
+_ENRICH_MAX_BACKOFF_SECONDS = 6 * 60 * 60.0
+"""
+Longest delay between lookups of a failing coordinate.
+"""
+
+_RETRY_ERRORS = (QuerySimbadError, mysql.connector.Error)
+"""
+Errors that are likely to go away on their own, so the lookup is tried again later.
+"""
+
+# Enricher functions
+def enrich_coord(coord: SkyCoord):
+    """
+    Adds the objects found near a coordinate on SIMBAD, along with their aliases, into the database, or updates the aliases of objects that are already stored.
+
+    Args:
+        coord (SkyCoord): Coordinate found in the text of an ATel report.
+
+    Raises:
+        QuerySimbadError: Thrown when SIMBAD could not be reached.
+        mysql.connector.Error: Thrown when the database could not be reached.
+    """
+
+    # Queries SIMBAD by coordinate to get object IDs along with their coordinates and aliases
+    query_result = query_simbad_region(coord)
+
+    for key, coordinates, aliases in query_result:
+        # Checks whether object ID exists in the database
+        exists, last_updated = object_exists(key)
+
+        # Adds new aliases associated to the object ID into the database if object ID exist and updating is needed
+        if(exists == True):
+            check_object_updates(key, last_updated)
+            continue
+
+        # Adds object ID and its aliases into the database, unless another worker has just done so
+        try:
+            add_object(key, coordinates, aliases)
+        except (ExistingObjectError, ExistingAliasError):
+            pass
+
+def drain_enrichment_queue(workers: int = None, batch_size: int = None) -> dict:
+    """
+    Enriches every coordinate in the enrichment queue that is due, using a pool of threads.
+    Failed lookups are tried again after a delay that doubles with every failure, and are given up on once they have failed too often or failed in a way that will not go away by itself.
+    Several processes may drain the queue at once, as each coordinate is only ever claimed by one of them.
+
+    Args:
+        workers (int, optional): Number of threads looking up coordinates on SIMBAD.
+        batch_size (int, optional): Number of coordinates claimed from the queue at once.
+
+    Returns:
+        dict: The number of coordinates enriched, scheduled to be tried again and given up on, and the time taken in seconds.
+    """
+
+    workers = _ENRICH_WORKERS if workers is None else max(workers, 1)
+    batch_size = _ENRICH_BATCH_SIZE if batch_size is None else max(batch_size, 1)
+    stats = {'enriched': 0, 'retrying': 0, 'failed': 0, 'seconds': 0.0}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            claimed = claim_enrichments(batch_size, _ENRICH_LEASE_SECONDS)
+
+            if(len(claimed) == 0):
+                break
+
+            for outcome in pool.map(_enrich_claimed, claimed):
+                stats[outcome] += 1
+
+    stats['seconds'] = time.perf_counter() - start
+
+    if(sum(stats[outcome] for outcome in ('enriched', 'retrying', 'failed')) > 0):
+        print(f'Enriched {stats["enriched"]} coordinates in {stats["seconds"]:.1f}s '
+              f'({stats["retrying"]} to be retried, {stats["failed"]} failed)', flush=True)
+
+    return stats
+
+# Private functions
+def _enrich_claimed(claimed: tuple[float, float, int]) -> str:
+    """
+    Enriches a coordinate claimed from the enrichment queue and records the outcome in the queue.
+
+    Args:
+        claimed (tuple[float, float, int]): The RA and declination in degrees of the coordinate and its number of failed lookups, see claim_enrichments().
+
+    Returns:
+        str: 'enriched', 'retrying' or 'failed'.
+    """
+
+    ra, dec, attempts = claimed
+
+    try:
+        enrich_coord(SkyCoord(ra, dec, unit=('deg', 'deg')))
+    except _RETRY_ERRORS as e:
+        if(attempts + 1 >= _ENRICH_MAX_ATTEMPTS):
+            fail_enrichment(ra, dec, str(e))
+            return 'failed'
+
+        fail_enrichment(ra, dec, str(e), _backoff_seconds(attempts))
+        return 'retrying'
+    except Exception as e:
+        fail_enrichment(ra, dec, f'{type(e).__name__}: {e}')
+        return 'failed'
+
+    complete_enrichment(ra, dec)
+    return 'enriched'
+
+def _backoff_seconds(attempts: int) -> float:
+    """
+    Calculates the delay before a failing coordinate is looked up again.
+
+    Args:
+        attempts (int): Number of lookups of the coordinate that have already failed, not counting the current one.
+
+    Returns:
+        float: Seconds until the next lookup.
+    """
+
+    return min(_ENRICH_BACKOFF_SECONDS * (2 ** attempts), _ENRICH_MAX_BACKOFF_SECONDS)
@@ -21,14 +21,88 @@ License Terms and Copyright:
     along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
-from model.db.db_interface import ExistingReportError, report_exists, add_report, get_next_atel_num, set_next_atel_num
-from controller.importer.parser import MissingReportElementError, parse_report
+import multiprocessing
+import os
+import threading
+import time
 
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+from model.db.db_interface import ExistingReportError, report_exists, add_report, add_reports, get_alias_matcher, get_next_atel_num, set_next_atel_num
+from controller.importer.parser import MissingReportElementError, NonexistentReportError, PARSE_ERRORS, init_parse_process, parse_report
+from controller.importer.archive import save_page
+
+from requests import Session
+from requests.adapters import HTTPAdapter
 from requests_html import HTMLSession
-from bs4 import BeautifulSoup
 from requests.exceptions import ConnectionError, HTTPError
 from pyppeteer.errors import TimeoutError
 
+# Constants
+FETCH_MODES = ['static', 'render']
+"""
+Ways of downloading ATel pages. 'static' fetches the raw HTML with a pooled HTTP client and only renders the page when the raw HTML can't be parsed, 'render' always renders the page in headless Chromium.
+"""
+
+_FETCH_MODE = os.getenv('ATEL_FETCH_MODE', 'static')
+"""
+Fetch mode used by download_report() and import_report(), one of FETCH_MODES.
+Configured with the ATEL_FETCH_MODE environment variable.
+"""
+
+_FETCH_TIMEOUT = float(os.getenv('ATEL_FETCH_TIMEOUT', 20.0))
+"""
+Seconds to wait for an ATel page to download or render.
+Configured with the ATEL_FETCH_TIMEOUT environment variable.
+"""
+
+_ATEL_URL = os.getenv('ATEL_BASE_URL', 'https://www.astronomerstelegram.org/') + '?read={}'
+"""
+URL of an ATel page, formatted with the ATel number.
+The site can be swapped out with the ATEL_BASE_URL environment variable.
+"""
+
+_HTTP_POOL_SIZE = 10
+"""
+Number of keep-alive connections held open by each process's HTTP session.
+"""
+
+_REQUESTS_PER_SECOND = float(os.getenv('ATEL_REQUESTS_PER_SECOND', 2.0))
+"""
+Most page downloads started per second against any one host, shared by all download workers in a process. Zero disables the limit.
+Configured with the ATEL_REQUESTS_PER_SECOND environment variable.
+"""
+
+_IMPORT_WORKERS = int(os.getenv('ATEL_IMPORT_WORKERS', 4))
+"""
+Number of threads downloading reports during a bulk import, see import_all_reports().
+Configured with the ATEL_IMPORT_WORKERS environment variable.
+"""
+
+_IMPORT_PARSE_PROCESSES = int(os.getenv('ATEL_IMPORT_PARSE_PROCESSES', min(os.cpu_count() or 1, 4)))
+"""
+Number of processes parsing reports during a bulk import. Zero parses reports in threads of the importing process instead.
+Configured with the ATEL_IMPORT_PARSE_PROCESSES environment variable.
+"""
+
+_IMPORT_BATCH_SIZE = int(os.getenv('ATEL_IMPORT_BATCH_SIZE', 50))
+"""
+Number of parsed reports written to the database in one transaction during a bulk import.
+Configured with the ATEL_IMPORT_BATCH_SIZE environment variable.
+"""
+
+_IMPORT_FLUSH_SECONDS = 10.0
+"""
+Longest time parsed reports wait for a batch to fill before they are written anyway, so the checkpoint keeps moving on a slow import.
+"""
+
+# HTTP session state (one session per process, see _get_session())
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+_fetch_stats = {}
+
 # Custom exceptions
 class ReportAlreadyExistsError(Exception):
     pass
@@ -45,6 +119,41 @@ class NetworkError(Exception):
 class DownloadFailError(Exception):
     pass
 
+# Rate limiting
+class _RateLimiter:
+    """
+    Spaces out the requests made to each host so that no more than a set number are started per second.
+    Shared by all threads of a process.
+    """
+
+    def __init__(self, requests_per_second: float):
+        """
+        Args:
+            requests_per_second (float): Most requests started per second against one host, or zero for no limit.
+        """
+
+        self._interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_start = {}
+
+    def wait(self, host: str):
+        """
+        Blocks until another request may be made to the host.
+
+        Args:
+            host (str): Host name of the request.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self._interval
+
+        if(start > now):
+            time.sleep(start - now)
+
+_rate_limiter = _RateLimiter(_REQUESTS_PER_SECOND)
+
 # Importer functions
 def import_report(atel_num: int):
     """
@@ -68,12 +177,22 @@ def import_report(atel_num: int):
         # Downloads the HTML of ATel report
         html_string = download_report(atel_num)
 
-        # Raises error when ATel report is not found
-        if(html_string is None):
-            raise ReportNotFoundError(f'ATel #{str(atel_num)} does not exist')
-
-        # Parses HTML and imports ATel report into the database
-        add_report(parse_report(atel_num, html_string))
+        # Parses HTML, rendering the page when the raw HTML is incomplete
+        try:
+            report = _parse_page(atel_num, html_string)
+        except PARSE_ERRORS:
+            if(_FETCH_MODE != 'static'):
+                raise
+
+            _count_fetch_stat('render_fallbacks')
+            html_string = download_report(atel_num, 'render')
+            report = _parse_page(atel_num, html_string)
+
+        # Imports ATel report into the database
+        add_report(report)
+    # Raises error when ATel report is not found
+    except NonexistentReportError:
+        raise ReportNotFoundError(f'ATel #{str(atel_num)} does not exist')
     # Raises error when ATel report import fails due to download issues
     except NetworkError as err:
         raise ImportFailError(f'Importing ATel #{str(atel_num)} failed: {str(err)}')
@@ -83,70 +202,395 @@ def import_report(atel_num: int):
     except ExistingReportError:
         raise ReportAlreadyExistsError(f'ATel #{str(atel_num)} already exists in the database')
 
-def import_all_reports():
+def import_all_reports(workers: int = None, parse_processes: int = None, batch_size: int = None):
     """
     Adds all new ATel reports into the database starting after the last ATel report imported.
+    Reports are downloaded by a pool of threads, parsed by a pool of processes and written to the database in batches by the calling thread.
+    The number of the next ATel report to import is only moved past reports that have been fully handled, so an interrupted import resumes without skipping any report.
+
+    Args:
+        workers (int, optional): Number of download threads, defaults to the ATEL_IMPORT_WORKERS environment variable.
+        parse_processes (int, optional): Number of parsing processes, or zero to parse in threads. Defaults to the ATEL_IMPORT_PARSE_PROCESSES environment variable.
+        batch_size (int, optional): Number of reports written to the database at once, defaults to the ATEL_IMPORT_BATCH_SIZE environment variable.
     """
 
+    workers = _IMPORT_WORKERS if workers is None else max(workers, 1)
+    parse_processes = _IMPORT_PARSE_PROCESSES if parse_processes is None else parse_processes
+    batch_size = _IMPORT_BATCH_SIZE if batch_size is None else max(batch_size, 1)
+
+    # Downloads run at most this far ahead of the oldest report still being handled
+    window = batch_size + workers * 4
+
     # Retrieves the number of ATel report to import next
-    atel_num = get_next_atel_num()
+    checkpoint = get_next_atel_num()
+    saved_checkpoint = checkpoint
+    next_atel_num = checkpoint
+    end_atel_num = None
+    network_failure = False
+
+    finished = set()
+    rendered = set()
+    batch = []
+    downloads = {}
+    parses = {}
+
+    imported = 0
+    start = time.perf_counter()
+    last_flush = start
+
+    download_pool = ThreadPoolExecutor(max_workers=workers)
+
+    if(parse_processes > 0):
+        # Parsing processes are spawned rather than forked, as a fork taken while the download threads hold a lock would inherit it held.
+        # They are given this process's alias matcher, so they don't each open their own database connections to load it.
+        parse_pool = ProcessPoolExecutor(max_workers=parse_processes, mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=init_parse_process, initargs=(get_alias_matcher(),))
+    else:
+        parse_pool = ThreadPoolExecutor(max_workers=workers)
 
-    # Imports every new ATel report into the database
     try:
         while True:
-            try:
-                import_report(atel_num)
-                print(f'ATel #{atel_num} successfully imported', flush=True)
-            except ReportAlreadyExistsError:
-                print(f'ATel #{atel_num} already imported into the database', flush=True)
-            except MissingReportElementError:
-                print(f'ATel #{atel_num} could not be imported due to it missing important data', flush=True)
-
-            atel_num = atel_num + 1
+            # Keeps every download worker busy until the last ATel report is found
+            while(end_atel_num is None and next_atel_num < checkpoint + window and len(downloads) < workers):
+                downloads[download_pool.submit(_download_new_report, next_atel_num)] = next_atel_num
+                next_atel_num = next_atel_num + 1
+
+            if(len(downloads) == 0 and len(parses) == 0 and len(batch) == 0):
+                break
+
+            if(len(downloads) > 0 or len(parses) > 0):
+                done, _ = wait(list(downloads) + list(parses), timeout=_IMPORT_FLUSH_SECONDS, return_when=FIRST_COMPLETED)
+            else:
+                done = set()
+
+            for future in done:
+                # Handles a downloaded report by passing it to the parsers
+                if(future in downloads):
+                    atel_num = downloads.pop(future)
+
+                    if(end_atel_num is not None and atel_num >= end_atel_num):
+                        continue
+
+                    try:
+                        html_string = future.result()
+                    except ReportAlreadyExistsError:
+                        print(f'ATel #{atel_num} already imported into the database', flush=True)
+                        finished.add(atel_num)
+                        continue
+                    except (NetworkError, DownloadFailError) as err:
+                        print(f'Importing ATel #{atel_num} failed: {str(err)}', flush=True)
+                        html_string = None
+                        network_failure = True
+
+                    if(html_string is None):
+                        end_atel_num = atel_num if end_atel_num is None else min(end_atel_num, atel_num)
+                    else:
+                        parses[parse_pool.submit(_parse_page, atel_num, html_string)] = atel_num
+
+                    continue
+
+                # Handles a parsed report by queueing it for the database writer
+                atel_num = parses.pop(future)
+
+                if(end_atel_num is not None and atel_num >= end_atel_num):
+                    continue
+
+                try:
+                    batch.append(future.result())
+                except NonexistentReportError:
+                    end_atel_num = atel_num if end_atel_num is None else min(end_atel_num, atel_num)
+                    continue
+                except PARSE_ERRORS:
+                    if(_FETCH_MODE != 'static' or atel_num in rendered):
+                        print(f'ATel #{atel_num} could not be imported due to it missing important data', flush=True)
+                        finished.add(atel_num)
+                        continue
+
+                    # Renders the page in this thread, since Chromium can only be launched from the main thread
+                    rendered.add(atel_num)
+                    _count_fetch_stat('render_fallbacks')
+
+                    try:
+                        html_string = download_report(atel_num, 'render')
+                    except (NetworkError, DownloadFailError) as err:
+                        print(f'Importing ATel #{atel_num} failed: {str(err)}', flush=True)
+                        html_string = None
+                        network_failure = True
+
+                    if(html_string is None):
+                        end_atel_num = atel_num if end_atel_num is None else min(end_atel_num, atel_num)
+                    else:
+                        parses[parse_pool.submit(_parse_page, atel_num, html_string)] = atel_num
+
+            # Writes parsed reports once the batch is full, has waited long enough or nothing else is in progress
+            idle = len(downloads) == 0 and len(parses) == 0
+
+            if(len(batch) > 0 and (len(batch) >= batch_size or idle or time.perf_counter() - last_flush >= _IMPORT_FLUSH_SECONDS)):
+                if(end_atel_num is not None):
+                    batch = [report for report in batch if report.atel_num < end_atel_num]
+
+                added = set(_write_reports(batch))
+                imported = imported + len(added)
+
+                for report in batch:
+                    if(report.atel_num in added):
+                        print(f'ATel #{report.atel_num} successfully imported', flush=True)
+                    else:
+                        print(f'ATel #{report.atel_num} already imported into the database', flush=True)
+
+                    finished.add(report.atel_num)
+
+                batch = []
+                last_flush = time.perf_counter()
+
+            # Moves the checkpoint past every report that has been fully handled
+            while(checkpoint in finished):
+                finished.remove(checkpoint)
+                checkpoint = checkpoint + 1
+
             # Updates the number of ATel report to import next
-            set_next_atel_num(atel_num)
-    except ReportNotFoundError:
-        print('Importing completed', flush=True)
-    except ImportFailError:
+            if(checkpoint != saved_checkpoint):
+                set_next_atel_num(checkpoint)
+                saved_checkpoint = checkpoint
+    finally:
+        download_pool.shutdown(wait=True, cancel_futures=True)
+        parse_pool.shutdown(wait=True, cancel_futures=True)
+
+    if(network_failure):
         print('Importing stopped due to a network issue', flush=True)
+    else:
+        print('Importing completed', flush=True)
+
+    elapsed = time.perf_counter() - start
+    print(f'Imported {imported} reports in {elapsed:.1f}s ({imported / elapsed if elapsed > 0 else 0.0:.2f} reports/s)', flush=True)
+    print(f'Download statistics: {get_fetch_stats()}', flush=True)
 
-def download_report(atel_num: int) -> str:
+def download_report(atel_num: int, mode: str = None) -> bytes:
     """
     Downloads the HTML of ATel report.
 
     Args:
         atel_num (int): The ATel number of the report to be downloaded.
+        mode (str, optional): One of FETCH_MODES, defaults to the mode set by the ATEL_FETCH_MODE environment variable.
 
     Returns:
-        str: String representation of the downloaded HTML.
+        bytes: The downloaded HTML, undecoded. Whether the ATel report exists is found out when the HTML is parsed, see parse_report().
 
     Raises:
         NetworkError: Thrown when network failure occurs during the HTML download.
         DownloadFailError: Thrown when the HTML could not be downloaded.
+        ValueError: Thrown when the fetch mode is not one of FETCH_MODES.
     """
 
-    session = None
+    if(mode is None):
+        mode = _FETCH_MODE
+
+    if(mode not in FETCH_MODES):
+        raise ValueError(f'Unknown fetch mode \'{mode}\'')
+
+    # Generates the URL of ATel page
+    url = _ATEL_URL.format(atel_num)
+
+    # Waits for a turn to contact the ATel website
+    _rate_limiter.wait(urlparse(url).netloc)
+    start = time.perf_counter()
 
     try:
-        # Generates the URL of ATel page
-        url = f'https://www.astronomerstelegram.org/?read={atel_num}'
+        # Downloads the HTML of ATel page
+        if(mode == 'render'):
+            html = _fetch_rendered(url)
+        else:
+            html = _fetch_static(url)
+
+        _record_fetch(mode, time.perf_counter() - start, True)
+    except Exception:
+        _record_fetch(mode, time.perf_counter() - start, False)
+        raise
+
+    return html
+
+def get_fetch_stats() -> dict:
+    """
+    Retrieves download timings for the current process, grouped by fetch mode.
+
+    Returns:
+        dict: The process ID, the configured fetch mode, the number of static pages that had to be rendered, and for each mode the number of downloads and failures along with the total, mean and longest download time in seconds.
+    """
+
+    _get_session()
+
+    with _session_lock:
+        stats = {mode: dict(_fetch_stats[mode]) for mode in FETCH_MODES}
+        stats['render_fallbacks'] = _fetch_stats['render_fallbacks']
+
+    for mode in FETCH_MODES:
+        count = stats[mode]['count']
+        stats[mode]['mean_seconds'] = stats[mode]['total_seconds'] / count if count > 0 else 0.0
 
+    stats['pid'] = _session_pid
+    stats['mode'] = _FETCH_MODE
+
+    return stats
+
+# Private functions
+def _download_new_report(atel_num: int) -> bytes:
+    """
+    Downloads the HTML of ATel report if it has not been imported yet.
+
+    Args:
+        atel_num (int): The ATel number of the report to be downloaded.
+
+    Returns:
+        bytes: The downloaded HTML, undecoded.
+
+    Raises:
+        ReportAlreadyExistsError: Thrown when report with the ATel number has been added into the database previously.
+        NetworkError: Thrown when network failure occurs during the HTML download.
+        DownloadFailError: Thrown when the HTML could not be downloaded.
+    """
+
+    if(report_exists(atel_num) == True):
+        raise ReportAlreadyExistsError(f'ATel #{str(atel_num)} already exists in the database')
+
+    return download_report(atel_num)
+
+def _parse_page(atel_num: int, html_string: str):
+    """
+    Parses a downloaded ATel page and keeps it in the local archive. Runs in the parsing processes during a bulk import.
+    Pages that can't be parsed are archived too, so they can be parsed again later, but pages of reports that don't exist are not.
+
+    Args:
+        atel_num (int): The ATel number of the page.
+        html_string (bytes): The downloaded HTML.
+
+    Returns:
+        ImportedReport: Object containing all extracted data from the ATel report.
+
+    Raises:
+        NonexistentReportError: Thrown when the page says that there is no ATel report with the ATel number.
+        MissingReportElementError: Thrown when important data could not be extracted or are missing from the ATel report.
+    """
+
+    try:
+        report = parse_report(atel_num, html_string)
+    except PARSE_ERRORS:
+        _archive_page(atel_num, html_string)
+        raise
+
+    _archive_page(atel_num, html_string)
+
+    return report
+
+def _archive_page(atel_num: int, html_string: str):
+    """
+    Keeps a downloaded page in the local archive so it can be parsed again later without downloading it. A page that can't be archived doesn't stop the import.
+
+    Args:
+        atel_num (int): The ATel number of the page.
+        html_string (bytes): The downloaded HTML.
+    """
+
+    try:
+        save_page(atel_num, html_string)
+    except OSError as err:
+        print(f'ATel #{atel_num} could not be archived: {str(err)}', flush=True)
+
+def _write_reports(reports: list) -> list[int]:
+    """
+    Adds a batch of parsed ATel reports into the database.
+
+    Args:
+        reports (list[ImportedReport]): The reports to be added.
+
+    Returns:
+        list[int]: The ATel numbers of the reports that were added, leaving out those that had already been imported.
+    """
+
+    try:
+        return add_reports(reports)
+    except ExistingReportError:
+        # Another import added one of the reports while the batch was being written, so the batch is written again without it
+        return add_reports(reports)
+
+def _get_session() -> Session:
+    """
+    Returns the pooled HTTP session for the current process, creating it if needed.
+    A new session is created whenever the process ID changes, so the background import process does not share sockets with the gunicorn worker that started it.
+
+    Returns:
+        Session: The HTTP session for the current process.
+    """
+
+    global _session, _session_pid, _fetch_stats
+
+    pid = os.getpid()
+    with _session_lock:
+        if(_session is None or _session_pid != pid):
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_HTTP_POOL_SIZE)
+            _session = Session()
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+            _session_pid = pid
+            _fetch_stats = {mode: {'count': 0, 'failures': 0, 'total_seconds': 0.0, 'max_seconds': 0.0} for mode in FETCH_MODES}
+            _fetch_stats['render_fallbacks'] = 0
+
+    return _session
+
+def _fetch_static(url: str) -> bytes:
+    """
+    Downloads the raw HTML of a page without running any of its scripts.
+
+    Args:
+        url (str): URL of the page.
+
+    Returns:
+        bytes: The raw HTML of the page.
+
+    Raises:
+        NetworkError: Thrown when network failure occurs during the HTML download.
+        DownloadFailError: Thrown when the HTML could not be downloaded.
+    """
+
+    try:
+        response = _get_session().get(url, timeout=_FETCH_TIMEOUT)
+        response.raise_for_status()
+
+        return response.content
+    # Raises error when a network failure is encountered
+    except ConnectionError as err:
+        raise NetworkError(f'Network failure encountered: {str(err)}')
+    except HTTPError as err:
+        raise NetworkError(f'Network failure encountered: {str(err)}')
+    # Raises error when downloading fails
+    except Exception as err:
+        raise DownloadFailError(f'Couldn\'t download HTML: {str(err)}')
+
+def _fetch_rendered(url: str) -> bytes:
+    """
+    Downloads a page and fully loads it in headless Chromium.
+
+    Args:
+        url (str): URL of the page.
+
+    Returns:
+        bytes: The HTML of the page after it has been rendered.
+
+    Raises:
+        NetworkError: Thrown when network failure occurs during the HTML download.
+        DownloadFailError: Thrown when the HTML could not be downloaded.
+    """
+
+    session = None
+
+    try:
         # Makes a GET request to ATel page
         session = HTMLSession()
         request = session.get(url)
 
         # Fully loads the HTML of ATel page
-        request.html.render(timeout=20)
-        html = request.html.raw_html
-
-        # Determines whether ATel report exists
-        soup = BeautifulSoup(html, 'html.parser')
-        texts = soup.find_all('p', {'class': None, 'align': None})
+        request.html.render(timeout=_FETCH_TIMEOUT)
 
-        if(texts[1].get_text(strip=True) == 'This ATel does not appear to exist.'):
-            html = None
-
-        return html
+        return request.html.raw_html
     # Raises error when a network failure is encountered
     except ConnectionError as err:
         raise NetworkError(f'Network failure encountered: {str(err)}')
@@ -159,4 +603,39 @@ def download_report(atel_num: int) -> str:
         raise DownloadFailError(f'Couldn\'t download HTML: {str(err)}')
     finally:
         # Closes connection
-        session.close()
\ No newline at end of file
+        if(session is not None):
+            session.close()
+
+def _record_fetch(mode: str, seconds: float, succeeded: bool):
+    """
+    Adds a download to the current process's timing statistics.
+
+    Args:
+        mode (str): Fetch mode used for the download.
+        seconds (float): Time taken by the download.
+        succeeded (bool): Whether the download succeeded.
+    """
+
+    _get_session()
+
+    with _session_lock:
+        stats = _fetch_stats[mode]
+        stats['count'] += 1
+        stats['total_seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+
+        if(not succeeded):
+            stats['failures'] += 1
+
+def _count_fetch_stat(stat: str):
+    """
+    Increments one of the current process's download counters.
+
+    Args:
+        stat (str): Name of the counter to increment.
+    """
+
+    _get_session()
+
+    with _session_lock:
+        _fetch_stats[stat] += 1
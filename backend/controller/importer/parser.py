@@ -21,15 +21,20 @@ License Terms and Copyright:
     along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
+import math
+import os
 import re
 
 from model.constants import FIXED_KEYWORDS
 from model.ds.report_types import ImportedReport
-from model.db.db_interface import object_exists, add_object, get_all_aliases
-from controller.search.query_simbad import query_simbad_by_coords, query_simbad_by_name
-from controller.search.search import check_object_updates
+from model.ds.alias_matcher import AliasMatcher
+from model.db.db_interface import get_alias_matcher, set_alias_matcher, set_pool_size
+
+import numpy as np
 
 from bs4 import BeautifulSoup
+from bs4.dammit import UnicodeDammit
+from lxml import etree
 from datetime import datetime
 from astropy.coordinates import SkyCoord
 from astropy.time import Time
@@ -150,90 +155,231 @@ KEYWORD_REGEXES = ['radios?',
                   'comments?'
 ]
 
-# Custom exception
+# Extraction patterns, compiled once when the module is loaded
+_COORD_PATTERNS = [(re.compile(rf'[^a-z]{regex}[^\d|^a-z]'), re.compile(regex)) for regex in COORD_REGEXES]
+"""
+Pairs of patterns for each of COORD_REGEXES, the first finding coordinates along with a character either side and the second removing those characters.
+"""
+
+_COORD_FORMAT_PATTERNS = [(re.compile(f'[r]\.?\s*[a]\.?\s*(?:\([j]?2000\))?\s*[,:=]?\s*\(?{ra_format}'),
+                           re.compile(f'[d][e][c][l]?\.?\s*(?:\([j]?2000\))?\s*[,:=]?\s*\(?{dec_format}'),
+                           re.compile(ra_format),
+                           re.compile(dec_format)) for ra_format, dec_format in COORD_FORMATS]
+"""
+Patterns for each of COORD_FORMATS, the first two finding the RA and DEC of a coordinate along with their labels and the last two removing the labels.
+"""
+
+_COORD_FORMAT_UNITS = [('hourangle', 'deg'), ('deg', 'deg')]
+"""
+Units of the RA and DEC of coordinates in each of COORD_FORMATS.
+"""
+
+_COORD_VALUE_REGEX = re.compile(r'\d+')
+"""
+Finds the hours or degrees, minutes and seconds of an RA or DEC in HMS/DMS format.
+"""
+
+_COORD_DECIMAL_REGEX = re.compile(r'\.\d+')
+"""
+Finds the fraction of a second of an RA or DEC in HMS/DMS format.
+"""
+
+_DATE_PATTERNS = [(re.compile(rf'[^\d|^a-z|^:]{regex}[^\d|^:]'), re.compile(regex)) for regex in DATE_REGEXES]
+"""
+Pairs of patterns for each of DATE_REGEXES, the first finding dates along with a character either side and the second removing those characters.
+"""
+
+_KEYWORD_SCAN_REGEX = re.compile('(?<=[^a-z])(?=(?:' + '|'.join(f'(?:{regex})' for regex in KEYWORD_REGEXES) + ')[^a-z])')
+"""
+Finds every position in the text where at least one of KEYWORD_REGEXES starts, without consuming any text so keywords that overlap are all found.
+"""
+
+def _compile_keyword_patterns() -> dict[str, list[tuple[int, re.Pattern]]]:
+    """
+    Compiles a pattern for each of KEYWORD_REGEXES, used to tell which keywords start at a position found by _KEYWORD_SCAN_REGEX.
+
+    Returns:
+        dict[str, list[tuple[int, re.Pattern]]]: The index and pattern of each keyword, grouped by the literal character the keyword starts with, or under '' for keywords that don't start with one.
+    """
+
+    patterns = {}
+
+    for i in range(len(KEYWORD_REGEXES)):
+        keyword = KEYWORD_REGEXES[i]
+        first_char = ''
+
+        if((keyword[0].isalnum() or keyword[0] in '> ') and (keyword[1:2] not in ('?', '*', '+', '{'))):
+            first_char = keyword[0]
+
+        patterns.setdefault(first_char, []).append((i, re.compile(f'(?:{keyword})(?=[^a-z])')))
+
+    return patterns
+
+_KEYWORD_PATTERNS = _compile_keyword_patterns()
+
+_DATE_FULL_PATTERNS = [re.compile(regex) for regex in DATE_REGEXES]
+"""
+Patterns for each of DATE_REGEXES, used to tell which formats an extracted date could be in.
+"""
+
+_DATE_FIELD_ORDERS = ['dmy', 'dmy', 'mdy', 'dmy', 'dmy', 'dmy', 'ymd', 'mdy', 'dmy', 'ymd']
+"""
+Order of the day, month and year in dates matching each of the first ten DATE_REGEXES, which are parsed with the matching DATE_FORMATS.
+"""
+
+_DATE_FIELD_REGEX = re.compile(r'[a-z]+|\d+')
+"""
+Splits a date into its day, month and year.
+"""
+
+_MONTHS = {'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6, 'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
+           'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12}
+"""
+Month numbers of the month names and abbreviations matched by DATE_REGEXES.
+"""
+
+_MJD_EPOCH_ORDINAL = datetime(1858, 11, 17).toordinal()
+"""
+Proleptic Gregorian ordinal of MJD 0.
+"""
+
+_MJD_ORDINAL_RANGE = (datetime(1000, 1, 1).toordinal(), datetime(2999, 12, 31).toordinal())
+"""
+Dates converted from MJD and JD with plain arithmetic. Others are converted with astropy, as its ISO dates outside these years aren't matched as expected.
+"""
+
+_MJD_ROUNDING_MARGIN = 1e-6
+"""
+Fractions of a day this close to midnight are converted with astropy, which rounds times to the nearest millisecond and may move them to the next day.
+"""
+
+PARSE_BACKENDS = ['lxml', 'soup']
+"""
+Ways of parsing the HTML of ATel pages. 'lxml' builds the tree with lxml and finds every part of the report in a single pass over it, 'soup' searches a BeautifulSoup tree built by Python's html.parser for each part in turn.
+"""
+
+_PARSE_BACKEND = os.getenv('ATEL_PARSE_BACKEND', 'lxml')
+"""
+Parsing backend used by parse_report(), one of PARSE_BACKENDS.
+Configured with the ATEL_PARSE_BACKEND environment variable.
+"""
+
+_NONEXISTENT_REPORT_TEXT = 'This ATel does not appear to exist.'
+"""
+Text of the second plain paragraph of the page shown for an ATel number that hasn't been used yet.
+"""
+
+_HIDDEN_TEXT_TAGS = {'script', 'style', 'template'}
+"""
+Elements whose text BeautifulSoup leaves out of get_text(), which are removed from lxml trees to match.
+"""
+
+_CARRIAGE_RETURN_PLACEHOLDER = '\ue000'
+"""
+Stands in for carriage returns while a page is parsed by lxml, which would otherwise turn them into line feeds where html.parser keeps them.
+"""
+
+# Custom exceptions
 class MissingReportElementError(Exception):
     pass
 
+class NonexistentReportError(Exception):
+    pass
+
+PARSE_ERRORS = (MissingReportElementError, AttributeError, IndexError)
+"""
+Errors raised by parse_report() when a page is incomplete or is laid out differently to an ATel report.
+"""
+
 # Parser functions
-def parse_report(atel_num: int, html_string: str) -> ImportedReport:
+def init_parse_process(alias_matcher: AliasMatcher):
+    """
+    Prepares a parsing process started by a bulk import or reparse, passed as the initializer of its process pool.
+    The process finds aliases with the matcher loaded by the process that started it, so it never connects to the database to load its own.
+
+    Args:
+        alias_matcher (AliasMatcher): The matcher loaded by the starting process, see get_alias_matcher().
+    """
+    # Holds a single connection should the process ever need one
+    set_pool_size(1)
+    set_alias_matcher(alias_matcher)
+
+def parse_report(atel_num: int, html_string: str, backend: str = None) -> ImportedReport:
     """
     Extracts data from ATel report as stated in non-functional requirement 1 in the SRS.
 
     Args:
         atel_num (int): The ATel number of the report to be parsed.
-        html_string (str): String representation of the downloaded HTML of ATel report from which to extract data from.
+        html_string (str | bytes): String representation of the downloaded HTML of ATel report from which to extract data from.
+        backend (str, optional): One of PARSE_BACKENDS, defaults to the backend set by the ATEL_PARSE_BACKEND environment variable.
 
     Returns:
         ImportedReport: Object containing all extracted data from the ATel report.
 
     Raises:
+        NonexistentReportError: Thrown when the page says that there is no ATel report with the ATel number.
         MissingReportElementError: Thrown when important data could not be extracted or are missing from the ATel report.
+        ValueError: Thrown when the backend is not one of PARSE_BACKENDS.
     """
 
-    # Parses HTML into a tree
-    soup = BeautifulSoup(html_string, 'html.parser')
+    if(backend is None):
+        backend = _PARSE_BACKEND
 
-    # Extracts title of ATel report
-    title = ''
+    if(backend not in PARSE_BACKENDS):
+        raise ValueError(f'Unknown parse backend \'{backend}\'')
 
-    if(soup.find('h1', {'class': 'title'}) is not None):
-        title = str(soup.find('h1', {'class': 'title'}).get_text(strip=True))
+    # Finds the parts of the page that data is extracted from
+    if(backend == 'lxml'):
+        page = _read_page_by_lxml(html_string)
     else:
-        raise MissingReportElementError(f'Title is missing in ATel #{str(atel_num)}')
+        page = _read_page_by_soup(html_string)
 
-    if(title == ''):
+    # Raises error when the page is the placeholder shown for unused ATel numbers
+    if(page['nonexistent']):
+        raise NonexistentReportError(f'ATel #{str(atel_num)} does not exist')
+
+    # Extracts title of ATel report
+    title = page['title']
+
+    if(title is None or title == ''):
         raise MissingReportElementError(f'Title is missing in ATel #{str(atel_num)}')
-    
-    # Extracts authors of ATel report
-    authors = ''
 
-    if(soup.find('strong') is not None):
-        authors = str(soup.find('strong').get_text(strip=True))
-    else:
-        raise MissingReportElementError(f'Authors section is missing in ATel #{str(atel_num)}')
+    # Extracts authors of ATel report
+    authors = page['authors']
 
-    if(authors == ''):
+    if(authors is None or authors == ''):
         raise MissingReportElementError(f'Authors section is missing in ATel #{str(atel_num)}')
 
     # Extracts submission date of ATel report
-    elements = soup.find_all('strong')
-    submission_date = elements[1].get_text(strip=True)
+    submission_date = page['submission_date']
 
     # Formats submission date
     formatted_submission_date = None
 
     try:
         formatted_submission_date = datetime.strptime(submission_date, '%d %b %Y; %H:%M UT')
-    except ValueError:
+    except (TypeError, ValueError):
         raise MissingReportElementError(f'Submission date is missing in ATel #{str(atel_num)}')
 
     # Extracts subjects for keywords extractor
-    subjects = ''
-
-    if(soup.find('p', {'class': 'subjects'}) is not None):
-        subjects = soup.find('p', {'class': 'subjects'}).get_text()
+    subjects = page['subjects']
 
     # Extracts referenced by text
-    referenced_by_text = ''
+    referenced_by_text = page['referenced_by_text']
 
-    if(soup.find('div', {'id': 'references'}) is not None):
-        referenced_by_text = soup.find('div', {'id': 'references'}).get_text()
+    if(not page['telegram']):
+        raise MissingReportElementError(f'Body section is missing in ATel #{str(atel_num)}')
 
     # Extracts the body of ATel report
     body = ''
-    div_element = soup.find('div', {'id': 'telegram'})
-    
-    for i in range(len(BODY_TAGS)):
-        # Extracts the body of ATel report using a tag
-        body_tag = BODY_TAGS[i]
-        texts = div_element.find_all(body_tag[0], body_tag[1])
 
+    for texts in page['body_texts']:
         # Formats the body text
-        for text in texts:
-            if((text.find('iframe') == None) and (len(text.get_text(strip=True)) != 0) and ('Referred to by ATel #:' not in text.get_text(strip=True))):
-                string = str(text.get_text()).replace('\n', ' ').strip()
+        for has_iframe, stripped_text, text in texts:
+            if((not has_iframe) and (len(stripped_text) != 0) and ('Referred to by ATel #:' not in stripped_text)):
+                string = text.replace('\n', ' ').strip()
                 body = f'{body}{string}\n\n'
-            
+
         body = re.sub(' +', ' ', body.strip())
 
         if(body != ''):
@@ -241,13 +387,15 @@ def parse_report(atel_num: int, html_string: str) -> ImportedReport:
 
     # Extracts all texts in the ATel report if the body text is still empty
     if(body == ''):
-        body = str(div_element.get_text())
+        body = page['telegram_text']
 
         # Filters out non-body texts
         body = body.replace('[ Previous | Next | ADS ]', '').replace(title, '').replace('Image available here', '').replace(subjects, '').replace(f'ATel #{atel_num};  {authors}', '').replace(f'ATel #{atel_num}; ', '').replace(authors, '').replace(f'on {submission_date}', '').replace(referenced_by_text, '')
 
-        em_element = soup.find_all('em')
-        body = body.replace(em_element[1].get_text(), '')
+        if(page['em_text'] is None):
+            raise MissingReportElementError(f'Body section is missing in ATel #{str(atel_num)}')
+
+        body = body.replace(page['em_text'], '')
 
         # Formats the body text
         body = body.replace('\n', ' ').strip()
@@ -258,7 +406,7 @@ def parse_report(atel_num: int, html_string: str) -> ImportedReport:
         if(body[:5] == 'Tweet'):
             body = body[5:]
             body = body.strip()
-    
+
     if(body == ''):
         raise MissingReportElementError(f'Body section is missing in ATel #{str(atel_num)}')
 
@@ -273,12 +421,11 @@ def parse_report(atel_num: int, html_string: str) -> ImportedReport:
     # Extracts any links that are in the ATel report
     referenced_reports = []
     url_string = 'https://www.astronomerstelegram.org/?read='
-    links = div_element.find_all('a', href=True)
 
     # Extracts the number of any ATel reports referenced
-    for link in links:
-        if((link['href'].find(url_string) != -1) and (link['href'] != url_string) and (link.get_text() != 'Previous') and (link.get_text() != 'Next')):
-            num = re.search('\d+', link['href'])
+    for href, link_text in page['links']:
+        if((href.find(url_string) != -1) and (href != url_string) and (link_text != 'Previous') and (link_text != 'Next')):
+            num = re.search('\d+', href)
 
             if(num is not None):
                 referenced_reports.append(int(num.group()))
@@ -306,17 +453,16 @@ def extract_coords(text: str) -> list[str]:
 
     coords = []
 
+    lowered = f' {text.lower()} '
+
     # Finds all coordinates that are in the above coordinate formats in the text of ATel report
-    for regex in COORD_REGEXES:
+    for coord_regex, extract_regex in _COORD_PATTERNS:
         # Attempts to find all coordinates that are in a certain coordinate format in the text using regex
-        coord_regex = re.compile(f'[^a-z]{regex}[^\d|^a-z]')
-        coords_found = coord_regex.findall(f' {text.lower()} ')
+        coords_found = coord_regex.findall(lowered)
 
         # Removes any leading and/or trailing characters that are not part of the coordinate format
         for coord in coords_found:
-            coord_regex = re.compile(regex)
-            extracted_coord = coord_regex.search(coord)
-            coords.append(extracted_coord.group())
+            coords.append(extract_regex.search(coord).group())
 
     return list(dict.fromkeys(coords))
 
@@ -331,119 +477,64 @@ def parse_coords(coords: list[str]) -> list[SkyCoord]:
         list[SkyCoord]: List of formatted coordinates.
     """
 
-    formatted_coords = []
+    # RA and DEC of the coordinates in each of COORD_FORMATS, converted to SkyCoord objects together below
+    values = [([], []) for _ in COORD_FORMATS]
+
+    # Format and position within values of each parsed coordinate, or the SkyCoord object of a coordinate converted on its own
+    parsed = []
 
-    # Converts each extracted coordinate to SkyCoord object
     for coord in coords:
-        for i in range(len(COORD_FORMATS)):
-            coord_format = COORD_FORMATS[i]
+        for i in range(len(_COORD_FORMAT_PATTERNS)):
+            ra_label_regex, dec_label_regex, ra_regex, dec_regex = _COORD_FORMAT_PATTERNS[i]
 
             # Attempts to extract RA and DEC in a certain coordinate format
-            ra_regex = re.compile(f'[r]\.?\s*[a]\.?\s*(?:\([j]?2000\))?\s*[,:=]?\s*\(?{coord_format[0]}')
-            dec_regex = re.compile(f'[d][e][c][l]?\.?\s*(?:\([j]?2000\))?\s*[,:=]?\s*\(?{coord_format[1]}')
-
-            ra_found = ra_regex.search(coord)
-            dec_found = dec_regex.search(coord)
+            ra_found = ra_label_regex.search(coord)
+            dec_found = dec_label_regex.search(coord)
 
             # Extracts coordinates if they are in the coordinate format
             if((ra_found is not None) and (dec_found is not None)):
-                ra_regex = re.compile(coord_format[0])
-                dec_regex = re.compile(coord_format[1])
-
                 try:
-                    skycoord_obj = None
-                    
                     # HMS/DMS
                     if(i == 0):
-                        ra = ra_regex.search(ra_found.group())
-                        dec = dec_regex.search(dec_found.group())
-
-                        # Stores + and - if there is any for concatenation
-                        ra_sign = ''
-                        dec_sign = ''
-
-                        # Determines the sign of RA
-                        if(ra.group()[0] == '+'):
-                            ra_sign = '+'
-                        elif(ra.group()[0] == '-'):
-                            ra_sign = '-'
-
-                        # Determines the sign of DEC
-                        if(dec.group()[0] == '+'):
-                            dec_sign = '+'
-                        elif(dec.group()[0] == '-'):
-                            dec_sign = '-'
-
-                        value_regex = re.compile(f'\d+')
-                        decimal_regex = re.compile(f'\.\d+')
-
-                        # Parses values of RA
-                        ra_values_found = value_regex.findall(ra.group())
-                        ra_decimal_found = decimal_regex.search(ra.group())
-
-                        # Parses values of DEC
-                        dec_values_found = value_regex.findall(dec.group())
-                        dec_decimal_found = decimal_regex.search(dec.group())
-
-                        hms = None
-                        dms = None
-
-                        # Concatenates RA values to create hms string
-                        if(ra_decimal_found is not None):
-                            hms = f'{ra_sign}{ra_values_found[0]}h{ra_values_found[1]}m{ra_values_found[2]}{ra_decimal_found.group()}s'
-                        else:
-                            hms = f'{ra_sign}{ra_values_found[0]}h{ra_values_found[1]}m{ra_values_found[2]}s'
-
-                        # Concatenates DEC values to create dms string
-                        if(dec_decimal_found is not None):
-                            dms = f'{dec_sign}{dec_values_found[0]}d{dec_values_found[1]}m{dec_values_found[2]}{dec_decimal_found.group()}s'
-                        else:
-                            dms = f'{dec_sign}{dec_values_found[0]}d{dec_values_found[1]}m{dec_values_found[2]}s'
-
-                        # Converts coordinate to SkyCoord object
-                        skycoord_obj = SkyCoord(hms, dms, unit=('hourangle', 'deg'))
+                        ra = ra_regex.search(ra_found.group()).group()
+                        dec = dec_regex.search(dec_found.group()).group()
+
+                        ra_value = _parse_sexagesimal(ra, True)
+                        dec_value = _parse_sexagesimal(dec, False)
+
+                        # Leaves astropy to reject or warn about values outside the usual range of each field
+                        if((ra_value is None) or (dec_value is None)):
+                            parsed.append((None, _parse_sexagesimal_by_astropy(ra, dec)))
+                            break
                     # Decimal Degrees
                     else:
-                        ra = ra_regex.search(ra_found.group().replace('(2000)', '').replace('(j2000)', ''))
-                        dec = dec_regex.search(dec_found.group().replace('(2000)', '').replace('(j2000)', ''))
-
-                        # Converts coordinate to SkyCoord object
-                        skycoord_obj = SkyCoord(float(ra.group()), float(dec.group()), unit=('deg', 'deg'))
-                    
-                    try:
-                        # Queries SIMBAD by coordinate to get object IDs and its aliases
-                        query_result = query_simbad_by_coords(skycoord_obj)
-
-                        if(query_result != dict()):
-                            for key, value in query_result.items():
-                                try:
-                                    # Checks whether object ID exists in the database
-                                    exists, last_updated = object_exists(key) 
-
-                                    # Adds new aliases associated to the object ID into the database if object ID exist and updating is needed
-                                    if(exists == True):
-                                        check_object_updates(key, last_updated)
-                                    else:
-                                        # Queries SIMBAD by name to get the object ID and its coordinates
-                                        name_query_result = query_simbad_by_name(key, False)
-
-                                        if(name_query_result is not None):
-                                            # Adds object ID and its aliases into the database
-                                            name, coordinates, _ = name_query_result
-                                            add_object(name, coordinates, value)
-                                except Exception:
-                                    pass
-                    except Exception:
-                        pass
-
-                    # Adds converted coordinate to list
-                    formatted_coords.append(skycoord_obj)
+                        ra_value = float(ra_regex.search(ra_found.group().replace('(2000)', '').replace('(j2000)', '')).group())
+                        dec_value = float(dec_regex.search(dec_found.group().replace('(2000)', '').replace('(j2000)', '')).group())
+
+                    # Skips coordinates beyond the poles, which SkyCoord would reject
+                    if(abs(dec_value) > 90.0):
+                        raise ValueError(f'Declination {dec_value} is out of range')
+
+                    values[i][0].append(ra_value)
+                    values[i][1].append(dec_value)
+                    parsed.append((i, len(values[i][1]) - 1))
                 except ValueError:
                     pass
 
                 break
 
-    return formatted_coords
+    # Converts the coordinates in each format to SkyCoord objects all at once
+    converted = []
+
+    for i in range(len(COORD_FORMATS)):
+        ras, decs = values[i]
+
+        if(len(ras) > 0):
+            converted.append(list(SkyCoord(np.array(ras), np.array(decs), unit=_COORD_FORMAT_UNITS[i])))
+        else:
+            converted.append([])
+
+    return [converted[i][j] if i is not None else j for i, j in parsed]
 
 def extract_dates(text: str) -> list[str]:
     """
@@ -458,17 +549,16 @@ def extract_dates(text: str) -> list[str]:
 
     dates = []
 
+    lowered = f' {text.lower()} '
+
     # Finds all dates that are in the above date formats in the text of ATel report
-    for regex in DATE_REGEXES:
+    for date_regex, extract_regex in _DATE_PATTERNS:
         # Attempts to find all dates that are in a certain date format in the text using regex
-        date_regex = re.compile(f'[^\d|^a-z|^:]{regex}[^\d|^:]')
-        dates_found = date_regex.findall(f' {text.lower()} ')
+        dates_found = date_regex.findall(lowered)
 
         # Removes any leading and/or trailing characters that are not part of the date format
         for date in dates_found:
-            date_regex = re.compile(regex)
-            extracted_date = date_regex.search(date)
-            dates.append(extracted_date.group())
+            dates.append(extract_regex.search(date).group())
 
     return list(dict.fromkeys(dates))
 
@@ -486,104 +576,454 @@ def parse_dates(dates: list[str]) -> list[datetime]:
     formatted_dates = []
 
     # Converts each extracted date to datetime object
-    for date in dates:
-        for i in range(len(DATE_FORMATS)):
-            try:
-                # Standard date formats
-                if(i < 20):
-                    # Adds converted date to list
-                    formatted_dates.append(datetime.strptime(date, DATE_FORMATS[i]))
-                # MJD and JD formats
-                else:
-                    time_object = None
-                    date_format = re.search(DATE_REGEXES[10], date)
+    for date_string in dates:
+        formatted_date = _parse_date(date_string)
 
-                    if(date_format is not None):
-                        # Creates Time object in MJD format
-                        mjd = re.search(DATE_FORMATS[i], date_format.group())
-                        time_object = Time(mjd.group(), format='mjd')
-                    else:
-                        # Creates Time object in JD format
-                        date_format = re.search(DATE_REGEXES[11], date)
+        if(formatted_date is not None):
+            formatted_dates.append(formatted_date)
 
-                        if(date_format is not None):
-                            jd = re.search(DATE_FORMATS[i], date_format.group())
-                            time_object = Time(jd.group(), format='jd')
+    return list(dict.fromkeys(formatted_dates))
 
-                    if(time_object is not None):
-                        # Converts MJD/JD to standard date
-                        converted_date = time_object.iso
-                        extracted_date = re.search(DATE_REGEXES[9], converted_date)
+def extract_known_aliases(text: str) -> list[str]:
+    """
+    Finds all known aliases and object IDs in the text of ATel report.
 
-                        if(extracted_date is not None):
-                            # Adds converted date to list
-                            formatted_dates.append(datetime.strptime(extracted_date.group(), DATE_FORMATS[9]))
+    Args:
+        text (str): Text of ATel report.
 
-                break
+    Returns:
+        list[str]: List of object IDs found.
+    """
+
+    # Finds all known aliases and object IDs in the text of ATel report in a single pass
+    return get_alias_matcher().find(text)
+
+def extract_keywords(text: str) -> list[str]:
+    """
+    Finds all keywords in the text of ATel report.
+
+    Args:
+        text (str): Text of ATel report.
+
+    Returns:
+        list[str]: List of keywords found.
+    """
+
+    lowered = f' {text.lower()} '
+    found = set()
+
+    # Finds every position in the text of ATel report where a keyword starts in a single pass
+    for position in _KEYWORD_SCAN_REGEX.finditer(lowered):
+        # Checks which keywords start there, as several can share a position eg. 'asteroid' and 'asteroid (binary)'
+        start = position.start()
+
+        for i, keyword_regex in _KEYWORD_PATTERNS.get(lowered[start], []) + _KEYWORD_PATTERNS.get('', []):
+            if((i not in found) and (keyword_regex.match(lowered, start) is not None)):
+                found.add(i)
+
+    # Lists keywords in the same order as FIXED_KEYWORDS
+    return [str(FIXED_KEYWORDS[i]) for i in sorted(found)]
+
+# Private functions
+def _read_page_by_lxml(html_string) -> dict:
+    """
+    Finds the parts of an ATel page that data is extracted from, parsing the page with lxml and visiting each element of the tree once.
+    Gives the same results as _read_page_by_soup() for pages that html.parser and lxml build the same tree for.
+
+    Args:
+        html_string (str | bytes): The HTML of the page. Bytes are decoded the same way as BeautifulSoup does.
+
+    Returns:
+        dict: The parts of the page, see _read_page_by_soup().
+    """
+
+    page = {'nonexistent': False, 'title': None, 'authors': None, 'submission_date': None, 'subjects': '', 'referenced_by_text': '',
+            'telegram': False, 'body_texts': [], 'telegram_text': '', 'em_text': None, 'links': []}
+
+    if(isinstance(html_string, bytes)):
+        html_string = UnicodeDammit(html_string, is_html=True).unicode_markup
+
+    try:
+        root = etree.fromstring(html_string.replace('\r', _CARRIAGE_RETURN_PLACEHOLDER).encode('utf-8'), etree.HTMLParser(encoding='utf-8'))
+    except etree.LxmlError:
+        root = None
+
+    if(root is None):
+        return page
+
+    etree.strip_elements(root, *_HIDDEN_TEXT_TAGS, with_tail=False)
+
+    title = None
+    subjects = None
+    references = None
+    telegram = None
+    telegram_last = None
+    in_telegram = False
+
+    paragraphs = []
+    strongs = []
+    ems = []
+    body_elements = [[] for _ in BODY_TAGS]
+    links = []
+
+    for element in root.iter():
+        tag = element.tag
+
+        # Collects the body paragraphs and links of the telegram, which ends with its last descendant
+        if(in_telegram):
+            for i in range(len(BODY_TAGS)):
+                if(tag == BODY_TAGS[i][0] and _lxml_has_attrs(element, BODY_TAGS[i][1])):
+                    body_elements[i].append(element)
+
+            if(tag == 'a' and element.get('href') is not None):
+                links.append(element)
+
+            if(element is telegram_last):
+                in_telegram = False
+
+        if(tag == 'strong'):
+            if(len(strongs) < 2):
+                strongs.append(element)
+        elif(tag == 'em'):
+            if(len(ems) < 2):
+                ems.append(element)
+        elif(tag == 'p'):
+            if(len(paragraphs) < 2 and _lxml_has_attrs(element, {'class': None, 'align': None})):
+                paragraphs.append(element)
+
+            if(subjects is None and _lxml_has_attrs(element, {'class': 'subjects'})):
+                subjects = element
+        elif(tag == 'h1'):
+            if(title is None and _lxml_has_attrs(element, {'class': 'title'})):
+                title = element
+        elif(tag == 'div'):
+            div_id = element.get('id')
+
+            if(references is None and div_id == 'references'):
+                references = element
+            elif(telegram is None and div_id == 'telegram'):
+                telegram = element
+                telegram_last = element
+
+                while(len(telegram_last) > 0):
+                    telegram_last = telegram_last[-1]
+
+                in_telegram = telegram_last is not telegram
+
+    page['nonexistent'] = len(paragraphs) > 1 and _lxml_stripped_text(paragraphs[1]) == _NONEXISTENT_REPORT_TEXT
+
+    if(title is not None):
+        page['title'] = _lxml_stripped_text(title)
+
+    if(len(strongs) > 0):
+        page['authors'] = _lxml_stripped_text(strongs[0])
+
+    if(len(strongs) > 1):
+        page['submission_date'] = _lxml_stripped_text(strongs[1])
+
+    if(subjects is not None):
+        page['subjects'] = _lxml_text(subjects)
+
+    if(references is not None):
+        page['referenced_by_text'] = _lxml_text(references)
+
+    if(len(ems) > 1):
+        page['em_text'] = _lxml_text(ems[1])
+
+    if(telegram is not None):
+        page['telegram'] = True
+        page['body_texts'] = [[(element.find('.//iframe') is not None, _lxml_stripped_text(element), _lxml_text(element)) for element in elements] for elements in body_elements]
+        page['telegram_text'] = _lxml_text(telegram)
+        page['links'] = [(link.get('href').replace(_CARRIAGE_RETURN_PLACEHOLDER, '\r'), _lxml_text(link)) for link in links]
+
+    return page
+
+def _read_page_by_soup(html_string) -> dict:
+    """
+    Finds the parts of an ATel page that data is extracted from, parsing the page with BeautifulSoup and searching the tree for each part.
+
+    Args:
+        html_string (str | bytes): The HTML of the page.
+
+    Returns:
+        dict: The parts of the page. 'nonexistent' is whether the page is the one shown for unused ATel numbers, 'title', 'authors' and 'submission_date' are the stripped texts of the title and the first two bold elements or None if they are missing,
+              'subjects' and 'referenced_by_text' are the texts of the subjects and the list of reports referring to the report, 'telegram' is whether the page has a telegram section,
+              'body_texts' holds, for each of BODY_TAGS, whether each matching element of the telegram contains an iframe along with its stripped and full text, 'telegram_text' is the text of the whole telegram,
+              'em_text' is the text of the second emphasised element or None if it is missing, and 'links' holds the address and text of each link in the telegram.
+    """
+
+    # Parses HTML into a tree
+    soup = BeautifulSoup(html_string, 'html.parser')
+
+    page = {'nonexistent': False, 'title': None, 'authors': None, 'submission_date': None, 'subjects': '', 'referenced_by_text': '',
+            'telegram': False, 'body_texts': [], 'telegram_text': '', 'em_text': None, 'links': []}
+
+    paragraphs = soup.find_all('p', {'class': None, 'align': None}, limit=2)
+    page['nonexistent'] = len(paragraphs) > 1 and paragraphs[1].get_text(strip=True) == _NONEXISTENT_REPORT_TEXT
+
+    if(soup.find('h1', {'class': 'title'}) is not None):
+        page['title'] = str(soup.find('h1', {'class': 'title'}).get_text(strip=True))
+
+    strongs = soup.find_all('strong', limit=2)
+
+    if(len(strongs) > 0):
+        page['authors'] = str(strongs[0].get_text(strip=True))
+
+    if(len(strongs) > 1):
+        page['submission_date'] = strongs[1].get_text(strip=True)
+
+    if(soup.find('p', {'class': 'subjects'}) is not None):
+        page['subjects'] = soup.find('p', {'class': 'subjects'}).get_text()
+
+    if(soup.find('div', {'id': 'references'}) is not None):
+        page['referenced_by_text'] = soup.find('div', {'id': 'references'}).get_text()
+
+    ems = soup.find_all('em', limit=2)
+
+    if(len(ems) > 1):
+        page['em_text'] = ems[1].get_text()
+
+    div_element = soup.find('div', {'id': 'telegram'})
+
+    if(div_element is not None):
+        page['telegram'] = True
+
+        # Each body tag is only searched for if the tags before it found no body text
+        page['body_texts'] = ([(text.find('iframe') is not None, text.get_text(strip=True), str(text.get_text())) for text in div_element.find_all(body_tag[0], body_tag[1])] for body_tag in BODY_TAGS)
+        page['telegram_text'] = str(div_element.get_text())
+        page['links'] = [(link['href'], link.get_text()) for link in div_element.find_all('a', href=True)]
+
+    return page
+
+def _lxml_has_attrs(element, attrs: dict) -> bool:
+    """
+    Checks an lxml element's attributes the same way as BeautifulSoup's find_all().
+
+    Args:
+        element (etree._Element): The element to check.
+        attrs (dict): The value of each attribute to check, or None for attributes the element must not have. Classes match if the element has the class among others.
+
+    Returns:
+        bool: True if every attribute matches, False otherwise.
+    """
+
+    if(attrs is None):
+        return True
+
+    for name, value in attrs.items():
+        actual = element.get(name)
+
+        if(value is None):
+            if(actual is not None):
+                return False
+        elif(actual is None):
+            return False
+        elif(name == 'class'):
+            if((value not in actual.split()) and (actual != value)):
+                return False
+        elif(actual != value):
+            return False
+
+    return True
+
+def _lxml_text(element) -> str:
+    """
+    Joins the text of an lxml element and its descendants, like BeautifulSoup's get_text().
+
+    Args:
+        element (etree._Element): The element.
+
+    Returns:
+        str: The text of the element.
+    """
+
+    return ''.join(element.itertext()).replace(_CARRIAGE_RETURN_PLACEHOLDER, '\r')
+
+def _lxml_stripped_text(element) -> str:
+    """
+    Joins the text of an lxml element and its descendants with the whitespace around each piece removed, like BeautifulSoup's get_text(strip=True).
+
+    Args:
+        element (etree._Element): The element.
+
+    Returns:
+        str: The stripped text of the element.
+    """
+
+    return ''.join(string.replace(_CARRIAGE_RETURN_PLACEHOLDER, '\r').strip() for string in element.itertext())
+
+def _parse_date(date_string: str) -> datetime:
+    """
+    Parses a date in any of DATE_FORMATS, going straight to the formats of the DATE_REGEXES it matches.
+    Gives the same result as trying every format in turn, see _parse_date_by_trial().
+
+    Args:
+        date_string (str): A date found in the text of ATel report.
+
+    Returns:
+        datetime: The parsed date, or None if it isn't a valid date.
+    """
+
+    candidates = []
+
+    # Finds the formats the date could be in, in the same order as DATE_FORMATS
+    for i in range(len(_DATE_FIELD_ORDERS)):
+        if(_DATE_FULL_PATTERNS[i].fullmatch(date_string) is not None):
+            fields = _DATE_FIELD_REGEX.findall(date_string)
+            year = fields[_DATE_FIELD_ORDERS[i].index('y')]
+            candidates.append((i if len(year) == 4 else i + 10, i, fields))
+
+    if(len(candidates) > 0):
+        for _, i, fields in sorted(candidates):
+            day, month, year = (fields[_DATE_FIELD_ORDERS[i].index(field)] for field in 'dmy')
+
+            if(len(year) == 2):
+                # Two digit years are 1969 to 2068, as with strptime()
+                year = int(year) + (2000 if int(year) <= 68 else 1900)
+
+            try:
+                return datetime(int(year), _MONTHS[month] if month.isalpha() else int(month), int(day))
             except ValueError:
                 pass
 
-    return list(dict.fromkeys(formatted_dates))
+        return None
 
-def extract_known_aliases(text: str) -> list[str]:
+    # MJD and JD formats
+    if(_DATE_FULL_PATTERNS[10].fullmatch(date_string) is not None):
+        day, fraction = _split_day(date_string[4:])
+    elif(_DATE_FULL_PATTERNS[11].fullmatch(date_string) is not None):
+        day, fraction = _split_day(date_string[3:])
+
+        # Julian days start at noon
+        day = day - 2400001
+        fraction = fraction + 0.5
+
+        if(fraction >= 1):
+            day = day + 1
+            fraction = fraction - 1
+    else:
+        return _parse_date_by_trial(date_string)
+
+    ordinal = _MJD_EPOCH_ORDINAL + day
+
+    if((_MJD_ORDINAL_RANGE[0] <= ordinal <= _MJD_ORDINAL_RANGE[1]) and (fraction < 1 - _MJD_ROUNDING_MARGIN)):
+        return datetime.fromordinal(ordinal)
+
+    return _parse_date_by_trial(date_string)
+
+def _split_day(number: str) -> tuple[int, float]:
     """
-    Finds all known aliases and object IDs in the text of ATel report.
+    Splits an MJD or JD into whole days and a fraction of a day, keeping the fraction exact for large day numbers.
 
     Args:
-        text (str): Text of ATel report.
+        number (str): The MJD or JD, eg. '2455000.25'.
 
     Returns:
-        list[str]: List of object IDs found.
+        tuple[int, float]: The whole days and the fraction of a day.
     """
 
-    object_IDs = []
-    # Retrieves known aliases
-    aliases = get_all_aliases()
+    whole, _, fraction = number.partition('.')
+    return (int(whole), float(f'0.{fraction}') if fraction != '' else 0.0)
 
-    # Finds all aliases and object IDs in the text of ATel report
-    for alias in aliases:
-        # Attempts to find alias in the text using regex
-        alias_regex = re.compile(f'[^\d|^a-z]{str(re.escape(alias.alias.lower()))}[^\d|^a-z]')
-        alias_found = alias_regex.search(f' {text.lower()} ')
+def _parse_date_by_trial(date_string: str) -> datetime:
+    """
+    Parses a date by trying each of DATE_FORMATS in turn, converting MJD and JD with astropy.
+    Used for dates that don't match DATE_REGEXES and MJD or JD outside the range converted with plain arithmetic.
 
-        # Adds object ID to list if its associated alias is found in the text
-        if(alias_found is not None):
-            object_IDs.append(str(alias.object_ID.lower()))
-        else:
-            # Attempts to find object ID in the text using regex
-            object_ID_regex = re.compile(f'[^\d|^a-z]{str(re.escape(alias.object_ID.lower()))}[^\d|^a-z]')
-            object_ID_found = object_ID_regex.search(f' {text.lower()} ')
+    Args:
+        date_string (str): A date found in the text of ATel report.
+
+    Returns:
+        datetime: The parsed date, or None if it isn't a valid date.
+    """
 
-            # Adds object ID to list if it is found in the text
-            if(object_ID_found is not None):
-                object_IDs.append(str(alias.object_ID.lower()))
+    for i in range(len(DATE_FORMATS)):
+        try:
+            # Standard date formats
+            if(i < 20):
+                return datetime.strptime(date_string, DATE_FORMATS[i])
+            # MJD and JD formats
+            else:
+                time_object = None
+                date_format = re.search(DATE_REGEXES[10], date_string)
+
+                if(date_format is not None):
+                    # Creates Time object in MJD format
+                    mjd = re.search(DATE_FORMATS[i], date_format.group())
+                    time_object = Time(mjd.group(), format='mjd')
+                else:
+                    # Creates Time object in JD format
+                    date_format = re.search(DATE_REGEXES[11], date_string)
 
-    return list(dict.fromkeys(object_IDs))
+                    if(date_format is not None):
+                        jd = re.search(DATE_FORMATS[i], date_format.group())
+                        time_object = Time(jd.group(), format='jd')
 
-def extract_keywords(text: str) -> list[str]:
+                if(time_object is not None):
+                    # Converts MJD/JD to standard date
+                    converted_date = time_object.iso
+                    extracted_date = re.search(DATE_REGEXES[9], converted_date)
+
+                    if(extracted_date is not None):
+                        return datetime.strptime(extracted_date.group(), DATE_FORMATS[9])
+
+                return None
+        except ValueError:
+            pass
+
+    return None
+
+def _parse_sexagesimal(value: str, hours: bool) -> float:
     """
-    Finds all keywords in the text of ATel report.
+    Converts an RA or DEC in HMS/DMS format to a number in the same way as SkyCoord, eg. '-06h59m17.4s' to -6.988166666666667.
 
     Args:
-        text (str): Text of ATel report.
+        value (str): RA or DEC found in the text of an ATel report, starting with its sign if it has one.
+        hours (bool): Whether the value is an RA in hours, or a DEC in degrees.
 
     Returns:
-        list[str]: List of keywords found.
+        float: The RA in hours or DEC in degrees, or None if any field is outside its usual range.
     """
 
-    i = 0
-    keywords = []
+    values_found = _COORD_VALUE_REGEX.findall(value)
+    decimal_found = _COORD_DECIMAL_REGEX.search(value)
+
+    whole = -float(values_found[0]) if value[0] == '-' else float(values_found[0])
+    minutes = int(values_found[1])
+
+    if(decimal_found is not None):
+        seconds = float(f'{values_found[2]}{decimal_found.group()}')
+    else:
+        seconds = int(values_found[2])
+
+    if((hours and not -24.0 < whole < 24.0) or not 0 <= minutes < 60 or not 0 <= seconds < 60):
+        return None
+
+    return math.copysign(abs(whole) + minutes / 60.0 + seconds / 3600.0, whole)
+
+def _parse_sexagesimal_by_astropy(ra: str, dec: str) -> SkyCoord:
+    """
+    Converts a coordinate in HMS/DMS format to a SkyCoord object by formatting it as a string for astropy to parse.
+
+    Args:
+        ra (str): RA found in the text of an ATel report, starting with its sign if it has one.
+        dec (str): DEC found in the text of an ATel report, starting with its sign if it has one.
+
+    Raises:
+        ValueError: Thrown when a field of the RA or DEC is out of range.
+
+    Returns:
+        SkyCoord: The converted coordinate.
+    """
 
-    # Finds all keywords in the text of ATel report
-    for keyword in KEYWORD_REGEXES:
-        # Attempts to find keyword in the text using regex
-        keyword_regex = re.compile(f'[^a-z]{keyword}[^a-z]')
-        keyword_found = keyword_regex.search(f' {text.lower()} ')
+    strings = []
 
-        # Adds keyword to list if it is found in the text
-        if(keyword_found is not None):
-            keywords.append(str(FIXED_KEYWORDS[i]))
+    for value, separator in ((ra, 'h'), (dec, 'd')):
+        sign = value[0] if value[0] in '+-' else ''
+        values_found = _COORD_VALUE_REGEX.findall(value)
+        decimal_found = _COORD_DECIMAL_REGEX.search(value)
+        decimal = decimal_found.group() if decimal_found is not None else ''
 
-        i = i + 1
+        strings.append(f'{sign}{values_found[0]}{separator}{values_found[1]}m{values_found[2]}{decimal}s')
 
-    return keywords
\ No newline at end of file
+    return SkyCoord(strings[0], strings[1], unit=('hourangle', 'deg'))
\ No newline at end of file
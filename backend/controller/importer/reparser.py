@@ -0,0 +1,227 @@
+"""
+Contains functions that rebuild the stored ATel reports from the archive of downloaded pages.
+
+Author:
+    Nathan Sutardi
+
+License Terms and Copyright:
+    Copyright (C) 2021 Nathan Sutardi
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import gzip
+import multiprocessing
+import os
+import re
+import time
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from model.db.db_interface import get_alias_matcher, replace_reports
+from model.ds.report_types import ImportedReport
+from controller.importer.archive import archived_atel_nums, page_path
+from controller.importer.parser import NonexistentReportError, PARSE_ERRORS, init_parse_process, parse_report
+from controller.importer.enricher import drain_enrichment_queue
+
+# Constants
+_REPARSE_PROCESSES = min(os.cpu_count() or 1, 4)
+"""
+Number of parsing processes used while reparsing, unless another number is given.
+"""
+
+_REPARSE_BATCH_SIZE = 200
+"""
+Number of parsed reports written to the database in one transaction while reparsing.
+"""
+
+_REPARSE_CHUNK_SIZE = 32
+"""
+Number of pages parsed by a process as one unit of work, so processes spend their time parsing instead of waiting for work.
+"""
+
+_PAGE_FILE_REGEX = re.compile(r'^atel(\d+)\.html(\.gz)?$')
+"""
+Matches the file name of a saved page, eg. 'atel1000.html' or an archived 'atel1000.html.gz', capturing its ATel number.
+"""
+
+# Reparser functions
+def reparse_reports(source: str = None, processes: int = None, chunk_size: int = None, batch_size: int = None, enrich: bool = False, write: bool = True) -> dict:
+    """
+    Parses saved ATel pages again and replaces the stored reports, along with their relations, with the results.
+    Chunks of pages are parsed by a pool of processes and the reports are written to the database in batches as each chunk finishes, without downloading anything.
+    Parsing never waits on SIMBAD. When enriching, each report's coordinates are added to the enrichment queue as the report is written, and the queue is drained once every report is written.
+
+    Args:
+        source (str, optional): Directory searched for saved pages named 'atel<number>.html', optionally gzipped. Defaults to the archive of downloaded pages.
+        processes (int, optional): Number of parsing processes, or zero to parse in the calling process. Defaults to the number of CPUs, up to 4.
+        chunk_size (int, optional): Number of pages parsed by a process as one unit of work.
+        batch_size (int, optional): Number of reports written to the database at once.
+        enrich (bool, optional): Whether to look up the objects near each report's coordinates on SIMBAD. Has no effect unless the reports are written.
+        write (bool, optional): Whether to write the reports to the database, or only parse them to measure parsing speed.
+
+    Returns:
+        dict: The number of pages found, reports parsed, stored reports replaced and pages that could not be parsed, the time taken and the CPU time spent parsing in seconds, and the parsing rate in reports per second overall and per process.
+    """
+
+    processes = _REPARSE_PROCESSES if processes is None else processes
+    chunk_size = _REPARSE_CHUNK_SIZE if chunk_size is None else max(chunk_size, 1)
+    batch_size = _REPARSE_BATCH_SIZE if batch_size is None else max(batch_size, 1)
+
+    pages = _find_pages(source)
+    chunks = [pages[i:i + chunk_size] for i in range(0, len(pages), chunk_size)]
+    stats = {'pages': len(pages), 'reports': 0, 'replaced': 0, 'failed': 0, 'seconds': 0.0, 'cpu_seconds': 0.0}
+    batch = []
+    start = time.perf_counter()
+
+    print(f'Reparsing {len(pages)} saved ATel reports', flush=True)
+
+    if(processes > 0):
+        # Spawned rather than forked, so the pool is safe to start from a process that is running other threads.
+        # The processes are given this process's alias matcher, so they don't each open their own database connections to load it.
+        pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=init_parse_process, initargs=(get_alias_matcher(),))
+    else:
+        pool = None
+
+    try:
+        for results, cpu_seconds in _parse_chunks(pool, chunks, processes):
+            stats['cpu_seconds'] += cpu_seconds
+
+            for atel_num, report in results:
+                if(report is None):
+                    print(f'ATel #{atel_num} could not be reparsed due to it missing important data', flush=True)
+                    stats['failed'] += 1
+                    continue
+
+                stats['reports'] += 1
+
+                if(write):
+                    batch.append(report)
+
+                if(len(batch) >= batch_size):
+                    stats['replaced'] += replace_reports(batch, enrich)
+                    batch = []
+
+        if(len(batch) > 0):
+            stats['replaced'] += replace_reports(batch, enrich)
+    finally:
+        if(pool is not None):
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['reports_per_second'] = stats['reports'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    stats['reports_per_second_per_process'] = stats['reports_per_second'] / max(processes, 1)
+
+    print(f'Reparsed {stats["reports"]} reports in {stats["seconds"]:.1f}s '
+          f'({stats["reports_per_second"]:.1f} reports/s, {stats["reports_per_second_per_process"]:.1f} reports/s per process, '
+          f'{stats["cpu_seconds"]:.1f}s parsing)', flush=True)
+
+    if(enrich and write):
+        drain_enrichment_queue()
+
+    return stats
+
+# Private functions
+def _find_pages(source: str = None) -> list[tuple[int, str]]:
+    """
+    Finds saved ATel pages.
+
+    Args:
+        source (str, optional): Directory searched, including subdirectories, for saved pages. Defaults to the archive of downloaded pages.
+
+    Returns:
+        list[tuple[int, str]]: The ATel number and path of each page, in ascending order of ATel number.
+    """
+
+    if(source is None):
+        return [(atel_num, page_path(atel_num)) for atel_num in archived_atel_nums()]
+
+    pages = {}
+
+    for directory, _, file_names in os.walk(source):
+        for file_name in file_names:
+            match = _PAGE_FILE_REGEX.match(file_name)
+
+            if(match is not None):
+                pages.setdefault(int(match.group(1)), os.path.join(directory, file_name))
+
+    return sorted(pages.items())
+
+def _parse_chunks(pool: ProcessPoolExecutor, chunks: list, processes: int):
+    """
+    Parses chunks of pages, yielding the results of each chunk as soon as it is finished.
+    Only a couple of chunks per process are queued at once, so parsed reports don't pile up in memory while they are being written.
+
+    Args:
+        pool (ProcessPoolExecutor): Pool of parsing processes, or None to parse in the calling process.
+        chunks (list[list[tuple[int, str]]]): The ATel number and path of each page, split into chunks.
+        processes (int): Number of parsing processes.
+
+    Yields:
+        tuple[list[tuple[int, ImportedReport]], float]: The results of a chunk, see _parse_chunk().
+    """
+
+    if(pool is None):
+        for chunk in chunks:
+            yield _parse_chunk(chunk)
+
+        return
+
+    remaining = iter(chunks)
+    pending = set()
+
+    while True:
+        for chunk in remaining:
+            pending.add(pool.submit(_parse_chunk, chunk))
+
+            if(len(pending) >= processes * 2):
+                break
+
+        if(len(pending) == 0):
+            return
+
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            yield future.result()
+
+def _parse_chunk(pages: list[tuple[int, str]]) -> tuple[list[tuple[int, ImportedReport]], float]:
+    """
+    Parses a chunk of saved ATel pages. Runs in the parsing processes.
+
+    Args:
+        pages (list[tuple[int, str]]): The ATel number and path of each page.
+
+    Returns:
+        tuple[list[tuple[int, ImportedReport]], float]: The ATel number and parsed report of each page, with None for pages that could not be parsed, and the CPU time spent in seconds.
+    """
+
+    start = time.process_time()
+    results = []
+
+    for atel_num, path in pages:
+        try:
+            if(path.endswith('.gz')):
+                with gzip.open(path, 'rb') as f:
+                    html_string = f.read()
+            else:
+                with open(path, 'rb') as f:
+                    html_string = f.read()
+
+            results.append((atel_num, parse_report(atel_num, html_string)))
+        except (OSError, NonexistentReportError, *PARSE_ERRORS):
+            results.append((atel_num, None))
+
+    return (results, time.process_time() - start)
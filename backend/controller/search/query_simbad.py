@@ -24,12 +24,23 @@ License Terms and Copyright:
 """
 
 
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
 from astropy.coordinates import SkyCoord
 from astropy.coordinates.angles import Angle
 from astropy.table import Table
 from astroquery.simbad import Simbad
 
-from model.constants import DEFAULT_RADIUS, RADIUS_UNIT
+import mysql.connector
+
+from model.constants import DEFAULT_RADIUS, RADIUS_UNIT, UPDATE_OBJECT_DAYS
+from model.db.db_interface import get_simbad_cache, put_simbad_cache
 
 from requests.exceptions import ConnectionError, HTTPError, ReadTimeout
 
@@ -40,8 +51,10 @@ from requests.exceptions import ConnectionError, HTTPError, ReadTimeout
 
 
 # Mirror for the SIMBAD database.
-# Using the Harvard mirror.
-SIMBAD_MIRROR = "http://simbad.cfa.harvard.edu/simbad/sim-script"
+# Using the Harvard mirror by default. Point it at a local stand-in (see 
+# test/simbad_standin.py) to test and benchmark searches without network access. 
+# Configured with the SIMBAD_MIRROR environment variable. 
+SIMBAD_MIRROR = os.getenv("SIMBAD_MIRROR", "http://simbad.cfa.harvard.edu/simbad/sim-script")
 
 
 # The name of the object ID column in the Astroquery Table data structure. 
@@ -51,6 +64,91 @@ RA_COLUMN = "RA"
 DEC_COLUMN = "DEC"
 
 
+# The votable field and Table column holding every identifier of an object, 
+# separated by ALIASES_SEPARATOR. Region queries request this field, so the 
+# aliases of each object are returned along with its MAIN_ID. 
+ALIASES_FIELD = "ids"
+ALIASES_COLUMN = "IDS"
+ALIASES_SEPARATOR = "|"
+
+
+# Where SIMBAD responses are cached. 
+# "mysql" keeps responses in the SimbadCache table, shared by every process, 
+# as well as in memory. "memory" only keeps them in memory, and "off" 
+# disables caching. 
+CACHE_STORES = ["mysql", "memory", "off"]
+
+
+##########################
+# Cache module constants #
+##########################
+
+
+_CACHE_STORE: str = os.getenv("SIMBAD_CACHE_STORE", "mysql")
+"""
+Where SIMBAD responses are cached, one of CACHE_STORES.
+Configured with the SIMBAD_CACHE_STORE environment variable.
+"""
+
+_CACHE_DAYS: float = float(os.getenv("SIMBAD_CACHE_DAYS", UPDATE_OBJECT_DAYS))
+"""
+Days a SIMBAD response is cached for, by default the same amount of time an
+object goes without being updated. Zero disables caching.
+Configured with the SIMBAD_CACHE_DAYS environment variable.
+"""
+
+_NEGATIVE_CACHE_DAYS: float = float(os.getenv("SIMBAD_NEGATIVE_CACHE_DAYS", 1))
+"""
+Days a response that found nothing (an unknown name, an object without 
+aliases or an empty region) is cached for. These are kept for less time, so 
+objects newly added to SIMBAD are found soon after. Zero disables caching 
+them.
+Configured with the SIMBAD_NEGATIVE_CACHE_DAYS environment variable.
+"""
+
+_CACHE_SIZE: int = int(os.getenv("SIMBAD_CACHE_SIZE", 4096))
+"""
+Number of responses each process keeps in memory. The least recently used 
+response is dropped when the limit is reached. 
+Configured with the SIMBAD_CACHE_SIZE environment variable.
+"""
+
+_CACHE_COORD_DECIMALS: int = 5
+"""
+Decimal places of a degree that coordinates are rounded to in cache keys 
+(0.036 arcseconds), so the same region queried with coordinates that differ 
+by a rounding error shares a cache entry.
+"""
+
+_CACHE_KEY_MAX_LENGTH: int = 255
+"""
+Longest cache key stored in the SimbadCache table. Longer keys are only 
+cached in memory.
+"""
+
+_ALIAS_WORKERS: int = int(os.getenv("SIMBAD_ALIAS_WORKERS", 4))
+"""
+Number of objects whose aliases are looked up on SIMBAD at once by each 
+process, when a region query did not return them. The limit is shared by 
+every search, so a crowded region can't flood SIMBAD with requests.
+Configured with the SIMBAD_ALIAS_WORKERS environment variable.
+"""
+
+# In-memory cache state (see _cached()).
+# Maps each cache key to the time it expires and the JSON encoded response.
+_cache: OrderedDict[str, tuple[float, str]] = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats: dict = {"hits": 0, "store_hits": 0, "negative_hits": 0, "misses": 0, "store_errors": 0}
+
+# Alias lookup pool state (one pool per process, see _get_alias_pool()).
+_alias_pool: ThreadPoolExecutor = None
+_alias_pool_pid: int = None
+_alias_pool_lock = threading.Lock()
+
+# Guards adding the ALIASES_FIELD votable field (see _set_votable_fields()).
+_votable_fields_lock = threading.Lock()
+
+
 """
 Error class for a failed connection to the SIMBAD database.
 """
@@ -117,12 +215,25 @@ def _get_names_from_table(table: Table) -> list[str]:
     else:
         return []
     
-    # Retrieve the names column.
+    return _get_column_from_table(table, column_name)
+
+
+def _get_column_from_table(table: Table, column_name: str) -> list[str]:
+    """ Retrieve every value of a column in a Table data structure as strings. 
+
+    Args:
+        table (Table): Table data structure containing the column. 
+        column_name (str): Name of the column. 
+
+    Returns:
+        list[str]: The value of the column in each row. 
+    """
+    # Retrieve the column.
     column = table[column_name].data
     lst = []
 
     # The type is converted to str. 
-    # Astropy will either return the IDs as an array of bytes or an object. 
+    # Astropy will either return the values as an array of bytes or an object. 
     for item in list(column):
         if type(item) is not str:
             lst.append(item.astype('str'))
@@ -139,17 +250,292 @@ def _set_mirror():
     Simbad.SIMBAD_URL = SIMBAD_MIRROR
 
 
+def _set_votable_fields():
+    """ Adds the ALIASES_FIELD votable field to SIMBAD queries, if it has not 
+        been added already. 
+    """
+    with _votable_fields_lock:
+        if ALIASES_FIELD not in Simbad.get_votable_fields():
+            Simbad.add_votable_fields(ALIASES_FIELD)
+
+
+def _get_alias_pool() -> ThreadPoolExecutor:
+    """ Returns the pool of threads looking up aliases for the current process, 
+        creating it if needed. A new pool is created whenever the process ID 
+        changes, as threads are not carried over into forked processes. 
+
+    Returns:
+        ThreadPoolExecutor: The pool, with _ALIAS_WORKERS threads. 
+    """
+    global _alias_pool, _alias_pool_pid
+
+    with _alias_pool_lock:
+        if _alias_pool is None or _alias_pool_pid != os.getpid():
+            _alias_pool = ThreadPoolExecutor(max_workers=max(_ALIAS_WORKERS, 1), thread_name_prefix="simbad-aliases")
+            _alias_pool_pid = os.getpid()
+
+        return _alias_pool
+
+
+def _name_key(kind: str, name: str) -> str:
+    """ Create the cache key of a query by name. SIMBAD ignores case and 
+        repeated spaces in identifiers, so names differing only by these 
+        share a key.
+
+    Args:
+        kind (str): The type of query, "object" or "aliases". 
+        name (str): The object identifier queried. 
+
+    Returns:
+        str: The cache key, e.g. "object:m 31".
+    """
+    return f"{kind}:{' '.join(str(name).split()).lower()}"
+
+
+def _region_key(coords: SkyCoord, radius: float) -> str:
+    """ Create the cache key of a region query, rounding the ICRS coordinates 
+        to _CACHE_COORD_DECIMALS decimal places of a degree. 
+
+    Args:
+        coords (SkyCoord): The centre of the region. 
+        radius (float): The radius of the region in arcseconds. 
+
+    Returns:
+        str: The cache key, e.g. "objects:10.68471:41.26875:10.0".
+    """
+    icrs = coords.icrs
+    ra = round(float(icrs.ra.deg), _CACHE_COORD_DECIMALS)
+    dec = round(float(icrs.dec.deg), _CACHE_COORD_DECIMALS)
+
+    # Adding zero turns a rounded -0.0 into 0.0.
+    return f"objects:{ra + 0.0}:{dec + 0.0}:{float(radius)}"
+
+
+def _cached(key: str, fetch: Callable[[], object], refresh: bool = False) -> object:
+    """ Retrieve a SIMBAD response from the cache, or fetch it from SIMBAD and 
+        cache it if it is not cached. 
+        Responses are looked up in memory first, then in the SimbadCache table. 
+        Responses that found nothing are cached for _NEGATIVE_CACHE_DAYS 
+        instead of _CACHE_DAYS. Errors are never cached. If the database can't 
+        be reached, responses are only cached in memory. 
+
+    Args:
+        key (str): The cache key of the query. 
+        fetch (Callable[[], object]): Queries SIMBAD, returning a response that 
+            can be encoded as JSON. 
+        refresh (bool, optional): Whether to skip any cached response, fetching 
+            it from SIMBAD again and replacing it in the cache. False by default. 
+
+    Returns:
+        object: The response, decoded from JSON if it was cached. 
+
+    Raises:
+        Any error raised by fetch(). 
+    """
+    if _CACHE_STORE == "off":
+        return fetch()
+
+    now = time.time()
+
+    with _cache_lock:
+        entry = None if refresh else _cache.get(key)
+
+        if entry is not None and entry[0] > now:
+            _cache.move_to_end(key)
+            _cache_stats["hits"] += 1
+            _cache_stats["negative_hits"] += _is_negative(entry[1])
+            return json.loads(entry[1])
+
+    use_store = _CACHE_STORE == "mysql" and len(key) <= _CACHE_KEY_MAX_LENGTH
+
+    if use_store and not refresh:
+        try:
+            stored = get_simbad_cache(key)
+        except mysql.connector.Error:
+            stored = None
+            use_store = False
+
+            with _cache_lock:
+                _cache_stats["store_errors"] += 1
+
+        if stored is not None:
+            response, ttl_seconds = stored
+            _remember(key, response, now + ttl_seconds)
+
+            with _cache_lock:
+                _cache_stats["store_hits"] += 1
+                _cache_stats["negative_hits"] += _is_negative(response)
+
+            return json.loads(response)
+
+    with _cache_lock:
+        _cache_stats["misses"] += 1
+
+    value = fetch()
+    _cache_response(key, value, use_store)
+
+    return value
+
+
+def _cache_response(key: str, value: object, use_store: bool = True):
+    """ Add a response fetched from SIMBAD to the cache, see _cached().
+
+    Args:
+        key (str): The cache key of the query. 
+        value (object): The response, which can be encoded as JSON. 
+        use_store (bool, optional): Whether to add the response to the 
+            SimbadCache table as well as to memory, if the cache store is 
+            "mysql" and the key isn't too long. 
+    """
+    if _CACHE_STORE == "off":
+        return
+
+    response = json.dumps(value)
+    ttl_seconds = (_NEGATIVE_CACHE_DAYS if _is_negative(response) else _CACHE_DAYS) * 24 * 60 * 60
+
+    if ttl_seconds <= 0:
+        return
+
+    _remember(key, response, time.time() + ttl_seconds)
+
+    if use_store and _CACHE_STORE == "mysql" and len(key) <= _CACHE_KEY_MAX_LENGTH:
+        try:
+            put_simbad_cache(key, response, ttl_seconds)
+        except mysql.connector.Error:
+            with _cache_lock:
+                _cache_stats["store_errors"] += 1
+
+
+def _remember(key: str, response: str, expires: float):
+    """ Add a response to the in-memory cache, dropping the least recently 
+        used responses once there are more than _CACHE_SIZE.
+
+    Args:
+        key (str): The cache key of the query. 
+        response (str): The JSON encoded response. 
+        expires (float): The time the response expires, in seconds since the 
+            epoch. 
+    """
+    with _cache_lock:
+        _cache[key] = (expires, response)
+        _cache.move_to_end(key)
+
+        while len(_cache) > max(_CACHE_SIZE, 0):
+            _cache.popitem(last=False)
+
+
+def _is_negative(response: str) -> bool:
+    """ Check whether a JSON encoded response found nothing. 
+
+    Args:
+        response (str): The JSON encoded response. 
+
+    Returns:
+        bool: True if the response is null or empty, False otherwise. 
+    """
+    return response in ("null", "[]")
+
+
+def _fetch_aliases(id: str) -> list[str]:
+    """ Query SIMBAD for the aliases of an object, see get_aliases(). 
+    """
+    _set_mirror()
+
+    try:
+        aliases_table = Simbad.query_objectids(id)
+        return _get_names_from_table(aliases_table)
+    except UserWarning as e:
+        # No aliases found.
+        return []
+
+
+def _fetch_region(coords: SkyCoord, radius: float) -> list[dict]:
+    """ Query SIMBAD for the objects in a region, see query_simbad_region(). 
+        The aliases of each object are requested in the same query, and are 
+        cached so looking them up afterwards doesn't query SIMBAD again. 
+
+    Returns:
+        list[dict]: The MAIN_ID, sexagesimal RA and DEC, and aliases of each 
+            object. The aliases are None if SIMBAD did not return them. 
+    """
+    _set_mirror()
+    _set_votable_fields()
+
+    try:
+        table = Simbad.query_region(coords, Angle(radius, unit=RADIUS_UNIT))
+    except UserWarning as e:
+        # No object found.
+        return []
+
+    if table is None:
+        return []
+
+    if RA_COLUMN not in table.colnames or DEC_COLUMN not in table.colnames:
+        raise ValueError("Table does not contain the RA and DEC columns")
+
+    # For a region search, there may be multiple IDs. 
+    # Get all the MAIN_IDs and coordinates from the table. 
+    main_ids = _get_names_from_table(table)
+    ras = _get_column_from_table(table, RA_COLUMN)
+    decs = _get_column_from_table(table, DEC_COLUMN)
+
+    if ALIASES_COLUMN in table.colnames:
+        aliases = [[alias for alias in ids.split(ALIASES_SEPARATOR) if alias] 
+                   for ids in _get_column_from_table(table, ALIASES_COLUMN)]
+
+        for main_id, object_aliases in zip(main_ids, aliases):
+            _cache_response(_name_key("aliases", main_id), object_aliases)
+    else:
+        aliases = [None] * len(main_ids)
+
+    return [{"main_id": main_id, "ra": ra, "dec": dec, "aliases": object_aliases}
+            for main_id, ra, dec, object_aliases in zip(main_ids, ras, decs, aliases)]
+
+
+def _fetch_object(object_name: str) -> dict:
+    """ Query SIMBAD for the MAIN_ID and coordinates of an object, see 
+        query_simbad_by_name(). 
+
+    Returns:
+        dict: The MAIN_ID and the sexagesimal RA and DEC of the object, or 
+            None if the object does not exist. 
+    """
+    _set_mirror()
+
+    try:
+        table = Simbad.query_object(object_name)
+    except UserWarning as e:
+        # No object found.
+        return None
+
+    if table is None:
+        # The object does not exist.
+        return None
+
+    # Get the MAIN_ID and the coordinates from the table. 
+    # The coordinates are checked here so invalid tables are never cached.
+    _get_coords_from_table(table)
+
+    return {
+        "main_id": _get_names_from_table(table)[0],
+        "ra": str(table[RA_COLUMN][0].astype('str')),
+        "dec": str(table[DEC_COLUMN][0].astype('str')),
+    }
+
+
 #####################
 # Public functions. #
 #####################
 
 
-def get_aliases(id: str) -> list[str]:
+def get_aliases(id: str, refresh: bool = False) -> list[str]:
     """ Queries the SIMBAD database by an object name/identifier and returns the 
-        list of alternative names (aliases). 
+        list of alternative names (aliases). Responses are cached, see _cached(). 
 
     Args:
         id (str): The object identifier. 
+        refresh (bool, optional): Whether to query SIMBAD even if the aliases 
+            are cached, replacing the cached response. False by default. 
 
     Returns:
         list[str]: A list of aliases. List is empty if no aliases exist. 
@@ -159,24 +545,23 @@ def get_aliases(id: str) -> list[str]:
             SIMBAD server using the Astroquery package.  
     """
     try:
-        aliases_table = Simbad.query_objectids(id)
-        aliases_list = _get_names_from_table(aliases_table)
+        return _cached(_name_key("aliases", id), lambda: _fetch_aliases(id), refresh)
     except ConnectionError as e:
         raise QuerySimbadError(f"Failed to establish a network connection: {str(e)}")
     except HTTPError as e:
         raise QuerySimbadError(str(e))
-    except UserWarning as e:
-        # No aliases found.
-        return [] 
-
-    return aliases_list
+    except ReadTimeout as e:
+        raise QuerySimbadError(f"SIMBAD timed out: {str(e)}")
 
 
-def query_simbad_by_coords(coords: SkyCoord, 
-                           radius: float=DEFAULT_RADIUS
-) -> dict[str, list[str]]:
-    """ Queries the SIMBAD database by an exact coordinate if the radius is zero, 
-        or a regional area if the radius is non-zero. 
+def query_simbad_region(coords: SkyCoord, 
+                        radius: float=DEFAULT_RADIUS
+) -> list[tuple[str, SkyCoord, list[str]]]:
+    """ Queries the SIMBAD database for the objects in a regional area, or at an 
+        exact coordinate if the radius is zero. The coordinates and aliases of 
+        every object are retrieved by the same request. Objects whose aliases 
+        were not returned have them looked up concurrently, at most 
+        _ALIAS_WORKERS at a time. Responses are cached, see _cached(). 
 
     Args:
         coords (SkyCoord): The exact coordinates or region to search for
@@ -185,9 +570,9 @@ def query_simbad_by_coords(coords: SkyCoord,
             region. By default, the radius is set to 10.0 arcsecs, however it
             can be between 0.0 (exact coordinates) and 20.0 (maximum allowed). 
     Returns:
-        dict[str, list[str]]: A dictionary where the key is the MAIN_ID of an 
-            object found in the coordinate range, and the value is a list of 
-            aliases retrieved from SIMBAD related to the MAIN_ID. 
+        list[tuple[str, SkyCoord, list[str]]]: The MAIN_ID, coordinates and 
+            aliases of each object found in the coordinate range, in the order 
+            SIMBAD returned them. 
     Raises:
         ValueError: If the radius is invalid. 
         QuerySimbadError: if a network error occurs while contacting the 
@@ -198,46 +583,67 @@ def query_simbad_by_coords(coords: SkyCoord,
         raise ValueError(f"Invalid radius: \"${radius}\" not in range 0.0 to 20.0.")
     if coords is None:
         raise ValueError("SkyCoord value is unknown.")
-    
-    # Construct the radius angle for the region search. 
-    radius_angle = Angle(radius, unit=RADIUS_UNIT)
-
-    _set_mirror()
 
     try:        
-        table = Simbad.query_region(coords, radius_angle)
+        rows = _cached(_region_key(coords, radius), lambda: _fetch_region(coords, radius))
 
-        if table is None:
-            return dict()
+        if len(rows) == 0:
+            return []
 
-        # For a region search, there may be multiple IDs. 
-        # Get all the MAIN_IDs from the table. 
-        main_ids = _get_names_from_table(table)
+        # Look up the aliases SIMBAD did not return. 
+        missing = [row["main_id"] for row in rows if row["aliases"] is None]
+        missing_aliases = dict()
 
-        # Create empty dictionary.
-        results = dict()
+        if len(missing) > 0:
+            missing_aliases = dict(zip(missing, _get_alias_pool().map(get_aliases, missing)))
 
-        # Get the aliases for each ID. Assign the alias list to 
-        # the value of the main ID.
-        for id in main_ids:
-            results[id] = get_aliases(id)
+        # Convert every coordinate at once. 
+        object_coords = SkyCoord([row["ra"] for row in rows], [row["dec"] for row in rows], 
+                                 frame='icrs', unit=('hourangle', 'deg'))
 
-        return results
+        return [(row["main_id"], 
+                 object_coord, 
+                 missing_aliases[row["main_id"]] if row["aliases"] is None else row["aliases"])
+                for row, object_coord in zip(rows, object_coords)]
     except ConnectionError as e:
         raise QuerySimbadError(f"Failed to establish a network connection: {str(e)}")
     except HTTPError as e:
         raise QuerySimbadError(str(e))
-    except UserWarning as e:
-        # No object found.
-        return dict()
     except ReadTimeout as e:
         raise QuerySimbadError(f"SIMBAD timed out: {str(e)}")
 
 
+def query_simbad_by_coords(coords: SkyCoord, 
+                           radius: float=DEFAULT_RADIUS
+) -> dict[str, list[str]]:
+    """ Queries the SIMBAD database by an exact coordinate if the radius is zero, 
+        or a regional area if the radius is non-zero. 
+        See query_simbad_region(), which also returns the coordinates of 
+        each object. 
+
+    Args:
+        coords (SkyCoord): The exact coordinates or region to search for
+            objects within. 
+        radius (float): A value, in arcseconds, for the radius of the 
+            region. By default, the radius is set to 10.0 arcsecs, however it
+            can be between 0.0 (exact coordinates) and 20.0 (maximum allowed). 
+    Returns:
+        dict[str, list[str]]: A dictionary where the key is the MAIN_ID of an 
+            object found in the coordinate range, and the value is a list of 
+            aliases retrieved from SIMBAD related to the MAIN_ID. 
+    Raises:
+        ValueError: If the radius is invalid. 
+        QuerySimbadError: if a network error occurs while contacting the 
+            SIMBAD server using the Astroquery package.     
+    """
+    return {main_id: aliases for main_id, _, aliases in query_simbad_region(coords, radius)}
+
+
 def query_simbad_by_name(object_name: str, 
                          retrieve_aliases: bool=True
 ) -> tuple[str, SkyCoord, list[str]]:
     """ Queries the SIMBAD database by an object identifier string. 
+        Responses are cached, see _cached(). 
 
     Args:
         object_name (str): An object MAIN_ID or alias. 
@@ -254,31 +660,55 @@ def query_simbad_by_name(object_name: str,
         QuerySimbadError: if a network error occurs while contacting the 
             SIMBAD server using the Astroquery package. 
     """
-    _set_mirror()
-
     try:
-        table = Simbad.query_object(object_name)
+        result = _cached(_name_key("object", object_name), lambda: _fetch_object(object_name))
 
-        if table is None:
+        if result is None:
             # The object does not exist.
             return None
 
-        # Get the MAIN_ID and the coordinates from the table. 
-        # The table may be empty (non-result), which means these 
-        # functions will return 
-        main_id = _get_names_from_table(table)[0]
-        coords = _get_coords_from_table(table)
+        coords = SkyCoord(result["ra"], result["dec"], frame='icrs', unit=('hourangle', 'deg'))
 
         if retrieve_aliases:
-            return main_id, coords, get_aliases(object_name)
+            return result["main_id"], coords, get_aliases(object_name)
 
-        return main_id, coords, []
+        return result["main_id"], coords, []
     except ConnectionError as e:
         raise QuerySimbadError(f"Failed to establish a network connection: {str(e)}")
     except HTTPError as e:
         raise QuerySimbadError(str(e))
-    except UserWarning as e:
-        # No object found.
-        return None
     except ReadTimeout as e:
-        raise QuerySimbadError(f"SIMBAD timed out: {str(e)}")
\ No newline at end of file
+        raise QuerySimbadError(f"SIMBAD timed out: {str(e)}")
+
+
+def get_simbad_cache_stats() -> dict:
+    """ Retrieve statistics for the current process's SIMBAD response cache. 
+
+    Returns:
+        dict: The process ID, cache store, number of responses held in memory, 
+            and counters for responses found in memory, found in the 
+            SimbadCache table, found but negative (either way), fetched from 
+            SIMBAD, and failed database accesses, along with the hit rate. 
+    """
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["entries"] = len(_cache)
+
+    lookups = stats["hits"] + stats["store_hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["hits"] + stats["store_hits"]) / lookups if lookups > 0 else 0.0
+    stats["pid"] = os.getpid()
+    stats["store"] = _CACHE_STORE
+
+    return stats
+
+
+def clear_simbad_cache():
+    """ Drop every response cached in memory by the current process and reset 
+        its cache statistics. Responses stored in the SimbadCache table are 
+        kept. 
+    """
+    with _cache_lock:
+        _cache.clear()
+
+        for counter in _cache_stats:
+            _cache_stats[counter] = 0
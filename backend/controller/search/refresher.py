@@ -0,0 +1,225 @@
+"""Background refresh of stored objects.
+
+Searches never wait on SIMBAD to update an object's aliases. An object that
+has gone stale is served with the aliases already stored and queued for a
+refresh (see search.check_object_updates()). A scheduler, run alongside the
+backend, refreshes the objects closest to going stale in batches, before
+searches need them.
+
+Author:
+    Ryan Martin
+
+License Terms and Copyright:
+    Copyright (C) 2021 Ryan Martin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import Process
+
+import mysql.connector
+
+from model.constants import UPDATE_OBJECT_DAYS
+import model.db.db_interface as db
+from controller.search import query_simbad as qs
+
+
+############################
+# Refresh module constants #
+############################
+
+
+# The seconds between runs of the refresh scheduler, or 0 to not run it.
+# Configured with the OBJECT_REFRESH_INTERVAL_SECONDS environment variable.
+REFRESH_INTERVAL_SECONDS: float = float(os.getenv("OBJECT_REFRESH_INTERVAL_SECONDS", 300.0))
+
+
+# The number of days before an object goes stale that it may be refreshed,
+# so objects are usually refreshed before a search finds them stale.
+# Configured with the OBJECT_REFRESH_AHEAD_DAYS environment variable.
+REFRESH_AHEAD_DAYS: float = float(os.getenv("OBJECT_REFRESH_AHEAD_DAYS", 1.0))
+
+
+# The number of objects claimed for refreshing at once.
+# Configured with the OBJECT_REFRESH_BATCH_SIZE environment variable.
+REFRESH_BATCH_SIZE: int = int(os.getenv("OBJECT_REFRESH_BATCH_SIZE", 50))
+
+
+# The number of objects whose aliases are looked up on SIMBAD at once.
+# Configured with the OBJECT_REFRESH_WORKERS environment variable.
+REFRESH_WORKERS: int = int(os.getenv("OBJECT_REFRESH_WORKERS", 4))
+
+
+# The seconds a claimed object is hidden from other refreshers. An object
+# whose refresher dies is refreshed again once its lease runs out.
+_REFRESH_LEASE_SECONDS: float = 600.0
+
+
+# The seconds until an object whose refresh failed is tried again.
+_REFRESH_RETRY_SECONDS: float = 60 * 60.0
+
+
+# Errors that are likely to go away on their own, so the refresh is tried
+# again later.
+_RETRY_ERRORS = (qs.QuerySimbadError, mysql.connector.Error)
+
+
+#####################
+# Private functions #
+#####################
+
+
+def _refresh_claimed(claimed: tuple[str, datetime, datetime]) -> tuple[str, float, float]:
+    ''' Refresh the aliases of an object claimed for refreshing. A failed
+        refresh is scheduled to be tried again later.
+
+    Args:
+        claimed (tuple[str, datetime, datetime]): the object's MAIN_ID, the
+            date it was last updated and the date a refresh was requested,
+            see db_interface.claim_object_refreshes()
+
+    Returns:
+        tuple[str, float, float]: 'refreshed', 'retrying' or 'failed', the
+            seconds the object was past going stale when it was refreshed
+            (negative if it was refreshed ahead of time), and the seconds
+            since a refresh was requested, or None if none was
+    '''
+    object_id, last_updated, requested = claimed
+    now = datetime.now()
+    lag = (now - (last_updated + timedelta(days=UPDATE_OBJECT_DAYS))).total_seconds()
+    waited = None if requested is None else (now - requested).total_seconds()
+
+    try:
+        aliases = qs.get_aliases(object_id, refresh=True)
+        db.add_aliases(object_id, aliases)
+    except _RETRY_ERRORS:
+        db.fail_object_refresh(object_id, _REFRESH_RETRY_SECONDS)
+        return ("retrying", lag, waited)
+    except db.ObjectNotFoundError:
+        # The object was removed since it was claimed.
+        return ("failed", lag, waited)
+
+    return ("refreshed", lag, waited)
+
+
+####################
+# Public functions #
+####################
+
+
+def refresh_objects(workers: int = None, batch_size: int = None) -> dict:
+    """ Refresh the aliases of every stored object that is stale, or within
+        REFRESH_AHEAD_DAYS of going stale, using a pool of threads. Objects
+        are claimed in batches, the longest since updated first. Several
+        processes may refresh objects at once, as each object is only ever
+        claimed by one of them.
+
+    Args:
+        workers (int, optional): The number of threads querying SIMBAD.
+        batch_size (int, optional): The number of objects claimed at once.
+
+    Returns:
+        dict: The number of objects refreshed and scheduled to be tried again,
+            the most seconds a refreshed object was past going stale and the
+            most seconds a refresh was waited on after a search requested it,
+            and the time taken in seconds.
+    """
+    workers = REFRESH_WORKERS if workers is None else max(workers, 1)
+    batch_size = REFRESH_BATCH_SIZE if batch_size is None else max(batch_size, 1)
+    max_age_seconds = (UPDATE_OBJECT_DAYS - REFRESH_AHEAD_DAYS) * 24 * 60 * 60
+    stats = {"refreshed": 0, "retrying": 0, "failed": 0, "max_lag_seconds": 0.0, "max_wait_seconds": 0.0, "seconds": 0.0}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="refresher") as pool:
+        while True:
+            claimed = db.claim_object_refreshes(batch_size, max_age_seconds, _REFRESH_LEASE_SECONDS)
+
+            if len(claimed) == 0:
+                break
+
+            for outcome, lag, waited in pool.map(_refresh_claimed, claimed):
+                stats[outcome] += 1
+                stats["max_lag_seconds"] = max(stats["max_lag_seconds"], lag)
+
+                if waited is not None:
+                    stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+
+            # Objects to be retried are hidden until their retry is due, so
+            # this ends once every due object has been tried.
+
+    stats["seconds"] = time.perf_counter() - start
+
+    if stats["refreshed"] + stats["retrying"] + stats["failed"] > 0:
+        print(f"Refreshed {stats['refreshed']} objects in {stats['seconds']:.1f}s "
+              f"({stats['retrying']} to be retried, {stats['failed']} failed, "
+              f"up to {stats['max_lag_seconds'] / 3600:.1f}h past stale)", flush=True)
+
+    return stats
+
+
+def run_refresh_scheduler(interval_seconds: float = None):
+    """ Refresh objects every interval, forever. Meant to be run in its own
+        process alongside the backend. Errors are printed and the next run
+        carries on as normal.
+
+    Args:
+        interval_seconds (float, optional): The seconds between the start of
+            each run. REFRESH_INTERVAL_SECONDS by default.
+    """
+    interval_seconds = REFRESH_INTERVAL_SECONDS if interval_seconds is None else interval_seconds
+
+    # The refresher's queries are brief and rare, so its threads share one connection
+    db.set_pool_size(1)
+
+    while True:
+        start = time.monotonic()
+
+        try:
+            refresh_objects()
+        except Exception as e:
+            print(f"Failed to refresh objects: {type(e).__name__}: {e}", flush=True)
+
+        time.sleep(max(interval_seconds - (time.monotonic() - start), 0))
+
+
+def start_refresh_scheduler() -> Process:
+    """ Start run_refresh_scheduler() in a background daemon process, unless
+        REFRESH_INTERVAL_SECONDS is 0. Only one is needed per deployment, so
+        this is called once by the gunicorn master (see gunicorn.conf.py), not
+        when the app is imported.
+
+    Returns:
+        Process: The scheduler process, or None if refreshing is turned off.
+    """
+    if REFRESH_INTERVAL_SECONDS <= 0:
+        return None
+
+    process = Process(target=run_refresh_scheduler, daemon=True)
+    process.start()
+    return process
+
+
+def get_object_refresh_stats() -> dict:
+    """ Retrieve how far refreshing stored objects has fallen behind.
+
+    Returns:
+        dict: See db_interface.get_object_refresh_stats().
+    """
+    return db.get_object_refresh_stats(UPDATE_OBJECT_DAYS * 24 * 60 * 60)
@@ -26,12 +26,16 @@ License Terms and Copyright:
 """
 
 
+import os
+import time
+
 from astropy.coordinates import SkyCoord
 
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, wait
 from datetime import datetime
 
-from model.constants import DEFAULT_RADIUS
-from model.ds.report_types import ReportResult
+from model.constants import DEFAULT_RADIUS, UPDATE_OBJECT_DAYS
+from model.ds.report_types import ReportResult, ReportResults
 from model.ds.search_filters import SearchFilters, DateFilter
 import model.db.db_interface as db
 from controller.search import query_simbad as qs
@@ -42,8 +46,15 @@ from controller.search import query_simbad as qs
 ###########################
 
 
-# The amount of days elapsed before updating an object. 
-UPDATE_OBJECT_DAYS: int = 60 
+# The most seconds a coordinate search waits for SIMBAD. Once it has passed,
+# the search returns the reports it could find, marked as degraded. 
+# Configured with the SEARCH_DEADLINE_SECONDS environment variable. 
+SEARCH_DEADLINE_SECONDS: float = float(os.getenv("SEARCH_DEADLINE_SECONDS", 20.0))
+
+
+# The number of objects a coordinate search looks up at once. 
+# Configured with the SEARCH_WORKERS environment variable. 
+SEARCH_WORKERS: int = int(os.getenv("SEARCH_WORKERS", 4))
 
 
 #####################
@@ -51,14 +62,123 @@ UPDATE_OBJECT_DAYS: int = 60
 #####################
 
 
+def _merge_reports(merged: dict[int, ReportResult], reports: list[ReportResult]):
+    ''' Add reports to a dictionary of results keyed by ATel number, skipping
+        any report already present. The dictionary keeps insertion order.
+
+    Args:
+        merged (dict[int, ReportResult]): the results so far, updated in-place
+        reports (list[ReportResult]): the reports to add
+    '''
+    for report in reports:
+        merged.setdefault(report.atel_num, report)
+
+
 def _sort_reports(reports: list[ReportResult]):
     ''' Sort a list of ReportResult objects in reverse chronological order. 
-        In-place sort.
+        Reports submitted at the same time are ordered by descending ATel
+        number, matching the order of the database finders. In-place sort.
 
     Args:
         reports (list[ReportResult]): the reports
     '''
-    reports.sort(key=lambda x: x.submission_date, reverse=True)
+    reports.sort(key=lambda x: (x.submission_date, x.atel_num), reverse=True)
+
+
+def _finder_args(limit: int, after: tuple[datetime, int], include_body: bool) -> dict:
+    ''' Keyword arguments passing the page of results and projection to the
+        database finders. Only options that differ from the finders' defaults
+        are included, so by default the finders return every matching report
+        in full. 
+
+    Args:
+        limit (int): the maximum number of reports to return, or None
+        after (tuple[datetime, int]): the (submission date, ATel number) cursor
+            to continue from, or None
+        include_body (bool): whether to retrieve report bodies
+
+    Returns:
+        dict: the keyword arguments
+    '''
+    args = dict()
+    if limit is not None:
+        args["limit"] = limit
+    if after is not None:
+        args["after"] = after
+    if not include_body:
+        args["include_body"] = False
+    return args
+
+
+def _page_results(reports: dict[int, ReportResult], limit: int) -> list[ReportResult]:
+    ''' Order merged results newest first and keep the first page. 
+        Each finder returns its own first page, so the first page of the merged
+        results is always among them. 
+
+    Args:
+        reports (dict[int, ReportResult]): the merged results
+        limit (int): the maximum number of reports to return, or None for all
+
+    Returns:
+        list[ReportResult]: the page of results
+    '''
+    results = list(reports.values())
+    _sort_reports(results)
+    if limit is not None:
+        del results[limit:]
+    return results
+
+
+def _remaining(deadline: float) -> float:
+    ''' The seconds left until a deadline. 
+
+    Args:
+        deadline (float): the deadline, as a time.monotonic() value
+
+    Returns:
+        float: the seconds left, or 0.0 if the deadline has passed
+    '''
+    return max(deadline - time.monotonic(), 0.0)
+
+
+def _search_object(search_filters: SearchFilters, date_filter: DateFilter, 
+                   key: str, object_coords: SkyCoord, aliases: list[str], 
+                   page: dict, deadline: float) -> list[ReportResult]:
+    ''' Store or update an object found on SIMBAD by a coordinate search, and 
+        retrieve the reports about it. Runs in the search's thread pool. 
+        The reports are not retrieved once the search's deadline has passed, 
+        as the search has already returned without them. 
+
+    Args:
+        search_filters (SearchFilters): filters for the frontend search
+        date_filter (DateFilter): date filter for the frontend search
+        key (str): the object's MAIN_ID
+        object_coords (SkyCoord): the object's coordinates
+        aliases (list[str]): the object's aliases
+        page (dict): the finder arguments, see _finder_args()
+        deadline (float): the time.monotonic() time the search returns by
+
+    Returns:
+        list[ReportResult]: the reports found about the object
+
+    Raises:
+        ObjectNotFoundError (from check_object_updates()). 
+        TimeoutError: if the deadline passed before the reports were retrieved. 
+    '''
+    exists, last_updated = db.object_exists(key) 
+    if exists:
+        check_object_updates(key, last_updated)
+    else:
+        # Add the newly discovered object to the local database, 
+        # unless another search has just done so. 
+        try:
+            db.add_object(key, object_coords, aliases)
+        except (db.ExistingObjectError, db.ExistingAliasError):
+            pass
+
+    if time.monotonic() > deadline:
+        raise TimeoutError(f"Search deadline passed before the reports about {key} were retrieved.")
+    return db.find_reports_by_object(search_filters, date_filter, key, **page)
 
 
 ####################
@@ -69,10 +189,23 @@ def _sort_reports(reports: list[ReportResult]):
 def search_reports_by_coords(search_filters: SearchFilters,
                              date_filter: DateFilter,
                              coords: SkyCoord, 
-                             radius: float=DEFAULT_RADIUS
-) -> list[ReportResult]:
+                             radius: float=DEFAULT_RADIUS,
+                             limit: int=None,
+                             after: tuple[datetime, int]=None,
+                             include_body: bool=True
+) -> ReportResults:
     """ Performs an immediate query of the SIMBAD database by the coordinate
         range and retrieves matching reports from the local database. 
+        The objects found are looked up concurrently, SEARCH_WORKERS at a time. 
+        If SIMBAD hasn't answered within SEARCH_DEADLINE_SECONDS, the search 
+        returns the reports it could find and is marked as degraded: 
+        - if the region query is too slow, the objects already stored in the 
+          range are searched for instead. 
+        - if an object's lookup is too slow or fails, it is searched for 
+          by the aliases already stored. 
+        Lookups still running at the deadline are not waited for. At most 
+        SEARCH_WORKERS of them finish in the background, storing their object, 
+        but they don't retrieve any reports, see _search_object(). 
 
     Args: 
         search_filters (SearchFilters): Filters for the frontend search. 
@@ -80,10 +213,17 @@ def search_reports_by_coords(search_filters: SearchFilters,
         coords (SkyCoord): The coordinates that define the region search criteria. 
         radius (float): The radius, in arcseconds, that defines the size of the
             region. 10.0 arcsecs by default. Should be validated beforehand. 
+        limit (int, optional): The maximum number of reports to return. All 
+            matching reports by default. 
+        after (tuple[datetime, int], optional): The (submission date, ATel number)
+            of the last report of the previous page, to continue from. 
+        include_body (bool, optional): Whether to retrieve report bodies. If 
+            False, the reports' bodies are None. True by default. 
 
     Returns:
-        list[ReportResult]: The reports found in the local database that match
-            the coordinate/region criteria. 
+        ReportResults: The reports found in the local database that match
+            the coordinate/region criteria, newest first, and whether the 
+            search was degraded. 
 
     Raises:
         QuerySimbadError: When the SIMBAD server is unavailable. The error is
@@ -95,44 +235,65 @@ def search_reports_by_coords(search_filters: SearchFilters,
     if search_filters is None and coords is None:
         raise ValueError("SearchFilters and coordinates cannot both be None.")
 
-    # Always query SIMBAD first. 
-    query_result = dict() 
-    if coords is not None:
-        query_result = qs.query_simbad_by_coords(coords, radius) 
-
-    reports: list[ReportResult] = [] 
-
-    # The 'key' is the MAIN_ID
-    for key, value in query_result.items():
-        exists, last_updated = db.object_exists(key) 
-        if exists:
-            check_object_updates(key, last_updated)
-        else:
-            # Query by name without aliases. 
-            name_query_result = qs.query_simbad_by_name(key, False)
-            if name_query_result is not None:
-                # Add the newly discovered object to the 
-                # local database. 
-                name, coords, _ = name_query_result
-                db.add_object(name, coords, value)
-        db_name_query = db.find_reports_by_object(search_filters, date_filter, key)
-
-        for r in db_name_query:
-            if r not in reports: reports.append(r) 
-
-    db_coord_query = db.find_reports_in_coord_range(search_filters, date_filter, coords, radius)
-    for report in db_coord_query:
-        if report not in reports: 
-            reports.append(report)
-
-    _sort_reports(reports)
-    return reports
+    deadline = time.monotonic() + SEARCH_DEADLINE_SECONDS
+    degraded = False
+    reports: dict[int, ReportResult] = dict()
+    page = _finder_args(limit, after, include_body)
+
+    # Lookups still running at the deadline are left to finish storing their 
+    # object in the background, and lookups not yet started are cancelled. 
+    pool = ThreadPoolExecutor(max_workers=max(SEARCH_WORKERS, 1), thread_name_prefix="search")
+
+    try:
+        # Always query SIMBAD first. 
+        # The coordinates and aliases of each object are returned together. 
+        query_result = [] 
+        stored_objects = []
+        if coords is not None:
+            try:
+                query_result = pool.submit(qs.query_simbad_region, coords, radius).result(_remaining(deadline))
+            except TimeoutError:
+                degraded = True
+                stored_objects = db.find_objects_in_coord_range(coords, radius)
+
+        # The 'key' is the MAIN_ID
+        lookups = [(key, pool.submit(_search_object, search_filters, date_filter, key, object_coords, aliases, page, deadline)) 
+                   for key, object_coords, aliases in query_result]
+        wait([lookup for _, lookup in lookups], _remaining(deadline))
+
+        for key, lookup in lookups:
+            try:
+                db_name_query = lookup.result(0)
+            except Exception as e:
+                # Any failed lookup degrades the search rather than failing it. 
+                if not isinstance(e, (TimeoutError, qs.QuerySimbadError)):
+                    print(f"Failed to look up {key}: {type(e).__name__}: {e}", flush=True)
+                degraded = True
+                stored_objects.append(key)
+                continue
+            _merge_reports(reports, db_name_query)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    # Objects that couldn't be looked up in time are searched for by 
+    # the aliases already stored. 
+    for key in stored_objects:
+        db_name_query = db.find_reports_by_object(search_filters, date_filter, key, **page)
+        _merge_reports(reports, db_name_query)
+
+    db_coord_query = db.find_reports_in_coord_range(search_filters, date_filter, coords, radius, **page)
+    _merge_reports(reports, db_coord_query)
+
+    return ReportResults(_page_results(reports, limit), degraded)
 
 
 def search_reports_by_name(
     search_filters: SearchFilters = None,
     date_filter: DateFilter = None,
-    name: str = None
+    name: str = None,
+    limit: int = None,
+    after: tuple[datetime, int] = None,
+    include_body: bool = True
 ) -> list[ReportResult]:
     """ Query the local database and the SIMBAD database by an object identifier
         and return the reports that match. 
@@ -141,10 +302,16 @@ def search_reports_by_name(
         search_filters (SearchFilters): Filters for the front-end search. 
         date_filter (DateFilter, optional): Date filter for the front-end search. 
         name (str): The object identifier. 
+        limit (int, optional): The maximum number of reports to return. All 
+            matching reports by default. 
+        after (tuple[datetime, int], optional): The (submission date, ATel number)
+            of the last report of the previous page, to continue from. 
+        include_body (bool, optional): Whether to retrieve report bodies. If 
+            False, the reports' bodies are None. True by default. 
 
     Returns:
         list[ReportResult]: The reports found in the local database that match
-            the name.
+            the name, newest first.
 
     Raises:
         QuerySimbadError: If there is an issue connecting to the SIMBAD server. 
@@ -185,35 +352,87 @@ def search_reports_by_name(
     # for all reports. 
 
     # Get the base reports from the database. 
-    reports = db.find_reports_by_object(search_filters, date_filter, name)
+    reports: dict[int, ReportResult] = dict()
+    page = _finder_args(limit, after, include_body)
+    _merge_reports(reports, db.find_reports_by_object(search_filters, date_filter, name, **page))
 
     if coordinates is not None:
-        by_coord_range = db.find_reports_in_coord_range(search_filters, date_filter, coordinates, DEFAULT_RADIUS)
+        by_coord_range = db.find_reports_in_coord_range(search_filters, date_filter, coordinates, DEFAULT_RADIUS, **page)
         if by_coord_range is not None:
             # Append the list with reports with the same coordinates. 
-            for additional_report in by_coord_range:
-                if not additional_report in reports:
-                    reports.append(additional_report)
+            _merge_reports(reports, by_coord_range)
+
+    return _page_results(reports, limit)
+
+
+def count_reports_by_name(
+    search_filters: SearchFilters = None,
+    date_filter: DateFilter = None,
+    name: str = None
+) -> int:
+    """ Estimate the total number of reports search_reports_by_name() would
+        return, using the local database only. Should be called after the 
+        search, which adds the object to the local database if needed. 
+
+    Args:
+        search_filters (SearchFilters): Filters for the front-end search. 
+        date_filter (DateFilter, optional): Date filter for the front-end search. 
+        name (str): The object identifier. 
+
+    Returns:
+        int: The estimated number of matching reports. 
+    """
+    if name is None:
+        return db.count_reports(search_filters, date_filter)
+
+    try:
+        coordinates = db.get_object_coords(name)
+    except db.ObjectNotFoundError:
+        return 0
+
+    return db.count_reports(search_filters, date_filter, [name], coordinates, DEFAULT_RADIUS)
+
+
+def count_reports_by_coords(search_filters: SearchFilters,
+                            date_filter: DateFilter,
+                            coords: SkyCoord, 
+                            radius: float=DEFAULT_RADIUS
+) -> int:
+    """ Estimate the total number of reports search_reports_by_coords() would
+        return, using the local database only. The objects SIMBAD found in
+        the region are taken to be the stored objects within it. 
+
+    Args: 
+        search_filters (SearchFilters): Filters for the frontend search. 
+        date_filter (DateFilter): Date filter for the frontend search.
+        coords (SkyCoord): The coordinates that define the region search criteria. 
+        radius (float): The radius, in arcseconds, that defines the size of the
+            region. 10.0 arcsecs by default. 
+
+    Returns:
+        int: The estimated number of matching reports. 
+    """
+    if coords is None:
+        return db.count_reports(search_filters, date_filter)
 
-    _sort_reports(reports)
-    return reports
+    object_ids = db.find_objects_in_coord_range(coords, radius)
+    return db.count_reports(search_filters, date_filter, object_ids, coords, radius)
 
 
 def check_object_updates(name: str, last_updated: datetime):
     """ Check if an object, specified by its identifier, requires an update. 
         (i.e., more than 60 days have elapsed since its last update). If so, 
-        update the object. 
+        queue the object to be refreshed in the background and carry on with
+        the stored aliases, rather than waiting on SIMBAD. See refresher.py. 
     
     Args: 
         name (str): The object's identifier. 
         last_updated (datetime): The last updated date. 
 
     Raises:
-        QuerySimbadError (from query_simbad.get_aliases()). 
-        ObjectNotFoundError (from db_interface.add_aliases())
+        ObjectNotFoundError (from db_interface.request_object_refresh())
     """
     diff = datetime.today() - last_updated
     if diff.days >= UPDATE_OBJECT_DAYS:
-        # The object requires updating, check for its aliases. 
-        aliases = qs.get_aliases(name)
-        db.add_aliases(name, aliases)
\ No newline at end of file
+        # The object requires updating, serve it stale until it is refreshed. 
+        db.request_object_refresh(name)
\ No newline at end of file
@@ -0,0 +1,18 @@
+import argparse
+from model.db.db_interface import retry_failed_enrichments, set_pool_size
+from controller.importer.enricher import drain_enrichment_queue
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(description="Look up the objects near queued report coordinates on SIMBAD")
+    my_parser.add_argument("--workers", action="store", type=int, help="number of threads querying SIMBAD, defaults to SIMBAD_ENRICH_WORKERS")
+    my_parser.add_argument("--retry-failed", action="store_true", help="queue coordinates that were given up on again before draining the queue")
+
+    args = my_parser.parse_args()
+
+    # The enrichment threads' queries are brief, so they share one connection rather than holding a full pool alongside the backend
+    set_pool_size(1)
+
+    if args.retry_failed:
+        print(f"Queued {retry_failed_enrichments()} failed coordinates again")
+
+    drain_enrichment_queue(args.workers)
@@ -0,0 +1,12 @@
+"""
+Gunicorn settings for the backend.
+Background work that only one process should run is started here, by the gunicorn master, rather than when each worker imports the app.
+"""
+
+
+def when_ready(server):
+    # Imported here, as the app's directory is only added to the import path once this file has been loaded
+    from controller.search.refresher import start_refresh_scheduler
+
+    # Refreshes stale objects on a schedule, so searches can serve them without waiting on SIMBAD
+    start_refresh_scheduler()
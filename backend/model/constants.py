@@ -104,3 +104,12 @@ DEFAULT_RADIUS: float = 10.0
 
 # The unit used for the radius of a coordinate search.
 RADIUS_UNIT: str = "arcsecond"
+
+
+# The largest page of results a search can request.
+MAX_PAGE_SIZE: int = 1000
+
+
+# The amount of days elapsed before updating an object.
+# Cached SIMBAD responses are kept for the same amount of time by default.
+UPDATE_OBJECT_DAYS: int = 60
@@ -28,11 +28,11 @@ import mysql.connector
 from mysql.connector.cursor import MySQLCursor
 
 from model.constants import FIXED_KEYWORDS
-from model.db.db_interface import _connect
+from model.db.db_interface import _connection, _COORDS_ZONES_PER_DEGREE
 
 # Constants
 
-_LATEST_SCHEMA_VERSION: int = 8
+_LATEST_SCHEMA_VERSION: int = 9
 """ 
 Version number of the latest database schema.
 This must be increased every time the schema is upgraded.
@@ -130,10 +130,6 @@ def _create_db():
     """
     Connects to the database and creates the schema if not already created.
     """
-    # Connect to mysql server
-    cn = _connect()
-    cur: MySQLCursor = cn.cursor()
-
     # Load table schema from file
     user_table = _read_table("AdminUsers")
     reports_table = _read_table("Reports")
@@ -143,35 +139,42 @@ def _create_db():
     aliases_table = _read_table("Aliases")
     report_refs_table = _read_table("ReportRefs")
     report_coords_table = _read_table("ReportCoords")
+    report_keywords_table = _read_table("ReportKeywords")
     ob_dates_table = _read_table("ObservationDates")
+    enrichment_queue_table = _read_table("EnrichmentQueue")
+    simbad_cache_table = _read_table("SimbadCache")
 
     # Add keywords to reports schema
     sep = "', '"
     kw_set = sep.join(FIXED_KEYWORDS)
     reports_table = reports_table.format(kw_set)
 
-    try:
-        # Add tables
-        cur.execute(user_table)
-        cur.execute(reports_table)
-        cur.execute(metadata_table)
-        cur.execute(objects_table)
-        cur.execute(object_refs_table)
-        cur.execute(aliases_table)
-        cur.execute(report_refs_table)
-        cur.execute(report_coords_table)
-        cur.execute(ob_dates_table)
-
-        #Add single metadata entry
-        cur.execute(
-            "insert into Metadata (metadata, schemaVersion) values ('metadata', %s);", (_LATEST_SCHEMA_VERSION,))
-    except mysql.connector.Error as err:
-        print(err.msg)
-    finally:
-        # Close connection
-        cn.commit()
-        cur.close()
-        cn.close()
+    # Connect to mysql server
+    with _connection() as cn:
+        cur: MySQLCursor = cn.cursor()
+        try:
+            # Add tables
+            cur.execute(user_table)
+            cur.execute(reports_table)
+            cur.execute(metadata_table)
+            cur.execute(objects_table)
+            cur.execute(object_refs_table)
+            cur.execute(aliases_table)
+            cur.execute(report_refs_table)
+            cur.execute(report_coords_table)
+            cur.execute(report_keywords_table)
+            cur.execute(ob_dates_table)
+            cur.execute(enrichment_queue_table)
+            cur.execute(simbad_cache_table)
+
+            #Add single metadata entry
+            cur.execute(
+                "insert into Metadata (metadata, schemaVersion) values ('metadata', %s);", (_LATEST_SCHEMA_VERSION,))
+        except mysql.connector.Error as err:
+            print(err.msg)
+        finally:
+            cn.commit()
+            cur.close()
 
 
 def _upgrade_db(old_schema_version: int):
@@ -183,10 +186,6 @@ def _upgrade_db(old_schema_version: int):
         old_schema_version (int): The schema version to upgrade from.
     """
 
-    # Connect to mysql server
-    cn = _connect()
-    cur: MySQLCursor = cn.cursor()
-
     # Load table upgrade schema from file
     user_table = _read_table_upgrade("AdminUsers")
     reports_table = _read_table_upgrade("Reports")
@@ -196,34 +195,73 @@ def _upgrade_db(old_schema_version: int):
     aliases_table = _read_table_upgrade("Aliases")
     report_refs_table = _read_table_upgrade("ReportRefs")
     report_coords_table = _read_table_upgrade("ReportCoords")
+    report_keywords_table = _read_table_upgrade("ReportKeywords")
     ob_dates_table = _read_table_upgrade("ObservationDates")
+    enrichment_queue_table = _read_table_upgrade("EnrichmentQueue")
+    simbad_cache_table = _read_table_upgrade("SimbadCache")
 
     metadata_query = ("update Metadata "
                       "set schemaVersion = %s;")
 
-    try:
-        # Alter tables
-        cur.execute(user_table)
-        cur.execute(reports_table)
-        cur.execute(metadata_table)
-        cur.execute(objects_table)
-        cur.execute(object_refs_table)
-        cur.execute(aliases_table)
-        cur.execute(report_refs_table)
-        cur.execute(report_coords_table)
-        cur.execute(ob_dates_table)
-
-        #Update version
-        cur.execute(metadata_query, (_LATEST_SCHEMA_VERSION,))
-
-        _warn_schema_upgraded(old_schema_version)
-    except mysql.connector.Error as err:
-        print(err.msg)
-    finally:
-        # Close connection
-        cn.commit()
-        cur.close()
-        cn.close()
+    # Connect to mysql server
+    with _connection() as cn:
+        cur: MySQLCursor = cn.cursor()
+        try:
+            # Alter tables
+            cur.execute(user_table)
+            cur.execute(reports_table)
+            cur.execute(metadata_table)
+            cur.execute(objects_table)
+            cur.execute(object_refs_table)
+            cur.execute(aliases_table)
+            cur.execute(report_refs_table)
+            cur.execute(report_coords_table)
+            cur.execute(report_keywords_table)
+            cur.execute(ob_dates_table)
+            cur.execute(enrichment_queue_table)
+            cur.execute(simbad_cache_table)
+
+            # Index existing coordinates and keywords
+            _backfill_dec_zones(cur)
+            _backfill_report_keywords(cur)
+
+            #Update version
+            cur.execute(metadata_query, (_LATEST_SCHEMA_VERSION,))
+
+            _warn_schema_upgraded(old_schema_version)
+        except mysql.connector.Error as err:
+            print(err.msg)
+        finally:
+            cn.commit()
+            cur.close()
+
+
+def _backfill_dec_zones(cur: MySQLCursor):
+    """
+    Calculates the declination zone of stored coordinates that have not been indexed.
+    This matches db_interface._dec_zone(), which calculates the zone of newly added coordinates.
+
+    Args:
+        cur (MySQLCursor): Cursor on the connection holding the upgrade transaction.
+    """
+    for table in ("ReportCoords", "Objects"):
+        cur.execute(f"update {table} "
+                    "set decZone = floor((declination + 90) * %s) "
+                    "where decZone is null;", (_COORDS_ZONES_PER_DEGREE,))
+
+
+def _backfill_report_keywords(cur: MySQLCursor):
+    """
+    Adds the keywords of stored reports that have not been indexed to the ReportKeywords table.
+    Keyword IDs are their index in FIXED_KEYWORDS, matching db_interface._keyword_id().
+
+    Args:
+        cur (MySQLCursor): Cursor on the connection holding the upgrade transaction.
+    """
+    for keyword_id, keyword in enumerate(FIXED_KEYWORDS):
+        cur.execute("insert ignore into ReportKeywords (atelNumFK, keywordID) "
+                    "select atelNum, %s from Reports "
+                    "where FIND_IN_SET(%s, keywords) > 0;", (keyword_id, keyword))
 
 
 def _get_schema_version() -> int:
@@ -234,29 +272,25 @@ def _get_schema_version() -> int:
         int: Version number of the current schema or None if the database is not created.
     """
 
-    cn = _connect()
-    cur: MySQLCursor = cn.cursor()
-
-    # Check if the database was created.
-    cur.execute(f"show tables like 'Metadata';")
-    exists_result = cur.fetchone()
+    query = "select schemaVersion from Metadata"
 
-    # If the database is not created return none.
-    if exists_result is None:
-        return None
+    with _connection() as cn:
+        cur: MySQLCursor = cn.cursor()
+        try:
+            # Check if the database was created.
+            cur.execute(f"show tables like 'Metadata';")
+            exists_result = cur.fetchone()
 
-    query = "select schemaVersion from Metadata"
+            # If the database is not created return none.
+            if exists_result is None:
+                return None
 
-    try:
-        cur.execute(query)
-        result = cur.fetchone()
+            cur.execute(query)
+            result = cur.fetchone()
 
-        ver = result[0]
-    except mysql.connector.Error as e:
-        raise e
-    finally:
-        cur.close()
-        cn.close()
+            ver = result[0]
+        finally:
+            cur.close()
 
     return ver
 
@@ -269,26 +303,26 @@ def _reset_db():
     
     WARNING: This function will DELETE ALL stored application data.
     """
-    cn = _connect()
-    cur: MySQLCursor = cn.cursor()
-
-    try:
-        cur.execute("drop table AdminUsers;")
-        cur.execute("drop table Metadata;")
-        cur.execute("drop table ObjectRefs;")
-        cur.execute("drop table Aliases;")
-        cur.execute("drop table ObservationDates;")
-        cur.execute("drop table ReportCoords;")
-        cur.execute("drop table ReportRefs;")
-        cur.execute("drop table Reports;")
-        cur.execute("drop table Objects;")
-    except mysql.connector.Error as err:
-        print(err.msg)
-    finally:
-        # Close connection
-        cn.commit()
-        cur.close()
-        cn.close()
+    with _connection() as cn:
+        cur: MySQLCursor = cn.cursor()
+        try:
+            cur.execute("drop table AdminUsers;")
+            cur.execute("drop table Metadata;")
+            cur.execute("drop table ObjectRefs;")
+            cur.execute("drop table Aliases;")
+            cur.execute("drop table ObservationDates;")
+            cur.execute("drop table ReportCoords;")
+            cur.execute("drop table ReportKeywords;")
+            cur.execute("drop table ReportRefs;")
+            cur.execute("drop table Reports;")
+            cur.execute("drop table Objects;")
+            cur.execute("drop table EnrichmentQueue;")
+            cur.execute("drop table SimbadCache;")
+        except mysql.connector.Error as err:
+            print(err.msg)
+        finally:
+            cn.commit()
+            cur.close()
 
     _create_db()
 
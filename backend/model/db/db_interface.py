@@ -23,21 +23,119 @@ License Terms and Copyright:
     You should have received a copy of the GNU Affero General Public License
     along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+import math
 import os
+import re
+import threading
+import time
+from typing import Iterator
+
+import numpy as np
 
 from astropy.coordinates import SkyCoord
-from astropy.coordinates.angles import Angle
 import mysql.connector
 from mysql.connector import errorcode
 from mysql.connector.connection import MySQLConnection
 from mysql.connector.cursor import MySQLCursor
+from mysql.connector.pooling import MySQLConnectionPool, CNX_POOL_MAXSIZE
 
 from model.ds.report_types import ImportedReport, ReportResult
 from model.ds.search_filters import SearchFilters, DateFilter, KeywordMode
 from model.ds.alias_result import AliasResult
+from model.ds.alias_matcher import AliasMatcher
+from model.constants import FIXED_KEYWORDS, valid_keyword
 from controller.helper.type_checking import list_is_type
 
+# Constants
+
+_POOL_SIZE: int = min(int(os.getenv("MYSQL_POOL_SIZE", 8)), CNX_POOL_MAXSIZE)
+"""
+Number of connections held open by each process's connection pool. The pool opens all of them as soon as the process first uses the database.
+Helper processes, such as parsing workers, the object refresher and enrich.py, hold fewer, see set_pool_size().
+Configured with the MYSQL_POOL_SIZE environment variable, capped at the mysql-connector maximum of 32.
+
+The MySQL server's max_connections (151 by default) must cover every gunicorn worker and background import process at MYSQL_POOL_SIZE each, plus one for each helper process.
+"""
+
+_POOL_TIMEOUT: float = float(os.getenv("MYSQL_POOL_TIMEOUT", 30.0))
+"""
+Seconds to wait for a free connection when the pool is exhausted before giving up.
+Configured with the MYSQL_POOL_TIMEOUT environment variable.
+"""
+
+_POOL_RETRY_DELAY: float = 0.05
+"""
+Seconds to sleep between attempts to take a connection from an exhausted pool.
+"""
+
+_SQL_BATCH_SIZE: int = 1000
+"""
+Maximum number of rows written by a single multi-row insert statement, or values listed in a single "in (...)" clause.
+"""
+
+_REPORT_INSERT_QUERY: str = ("insert into Reports "
+                             "(atelNum, title, authors, body, submissionDate, keywords) "
+                             "values (%s, %s, %s, %s, %s, %s)")
+
+_METADATA_UPDATED_QUERY: str = ("update Metadata "
+                                "set lastUpdatedDate = CURDATE()")
+
+_COORDS_BOX_MARGIN: float = 1e-6
+"""
+Padding, in degrees, added to the bounding box used to prefilter coordinate searches.
+"""
+
+_COORDS_ZONES_PER_DEGREE: int = 10
+"""
+Number of declination zones per degree used to index stored coordinates, see _dec_zone().
+Changing this requires the decZone column of ReportCoords and Objects to be recalculated.
+"""
+
+_TERM_SEARCH_MODE: str = os.getenv("TERM_SEARCH_MODE", "fulltext")
+"""
+How search terms and aliases are matched against report titles and bodies, see _build_term_clause().
+Configured with the TERM_SEARCH_MODE environment variable, either "fulltext" (default) or "substring".
+"""
+
+_FULLTEXT_MIN_TOKEN_SIZE: int = 3
+"""
+Shortest word stored in the full-text index, matching the InnoDB default innodb_ft_min_token_size.
+"""
+
+_FULLTEXT_STOPWORDS: frozenset[str] = frozenset((
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en", "for", "from", "how", "i", "in", "is", "it",
+    "la", "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where", "who", "will", "with", "und", "www"
+))
+"""
+Words not stored in the full-text index, matching the InnoDB default stopword list.
+"""
+
+_FULLTEXT_TOKEN_REGEX: re.Pattern = re.compile(r"\w+")
+"""
+Matches the words of a search term, as split by the full-text parser.
+"""
+
+_ALIAS_MATCHER_MAX_AGE: float = float(os.getenv("ALIAS_MATCHER_MAX_AGE", 300.0))
+"""
+Seconds a process keeps its alias matcher before reloading it, picking up aliases added by other processes.
+Aliases added by this process are added to the matcher straight away.
+Configured with the ALIAS_MATCHER_MAX_AGE environment variable.
+"""
+
+# Connection pool state (one pool per process, see _get_pool())
+_pool: MySQLConnectionPool = None
+_pool_pid: int = None
+_pool_size: int = _POOL_SIZE
+_pool_lock = threading.Lock()
+_pool_stats: dict = {}
+
+# Alias matcher state (see get_alias_matcher())
+_alias_matcher: AliasMatcher = None
+_alias_matcher_loaded: float = None
+_alias_matcher_lock = threading.Lock()
+
 # Public functions
 def get_hashed_password(username: str) -> str:
     """
@@ -52,14 +150,12 @@ def get_hashed_password(username: str) -> str:
     Raises:
         UserNotFoundError: When the specified user is not found in the database. This can be avoided by calling the userExists() method beforehand.
     """
-    # Connect to mysql server
-    cn = _connect()
-    cur: MySQLCursor = cn.cursor()
-
     query = "select passwordHash from AdminUsers where username = %s"
 
-    cur.execute(query, (username,))
-    result = cur.fetchone()
+    # Connect to mysql server
+    with _cursor() as cur:
+        cur.execute(query, (username,))
+        result = cur.fetchone()
 
     if result is not None:
         return result[0]
@@ -96,27 +192,20 @@ def add_admin_user(username: str, password: str):
 
     # Check length is valid
     if len(username) in range(1, 25) and len(password) in range(1, 255):
-        # connect to database
-        cn = _connect()
-        cur: MySQLCursor = cn.cursor()
-
         # setup query
         query = "insert into AdminUsers" " (username, passwordHash)" " values (%s, %s)"
 
         data = (username, password)
 
-        # execute query and handle errors
-        try:
-            cur.execute(query, data)
-        except mysql.connector.Error as e:
-            if e.errno == errorcode.ER_DUP_ENTRY:
-                raise ExistingUserError()
-            else:
-                raise e
-        finally:
-            cn.commit()
-            cur.close()
-            cn.close()
+        # connect to database, execute query and handle errors
+        with _cursor(commit=True) as cur:
+            try:
+                cur.execute(query, data)
+            except mysql.connector.Error as e:
+                if e.errno == errorcode.ER_DUP_ENTRY:
+                    raise ExistingUserError()
+                else:
+                    raise e
     else:
         raise ValueError(
             "Specified username and password must be valid lengths and non-empty."
@@ -126,6 +215,7 @@ def add_admin_user(username: str, password: str):
 def add_report(report: ImportedReport):
     """
     Stores a new report in the database with all the fields specified in the given report object. This method also creates relational records between reports and objects, related reports and coordinates.
+    The report and all of its relations are written in a single transaction, along with queueing its coordinates for enrichment.
 
     Args:
         report (ImportedReport): The report to be stored in the database.
@@ -133,120 +223,125 @@ def add_report(report: ImportedReport):
     Raises:
         ExistingReportError: When the ATel number of the specified report is already associated with a report stored in the database.
     """
-    
-    # Format keywords
-    sep = ','
-    keywords = sep.join(report.keywords)  
-    sub_date = report.submission_date.strftime("%Y-%m-%d %H:%M:%S")
+    with _connection() as cn:
+        cur: MySQLCursor = cn.cursor()
+        try:
+            # Execute query and handle errors
+            try:
+                cur.execute(_REPORT_INSERT_QUERY, _report_row(report))
+            except mysql.connector.Error as e:
+                if e.errno == errorcode.ER_DUP_ENTRY:
+                    raise ExistingReportError()
+                else:
+                    raise e
+
+            _insert_report_relations(cur, [report])
+            _queue_enrichment(cur, [report])
+            cur.execute(_METADATA_UPDATED_QUERY)
+
+            cn.commit()
+        finally:
+            cur.close()
 
-    report_query = ("insert into Reports "
-                    "(atelNum, title, authors, body, submissionDate, keywords) "
-                    "values (%s, %s, %s, %s, %s, %s)")
 
-    data = (report.atel_num, report.title, report.authors, report.body, sub_date, keywords)
+def add_reports(reports: list[ImportedReport]) -> list[int]:
+    """
+    Stores a batch of new reports in the database, along with their relations to objects, related reports, observation dates and coordinates.
+    The whole batch is written in a single transaction using multi-row inserts, along with queueing the coordinates of the new reports for enrichment. Reports that are already stored in the database are skipped.
+
+    Args:
+        reports (list[ImportedReport]): The reports to be stored in the database.
 
-    metadata_query = ("update Metadata "
-                      "set lastUpdatedDate = CURDATE()")                
+    Returns:
+        list[int]: The ATel numbers of the reports that were added.
 
-    cn = _connect()
-    try:
-        # Execute query and handle errors
-        cur:MySQLCursor = cn.cursor()
+    Raises:
+        ExistingReportError: When another process adds one of the reports while the batch is being written. None of the batch is stored.
+    """
+    # Drop repeated ATel numbers within the batch, keeping the first.
+    unique_reports = []
+    seen = set()
+    for report in reports:
+        if report.atel_num not in seen:
+            seen.add(report.atel_num)
+            unique_reports.append(report)
+
+    if not unique_reports:
+        return []
+
+    with _connection() as cn:
+        cur: MySQLCursor = cn.cursor()
         try:
-            cur.execute(report_query, data)
-            cur.execute(metadata_query)
-        except mysql.connector.Error as e:
-            if e.errno == errorcode.ER_DUP_ENTRY:
-                raise ExistingReportError()
-            else:
-                raise e
-        finally:
+            # Skip reports that are already stored.
+            existing = _existing_atel_nums(cur, [report.atel_num for report in unique_reports])
+            new_reports = [report for report in unique_reports if report.atel_num not in existing]
+
+            if new_reports:
+                try:
+                    _insert_many(cur, _REPORT_INSERT_QUERY, [_report_row(report) for report in new_reports])
+                except mysql.connector.Error as e:
+                    if e.errno == errorcode.ER_DUP_ENTRY:
+                        raise ExistingReportError()
+                    else:
+                        raise e
+
+                _insert_report_relations(cur, new_reports)
+                _queue_enrichment(cur, new_reports)
+                cur.execute(_METADATA_UPDATED_QUERY)
+
             cn.commit()
-            
-        # Add object relations
-        object_ref_query = ("insert into ObjectRefs"
-                            "(atelNumFK, objectIDFK) "
-                            "values (%s, %s)")
-        for object_id in report.objects:
-            try:  
-                object_ref_data = (report.atel_num, object_id)
-                cur.execute(object_ref_query, object_ref_data)
-            except mysql.connector.Error as e:
-                if e.errno == errorcode.ER_DUP_ENTRY:
-                    pass  # ignore any duplicate references
-                else:
-                    raise e
-            finally:
-                cn.commit()
+        finally:
+            cur.close()
 
-        # Add observation dates
-        ob_date_query = ("insert into ObservationDates"
-                         "(atelNumFK, obDate) "
-                         "values (%s, %s)")
-        for date in report.observation_dates:
-            try:
-                ob_date_data = (report.atel_num, date)
-                cur.execute(ob_date_query, ob_date_data)
-            except mysql.connector.Error as e:
-                if e.errno == errorcode.ER_DUP_ENTRY:
-                    pass  # ignore any duplicate references
-                else:
-                    raise e
-            finally:
-                cn.commit()
-            
+    return [report.atel_num for report in new_reports]
 
-        # Convert and add coordinates.
-        coords_query = ("insert into ReportCoords"
-                        "(atelNumFK, ra, declination) "
-                        "values (%s, %s, %s)")
-        for coord in report.coordinates:
-            try:
-                #TODO - check correct coord format
-                coords_data = (report.atel_num, round(coord.ra.deg, 10), round(coord.dec.deg, 10))
-                cur.execute(coords_query, coords_data)
-            except mysql.connector.Error as e:
-                if e.errno == errorcode.ER_DUP_ENTRY:
-                    pass  # ignore any duplicate coordinates
-                else:
-                    raise e
-            finally:
-                cn.commit()
 
-        # Add referenced reports
-        ref_report_query = ("insert into ReportRefs"
-                        "(atelNum, refReport) "
-                        "values (%s, %s)")
-        for other_report in report.referenced_reports:
-            try:
-                ref_report_data = (report.atel_num, other_report)
-                cur.execute(ref_report_query, ref_report_data)
-            except mysql.connector.Error as e:
-                if e.errno == errorcode.ER_DUP_ENTRY:
-                    pass  # ignore any duplicate references
-                else:
-                    raise e
-            finally:
-                cn.commit()
+def replace_reports(reports: list[ImportedReport], enrich: bool = False) -> int:
+    """
+    Stores a batch of reports in the database, replacing any stored reports with the same ATel numbers along with all of their relations to objects, related reports, observation dates, coordinates and keywords.
+    The whole batch is written in a single transaction, so searches never see a report without its relations.
 
-        # Add referenced by
-        for other_report in report.referenced_by:
-            try:
-                ref_by_data = (other_report, report.atel_num)
-                cur.execute(ref_report_query, ref_by_data)
-            except mysql.connector.Error as e:
-                if e.errno == errorcode.ER_DUP_ENTRY:
-                    pass  # ignore any duplicate references
-                else:
-                    raise e
-            finally:
-                cn.commit()
+    Args:
+        reports (list[ImportedReport]): The reports to be stored in the database.
+        enrich (bool, optional): Whether to queue the coordinates of the reports for enrichment.
 
-    except mysql.connector.Error as e:
-        raise e
-    finally:
-        cur.close()
-        cn.close()
+    Returns:
+        int: The number of stored reports that were replaced.
+    """
+    # Keep the last of any repeated ATel numbers within the batch.
+    unique_reports = list({report.atel_num: report for report in reports}.values())
+
+    if not unique_reports:
+        return 0
+
+    atel_nums = [report.atel_num for report in unique_reports]
+    replaced = 0
+
+    with _connection() as cn:
+        cur: MySQLCursor = cn.cursor()
+        try:
+            # Removing a report cascades to its objects, observation dates, coordinates and keywords.
+            for i in range(0, len(atel_nums), _SQL_BATCH_SIZE):
+                batch = tuple(atel_nums[i:i + _SQL_BATCH_SIZE])
+                in_list = _build_in_list(len(batch))
+
+                cur.execute(f"delete from Reports where atelNum in {in_list}", batch)
+                replaced += cur.rowcount
+                cur.execute(f"delete from ReportRefs where atelNum in {in_list}", batch)
+
+            _insert_many(cur, _REPORT_INSERT_QUERY, [_report_row(report) for report in unique_reports])
+            _insert_report_relations(cur, unique_reports)
+
+            if enrich:
+                _queue_enrichment(cur, unique_reports)
+
+            cur.execute(_METADATA_UPDATED_QUERY)
+
+            cn.commit()
+        finally:
+            cur.close()
+
+    return replaced
 
 
 def report_exists(atel_num: int) -> bool:
@@ -262,6 +357,33 @@ def report_exists(atel_num: int) -> bool:
     return _record_exists("Reports","atelNum",atel_num)
 
 
+def get_report(atel_num: int) -> ReportResult:
+    """
+    Retrieves the stored report with the specified ATel number, including its body.
+
+    Args:
+        atel_num (int): The ATel number of the report to retrieve.
+
+    Returns:
+        ReportResult: The report.
+
+    Raises:
+        ReportNotFoundError: Raised when no report with the specified ATel number is stored in the database.
+    """
+    select_clause, from_clause = _build_report_base_query()
+    query = select_clause + from_clause + "where atelNum = %s"
+
+    with _cursor() as cur:
+        cur.execute(query, (int(atel_num),))
+        row = cur.fetchone()
+
+    if row is None:
+        raise ReportNotFoundError(f"Report {atel_num} is not stored in the database.")
+
+    report = ReportResult(row[0], row[1], row[2], row[3], row[4])
+    return _populate_referenced_reports([report])[0]
+
+
 def get_all_aliases() -> list[AliasResult]:
     """
     Retrieves a list of all object aliases stored in the database and their associated object IDs.
@@ -269,14 +391,11 @@ def get_all_aliases() -> list[AliasResult]:
     Returns:
         list[AliasResult]: A list of AliasResult objects, containing aliases and their associated object ID.
     """
-    cn = _connect()
-    cur: MySQLCursor = cn.cursor()
-
     query = "select alias, objectIDFK from Aliases"
 
     aliases = []
 
-    try:
+    with _cursor() as cur:
         cur.execute(query)
         for row in cur.fetchall():
             #extract data
@@ -286,15 +405,43 @@ def get_all_aliases() -> list[AliasResult]:
             #create result object and add to list
             alias_result = AliasResult(atel_num,object_ID)
             aliases.append(alias_result)
-    except mysql.connector.Error as e:
-        raise e
-    finally:
-        cur.close()
-        cn.close()
 
     return aliases
 
 
+def get_alias_matcher() -> AliasMatcher:
+    """
+    Retrieves a matcher for all object aliases stored in the database, used to find the objects mentioned in reports.
+    The matcher is loaded once and shared by the process. Aliases added by this process are added to it as they are stored, and it is reloaded every so often to pick up aliases added by other processes.
+
+    Returns:
+        AliasMatcher: Matcher for every stored alias and its object ID.
+    """
+    global _alias_matcher, _alias_matcher_loaded
+
+    with _alias_matcher_lock:
+        if _alias_matcher is None or time.monotonic() - _alias_matcher_loaded > _ALIAS_MATCHER_MAX_AGE:
+            _alias_matcher = AliasMatcher(get_all_aliases())
+            _alias_matcher_loaded = time.monotonic()
+
+        return _alias_matcher
+
+
+def set_alias_matcher(matcher: AliasMatcher):
+    """
+    Sets the alias matcher shared by the current process, which is then kept for the life of the process instead of being reloaded.
+    Parsing worker processes are given the matcher loaded by the process that started them, so they never connect to the database to load their own.
+
+    Args:
+        matcher (AliasMatcher): Matcher for every stored alias and its object ID, see get_alias_matcher().
+    """
+    global _alias_matcher, _alias_matcher_loaded
+
+    with _alias_matcher_lock:
+        _alias_matcher = matcher
+        _alias_matcher_loaded = math.inf
+
+
 def get_next_atel_num() -> int:
     """
     Retrieves the number of the next ATel report to start auto import from. This is equal to the last ATel number added to the database via the auto import function plus one. If no reports have been auto imported, this will be equal to one.
@@ -302,22 +449,13 @@ def get_next_atel_num() -> int:
     Returns:
         int: The number of the next ATel report to start auto import from.
     """
-    cn = _connect()
-    cur:MySQLCursor = cn.cursor()
-
     query = "select nextATelNum from Metadata"
 
-    try:
-        #Add single metadata entry
+    with _cursor() as cur:
         cur.execute(query)
         result = cur.fetchone()
 
         next_atel_num = result[0]
-    except mysql.connector.Error as e:
-        raise e
-    finally:
-        cur.close()
-        cn.close()
 
     return next_atel_num
 
@@ -328,20 +466,11 @@ def set_next_atel_num(nextNum: int):
     Args:
         nextNum (int): The number of the next ATel report to start auto import from. Should be equal to the last ATel number imported via auto import plus one.
     """
-    cn = _connect()
-    cur: MySQLCursor = cn.cursor()
-
     query = ("update Metadata "
              "set nextATelNum = %s")
 
-    try:
+    with _cursor(commit=True) as cur:
         cur.execute(query, (nextNum,))
-    except mysql.connector.Error as e:
-        raise e
-    finally:
-        cn.commit()
-        cur.close()
-        cn.close()
 
 
 def get_last_updated_date() -> datetime:
@@ -351,21 +480,13 @@ def get_last_updated_date() -> datetime:
     Returns:
         datetime: The date the database was last updated with the latest ATel reports.
     """
-    cn = _connect()
-    cur: MySQLCursor = cn.cursor()
-
     query = "select lastUpdatedDate from Metadata"
 
-    try:
+    with _cursor() as cur:
         cur.execute(query)
         result = cur.fetchone()
 
         date = result[0]
-    except mysql.connector.Error as e:
-        raise e
-    finally:
-        cur.close()
-        cn.close()
 
     return date
 
@@ -389,29 +510,23 @@ def add_object(object_id: str, coords: SkyCoord, aliases: list[str]=[]):
 
     # Check length is valid
     if len(object_id) in range(1, 256):
-        # connect to database
-        cn = _connect()
-        cur: MySQLCursor = cn.cursor()
-
         # setup query
         query = ("insert into Objects" 
-                " (objectID, ra, declination)" 
-                " values (%s, %s, %s)")
+                " (objectID, ra, declination, decZone)" 
+                " values (%s, %s, %s, %s)")
 
-        data = (object_id, round(coords.ra.deg, 10), round(coords.dec.deg, 10))
+        dec = round(coords.dec.deg, 10)
+        data = (object_id, round(coords.ra.deg, 10), dec, _dec_zone(dec))
 
-        # execute query and handle errors
-        try:
-            cur.execute(query, data)
-        except mysql.connector.Error as e:
-            if e.errno == errorcode.ER_DUP_ENTRY:
-                raise ExistingObjectError()
-            else:
-                raise e
-        finally:
-            cn.commit()
-            cur.close()
-            cn.close()
+        # connect to database, execute query and handle errors
+        with _cursor(commit=True) as cur:
+            try:
+                cur.execute(query, data)
+            except mysql.connector.Error as e:
+                if e.errno == errorcode.ER_DUP_ENTRY:
+                    raise ExistingObjectError()
+                else:
+                    raise e
 
         # Add aliases
         add_aliases(object_id, aliases)
@@ -423,6 +538,7 @@ def add_object(object_id: str, coords: SkyCoord, aliases: list[str]=[]):
 def add_aliases(object_id: str, aliases: list[str]):
     """
     Adds the specified aliases to the given stored object.
+    The object is marked as updated, completing any refresh requested for it.
 
     Args:
         object_id (str): The object’s main ID from SIMBAD.
@@ -438,51 +554,44 @@ def add_aliases(object_id: str, aliases: list[str]):
     if len(object_id) in range(1, 256):
         exists, updated = object_exists(object_id)
         if exists:
-            # connect to database
-            cn = _connect()
-            cur: MySQLCursor = cn.cursor()
-
             # setup query
             add_query = ("insert into Aliases"
                     " (alias, objectIDFK)"
                     " values (%s, %s);")
 
-            for alias in aliases:
-                add_data = (alias, object_id)
-                # execute query and handle errors
-                try:
-                    cur.execute(add_query, add_data)
-                except mysql.connector.Error as e:
-                    if e.errno == errorcode.ER_DUP_ENTRY:
-                        pass #ignore any duplicate aliases
-                    else:
-                        cur.close()
-                        cn.close()
-                        raise e  
-            
-            cn.commit()
-
             # setup query
             update_query = ("update Objects "
-                            "set lastUpdated = now() "
+                            "set lastUpdated = now(), refreshRequested = null, refreshAfter = null "
                             "where objectID = %s;")
 
             update_data = (object_id,)
 
-            # execute query and handle errors
-            try:
-                cur.execute(update_query, update_data)
-            except mysql.connector.Error as e:
-                if e.errno == errorcode.ER_DUP_ENTRY:
-                    pass  # ignore any duplicate aliases
-                else:
-                    cur.close()
-                    cn.close()
-                    raise e
-            
-            cn.commit()
-            cur.close()
-            cn.close()
+            added = []
+
+            # connect to database
+            with _cursor(commit=True) as cur:
+                for alias in aliases:
+                    add_data = (alias, object_id)
+                    # execute query and handle errors
+                    try:
+                        cur.execute(add_query, add_data)
+                        added.append(alias)
+                    except mysql.connector.Error as e:
+                        if e.errno == errorcode.ER_DUP_ENTRY:
+                            pass #ignore any duplicate aliases
+                        else:
+                            raise e
+
+                # execute query and handle errors
+                try:
+                    cur.execute(update_query, update_data)
+                except mysql.connector.Error as e:
+                    if e.errno == errorcode.ER_DUP_ENTRY:
+                        pass  # ignore any duplicate aliases
+                    else:
+                        raise e
+
+            _add_to_alias_matcher(object_id, added)
 
             # Link reports
             _link_reports(object_id,aliases)
@@ -512,11 +621,9 @@ def object_exists(alias:str)->tuple[bool,datetime]:
     except (ObjectNotFoundError):
         return False, None
 
-    cn = _connect()
-    cur: MySQLCursor = cn.cursor()
-    cur.execute(query, (object_id,))
-
-    result = cur.fetchone()
+    with _cursor() as cur:
+        cur.execute(query, (object_id,))
+        result = cur.fetchone()
 
     if result:
         lastUpdated = result[0]
@@ -537,17 +644,14 @@ def get_object_coords(alias: str) -> SkyCoord:
     Raises:
         ObjectNotFoundError: Raised when the specified alias is not stored in the database.
     """
-    cn = _connect()
-    cur: MySQLCursor = cn.cursor()
-
     query = ("select ra, declination from Objects"
              " where objectID = %s")
 
     object_id = _get_object_id(alias)
 
-    cur.execute(query, (object_id,))
-
-    result = cur.fetchone()
+    with _cursor() as cur:
+        cur.execute(query, (object_id,))
+        result = cur.fetchone()
 
     if result:
         ra = result[0]
@@ -557,7 +661,7 @@ def get_object_coords(alias: str) -> SkyCoord:
         raise ObjectNotFoundError("The specified object ID is not stored in the database.")
 
 
-def find_reports_by_object(filters: SearchFilters = None, date_range: DateFilter = None, object_name: str = None) -> list[ReportResult]:
+def find_reports_by_object(filters: SearchFilters = None, date_range: DateFilter = None, object_name: str = None, limit: int = None, after: tuple[datetime, int] = None, include_body: bool = True) -> list[ReportResult]:
     """
     Queries the local database for reports matching the specified search filters and related to the specified object if given.
 
@@ -565,22 +669,27 @@ def find_reports_by_object(filters: SearchFilters = None, date_range: DateFilter
         filters (SearchFilters, optional): The search criteria to filter the report query with. Defaults to None.
         date_range (DateFilter, optional): The date range to filter the report query by. Defaults to None.
         object_name (str, optional): An object ID or alias to search  by. Defaults to None.
+        limit (int, optional): The maximum number of reports to return. Defaults to None, returning all matching reports.
+        after (tuple[datetime, int], optional): A (submission date, ATel number) cursor. Only reports ordered after it are returned. Defaults to None.
+        include_body (bool, optional): Whether to retrieve the body of each report. If False, the returned reports' bodies are None. Defaults to True.
 
     Returns:
-        list[ReportResult]: A list of reports matching all the search criteria and related to the specified object.
+        list[ReportResult]: A list of reports matching all the search criteria and related to the specified object, newest first.
     """
     if (filters or object_name):
-        cn = _connect()
-        cur:MySQLCursor = cn.cursor()
-
         try:
-            query, data = _build_report_name_query(filters, date_range, object_name)
+            query, data = _build_report_name_query(filters, date_range, object_name, after, include_body)
         except (ObjectNotFoundError): # if object name is not a valid alias/id, return empty list.
             return []
 
-        reports = []
+        order_clause, order_data = _build_order_clause(limit)
+        query += order_clause
+        data += order_data
 
-        try:
+        # Results keyed by ATel number, in the order returned.
+        reports: dict[int, ReportResult] = {}
+
+        with _cursor() as cur:
             cur.execute(query, data)
             for row in cur.fetchall():
                 #extract data
@@ -591,21 +700,15 @@ def find_reports_by_object(filters: SearchFilters = None, date_range: DateFilter
                 submission_date = row[4]
 
                 #create result object and add to list
-                report = ReportResult(atel_num,title,authors,body,submission_date)
-                if (report not in reports):
-                    reports.append(report)
-        except mysql.connector.Error as e:
-            raise e
-        finally:
-            cur.close()
-            cn.close()
+                if (atel_num not in reports):
+                    reports[atel_num] = ReportResult(atel_num,title,authors,body,submission_date)
 
         # Populate each returned report with their referenced report and return the list of results.
-        return _populate_referenced_reports(list(reports))
+        return _populate_referenced_reports(list(reports.values()))
     else: # If no parameters given, return empty list.
         return []
 
-def find_reports_in_coord_range(filters:SearchFilters=None, date_range:DateFilter=None, coords:SkyCoord=None, radius:float=None)->list[ReportResult]:
+def find_reports_in_coord_range(filters:SearchFilters=None, date_range:DateFilter=None, coords:SkyCoord=None, radius:float=None, limit:int=None, after:tuple[datetime, int]=None, include_body:bool=True)->list[ReportResult]:
     """
     Queries the local database for reports matching the specified search filters and related to the specified object if given.
 
@@ -614,9 +717,12 @@ def find_reports_in_coord_range(filters:SearchFilters=None, date_range:DateFilte
         date_range (DateFilter, optional): The date range to filter the report query by. Defaults to None.
         coords (SkyCoord): The coordinates to search around.
         radius (float): The radius defining the range around the specified coordinates to search, in arcseconds.
+        limit (int, optional): The maximum number of reports to return. Defaults to None, returning all matching reports.
+        after (tuple[datetime, int], optional): A (submission date, ATel number) cursor. Only reports ordered after it are returned. Defaults to None.
+        include_body (bool, optional): Whether to retrieve the body of each report. If False, the returned reports' bodies are None. Defaults to True.
 
     Returns:
-        list[ReportResult]: A list of reports matching all the search criteria and related to the specified object.
+        list[ReportResult]: A list of reports matching all the search criteria and related to the specified object, newest first.
     """
     if ((coords is not None) ^ (radius is not None)):
         raise TypeError("Must specify both coords and radius, or neither.")
@@ -624,55 +730,392 @@ def find_reports_in_coord_range(filters:SearchFilters=None, date_range:DateFilte
     filter_coords = (coords is not None) and (radius is not None)
 
     if (filters or filter_coords):
-        cn = _connect()
-        cur: MySQLCursor = cn.cursor()
+        query, data = _build_report_coords_query(filters, date_range, filter_coords, coords, radius, after, include_body)
 
-        query, data = _build_report_coords_query(filters, date_range, filter_coords)
+        # Reports can be returned once per linked coordinate, so the limit is applied after checking separations.
+        order_clause, order_data = _build_order_clause(None if filter_coords else limit)
+        query += order_clause
+        data += order_data
 
-        reports = []
+        # Results keyed by ATel number, in the order returned.
+        reports: dict[int, ReportResult] = {}
 
-        try:
+        with _cursor() as cur:
             cur.execute(query, data)
-            for row in cur.fetchall():
-                # extract data
-                atel_num = row[0]
-                title = row[1]
-                authors = row[2]
-                body = row[3]
-                submission_date = row[4]
+            rows = cur.fetchall()
 
-                if (filter_coords):
-                    ra = row[5]
-                    dec = row[6]
-                    report_coords = SkyCoord(ra, dec, frame='icrs', unit=('deg', 'deg'))
-
-                    # Check coordinates are in range
-                    separation:Angle = SkyCoord.separation(coords, report_coords)
-                    if (separation.arcsecond <= radius):
-                        # create result object and add to list
-                        report = ReportResult(atel_num, title, authors, body, submission_date)
-                        if (report not in reports):
-                            reports.append(report)
-                    # else skip this result
-                else:
-                    # create result object and add to list
-                    report = ReportResult(atel_num, title, authors, body, submission_date)
-                    if (report not in reports):
-                        reports.append(report)
+        if (filter_coords and rows):
+            # Check coordinates are in range, for all rows at once.
+            ras = np.array([float(row[5]) for row in rows])
+            decs = np.array([float(row[6]) for row in rows])
+            in_range = _angular_separation(coords, ras, decs) <= radius
+        else:
+            in_range = np.ones(len(rows), dtype=bool)
 
-        except mysql.connector.Error as e:
-            raise e
-        finally:
-            cur.close()
-            cn.close()
+        for row, row_in_range in zip(rows, in_range):
+            # extract data
+            atel_num = row[0]
+            title = row[1]
+            authors = row[2]
+            body = row[3]
+            submission_date = row[4]
+
+            # skip results out of range or already matched by another of the report's coordinates
+            if (row_in_range and atel_num not in reports):
+                # create result object and add to list
+                reports[atel_num] = ReportResult(atel_num, title, authors, body, submission_date)
+
+                if (limit is not None and len(reports) >= limit):
+                    break
 
         # Populate each returned report with their referenced report and return the list of results.
-        return _populate_referenced_reports(list(reports))
+        return _populate_referenced_reports(list(reports.values()))
     else:  # If no parameters given, return empty list.
         return []
 
     #TODO: Check in coord range.
 
+def find_objects_in_coord_range(coords:SkyCoord, radius:float)->list[str]:
+    """
+    Queries the local database for stored objects within the specified range of the given coordinates.
+
+    Args:
+        coords (SkyCoord): The coordinates to search around.
+        radius (float): The radius defining the range around the specified coordinates to search, in arcseconds.
+
+    Returns:
+        list[str]: The main IDs of the objects in range.
+    """
+    box_clause, data = _build_coords_box_clause(coords, radius)
+    query = "select objectID, ra, declination from Objects where " + box_clause
+
+    with _cursor() as cur:
+        cur.execute(query, data)
+        rows = cur.fetchall()
+
+    if not rows:
+        return []
+
+    ras = np.array([float(row[1]) for row in rows])
+    decs = np.array([float(row[2]) for row in rows])
+    in_range = _angular_separation(coords, ras, decs) <= radius
+
+    return [row[0] for row, row_in_range in zip(rows, in_range) if row_in_range]
+
+def count_reports(filters:SearchFilters=None, date_range:DateFilter=None, object_names:list[str]=None, coords:SkyCoord=None, radius:float=None)->int:
+    """
+    Estimates the number of reports matching the specified search filters and linked to any of the specified objects or coordinate range, if given.
+    Linked coordinates are only checked against the bounding box of the range, so this may overestimate coordinate searches.
+
+    Args:
+        filters (SearchFilters, optional): The search criteria to filter the reports with. Defaults to None.
+        date_range (DateFilter, optional): The date range to filter the reports by. Defaults to None.
+        object_names (list[str], optional): Object IDs or aliases the reports may be linked to. Unknown objects are ignored. Defaults to None.
+        coords (SkyCoord, optional): The coordinates to search around. Defaults to None.
+        radius (float, optional): The radius defining the range around the specified coordinates to search, in arcseconds. Defaults to None.
+
+    Returns:
+        int: The estimated number of matching reports.
+    """
+    if ((coords is not None) ^ (radius is not None)):
+        raise TypeError("Must specify both coords and radius, or neither.")
+
+    source_clauses = []
+    source_data = ()
+
+    if object_names is not None:
+        object_ids = []
+        for object_name in object_names:
+            try:
+                object_ids.append(_get_object_id(object_name))
+            except ObjectNotFoundError:
+                pass # reports cannot be linked to unknown objects
+
+        if object_ids:
+            source_clauses.append(f"atelNum in (select atelNumFK from ObjectRefs where objectIDFK in {_build_in_list(len(object_ids))})")
+            source_data += tuple(object_ids)
+
+    if coords is not None:
+        box_clause, box_data = _build_coords_box_clause(coords, radius)
+        source_clauses.append(f"atelNum in (select atelNumFK from ReportCoords where {box_clause})")
+        source_data += box_data
+
+    # Reports must be linked to one of the given objects or coordinates.
+    if (object_names is not None or coords is not None) and not source_clauses:
+        return 0
+
+    where_clause, where_data = _build_where_clause(filters, date_range)
+
+    query = "select count(*) from Reports " + where_clause
+    data = where_data
+    if source_clauses:
+        query += ("and " if where_clause else "where ") + "(" + " or ".join(source_clauses) + ") "
+        data += source_data
+
+    with _cursor() as cur:
+        cur.execute(query, data)
+        return cur.fetchone()[0]
+
+def claim_enrichments(limit: int, lease_seconds: float) -> list[tuple[float, float, int]]:
+    """
+    Takes coordinates that are due to be enriched from the enrichment queue.
+    Claimed coordinates are hidden from other workers until the lease runs out, so a worker that dies part way through never loses a coordinate.
+
+    Args:
+        limit (int): The most coordinates to claim.
+        lease_seconds (float): Seconds until the coordinates may be claimed again if they are neither completed nor failed.
+
+    Returns:
+        list[tuple[float, float, int]]: The RA and declination in degrees of each claimed coordinate, and the number of times enriching it has already failed.
+    """
+    select_query = ("select ra, declination, attempts from EnrichmentQueue "
+                    "where nextAttempt <= now() "
+                    "order by nextAttempt "
+                    "limit %s "
+                    "for update skip locked")
+
+    with _cursor(commit=True) as cur:
+        cur.execute(select_query, (limit,))
+        rows = cur.fetchall()
+
+        if rows:
+            keys = tuple(value for row in rows for value in row[:2])
+            cur.execute("update EnrichmentQueue "
+                        "set nextAttempt = now() + interval %s second "
+                        f"where (ra, declination) in ({', '.join(['(%s, %s)'] * len(rows))})", (lease_seconds,) + keys)
+
+    return [(float(row[0]), float(row[1]), int(row[2])) for row in rows]
+
+
+def complete_enrichment(ra: float, dec: float):
+    """
+    Removes an enriched coordinate from the enrichment queue.
+
+    Args:
+        ra (float): RA of the coordinate in degrees, as claimed.
+        dec (float): Declination of the coordinate in degrees, as claimed.
+    """
+    with _cursor(commit=True) as cur:
+        cur.execute("delete from EnrichmentQueue where ra = %s and declination = %s", (round(ra, 10), round(dec, 10)))
+
+
+def fail_enrichment(ra: float, dec: float, error: str, retry_seconds: float = None):
+    """
+    Records a failed attempt to enrich a coordinate, scheduling it to be tried again later.
+
+    Args:
+        ra (float): RA of the coordinate in degrees, as claimed.
+        dec (float): Declination of the coordinate in degrees, as claimed.
+        error (str): Description of the failure.
+        retry_seconds (float, optional): Seconds until the coordinate is tried again. If not given the coordinate is not tried again until retry_failed_enrichments() is called.
+    """
+    if retry_seconds is None:
+        next_attempt = "null"
+        data = (error[:1024], round(ra, 10), round(dec, 10))
+    else:
+        next_attempt = "now() + interval %s second"
+        data = (retry_seconds, error[:1024], round(ra, 10), round(dec, 10))
+
+    with _cursor(commit=True) as cur:
+        cur.execute("update EnrichmentQueue "
+                    f"set attempts = least(attempts + 1, 255), nextAttempt = {next_attempt}, lastError = %s "
+                    "where ra = %s and declination = %s", data)
+
+
+def retry_failed_enrichments() -> int:
+    """
+    Puts every coordinate that enrichment has given up on back into the enrichment queue.
+
+    Returns:
+        int: The number of coordinates queued again.
+    """
+    with _cursor(commit=True) as cur:
+        cur.execute("update EnrichmentQueue "
+                    "set attempts = 0, nextAttempt = now() "
+                    "where nextAttempt is null")
+        return cur.rowcount
+
+
+def get_enrichment_queue_stats() -> dict:
+    """
+    Retrieves the size of the enrichment queue.
+
+    Returns:
+        dict: The number of coordinates waiting to be enriched, how many of them have failed at least once, and the number that enrichment has given up on.
+    """
+    query = ("select count(nextAttempt), count(case when nextAttempt is not null and attempts > 0 then 1 end), count(*) - count(nextAttempt) "
+             "from EnrichmentQueue")
+
+    with _cursor() as cur:
+        cur.execute(query)
+        pending, retrying, failed = cur.fetchone()
+
+    return {"pending": int(pending), "retrying": int(retrying), "failed": int(failed)}
+
+
+def request_object_refresh(alias: str):
+    """
+    Marks a stored object as waiting for its aliases to be refreshed from SIMBAD, keeping the time it was first requested.
+
+    Args:
+        alias (str): An alias or the main ID of the object.
+
+    Raises:
+        ObjectNotFoundError: When an object with the given alias is not stored in the database.
+    """
+    object_id = _get_object_id(alias)
+
+    with _cursor(commit=True) as cur:
+        cur.execute("update Objects "
+                    "set refreshRequested = coalesce(refreshRequested, now()) "
+                    "where objectID = %s", (object_id,))
+
+
+def claim_object_refreshes(limit: int, max_age_seconds: float, lease_seconds: float) -> list[tuple[str, datetime, datetime]]:
+    """
+    Takes the stored objects closest to needing their aliases refreshed, oldest first.
+    Claimed objects are hidden from other workers until the lease runs out, so a worker that dies part way through never loses an object.
+    A refresh is completed by add_aliases().
+
+    Args:
+        limit (int): The most objects to claim.
+        max_age_seconds (float): Seconds since an object was last updated after which it may be claimed.
+        lease_seconds (float): Seconds until the objects may be claimed again if they are not updated.
+
+    Returns:
+        list[tuple[str, datetime, datetime]]: The main ID of each claimed object, the date it was last updated and the date a refresh was first requested for it, or None if none was.
+    """
+    select_query = ("select objectID, lastUpdated, refreshRequested from Objects "
+                    "where lastUpdated <= now() - interval %s second "
+                    "and (refreshAfter is null or refreshAfter <= now()) "
+                    "order by lastUpdated "
+                    "limit %s "
+                    "for update skip locked")
+
+    with _cursor(commit=True) as cur:
+        cur.execute(select_query, (int(max_age_seconds), limit))
+        rows = cur.fetchall()
+
+        if rows:
+            cur.execute("update Objects "
+                        "set refreshAfter = now() + interval %s second "
+                        f"where objectID in ({_build_in_list(len(rows))})", (lease_seconds,) + tuple(row[0] for row in rows))
+
+    return [(row[0], row[1], row[2]) for row in rows]
+
+
+def fail_object_refresh(object_id: str, retry_seconds: float):
+    """
+    Records a failed attempt to refresh an object's aliases, scheduling it to be tried again later.
+
+    Args:
+        object_id (str): The object's main ID, as claimed.
+        retry_seconds (float): Seconds until the object is tried again.
+    """
+    with _cursor(commit=True) as cur:
+        cur.execute("update Objects "
+                    "set refreshAfter = now() + interval %s second "
+                    "where objectID = %s", (retry_seconds, object_id))
+
+
+def get_object_refresh_stats(max_age_seconds: float) -> dict:
+    """
+    Retrieves how far refreshing stored objects has fallen behind.
+
+    Args:
+        max_age_seconds (float): Seconds since an object was last updated after which it is stale.
+
+    Returns:
+        dict: The number of stale objects, how many of them have been served stale by a search and are waiting to be refreshed,
+            how many seconds the stalest object is past due and how many seconds the oldest request has been waiting.
+    """
+    query = ("select count(*), count(refreshRequested), "
+             "coalesce(timestampdiff(second, min(lastUpdated), now()) - %s, 0), "
+             "coalesce(timestampdiff(second, min(refreshRequested), now()), 0) "
+             "from Objects "
+             "where lastUpdated <= now() - interval %s second")
+
+    with _cursor() as cur:
+        cur.execute(query, (int(max_age_seconds), int(max_age_seconds)))
+        stale, requested, max_lag, oldest_request = cur.fetchone()
+
+    return {"stale": int(stale), "requested": int(requested), "max_lag_seconds": int(max_lag), "oldest_request_seconds": int(oldest_request)}
+
+
+def get_simbad_cache(key: str) -> tuple[str, int]:
+    """
+    Retrieves a cached SIMBAD response that has not expired.
+
+    Args:
+        key (str): The cache key of the query, see query_simbad._cached().
+
+    Returns:
+        tuple[str, int]: The JSON encoded response and the number of seconds until it expires, or None if no unexpired response is cached.
+    """
+    query = ("select response, timestampdiff(second, now(), expires) from SimbadCache "
+             "where cacheKey = %s and expires > now()")
+
+    with _cursor() as cur:
+        cur.execute(query, (key,))
+        row = cur.fetchone()
+
+    if row is None:
+        return None
+
+    return (row[0], int(row[1]))
+
+
+def put_simbad_cache(key: str, response: str, ttl_seconds: float):
+    """
+    Caches a SIMBAD response, replacing any response already cached for the query.
+
+    Args:
+        key (str): The cache key of the query, at most 255 characters long.
+        response (str): The JSON encoded response.
+        ttl_seconds (float): Seconds until the response expires.
+    """
+    query = ("insert into SimbadCache (cacheKey, response, expires) "
+             "values (%s, %s, now() + interval %s second) "
+             "on duplicate key update response = values(response), expires = values(expires)")
+
+    with _cursor(commit=True) as cur:
+        cur.execute(query, (key, response, int(ttl_seconds)))
+
+
+def get_pool_stats() -> dict:
+    """
+    Retrieves statistics for the current process's database connection pool.
+    Each gunicorn worker and background import process has its own pool, so these only describe the calling process.
+
+    Returns:
+        dict: The process ID, pool size, number of connections currently in use and counters for checkouts, returns, waits on an exhausted pool, timeouts and failed health checks.
+    """
+    pool = _get_pool()
+
+    with _pool_lock:
+        stats = dict(_pool_stats)
+
+    stats["pid"] = _pool_pid
+    stats["pool_size"] = pool.pool_size
+    stats["in_use"] = stats["checkouts"] - stats["returns"]
+
+    return stats
+
+
+def set_pool_size(size: int):
+    """
+    Sets the number of connections held open by the current process's connection pool, in place of MYSQL_POOL_SIZE.
+    Helper processes call this with 1 before they first use the database, so they don't each hold a full pool of connections.
+    Only pools created afterwards are affected, a pool the process has already opened keeps its size.
+
+    Args:
+        size (int): The number of connections, capped at the mysql-connector maximum of 32.
+    """
+    global _pool_size
+
+    with _pool_lock:
+        _pool_size = max(1, min(size, CNX_POOL_MAXSIZE))
+
 # Exceptions
 class ExistingUserError(Exception):
     """
@@ -705,6 +1148,11 @@ class ObjectNotFoundError(Exception):
     Raised when the specified object ID is not stored in the database.
     """
 
+class ReportNotFoundError(Exception):
+    """
+    Raised when the specified ATel number is not associated with a report stored in the database.
+    """
+
 # Private functions
 def _link_reports(object_id: str, aliases: list[str]):
     """
@@ -717,67 +1165,356 @@ def _link_reports(object_id: str, aliases: list[str]):
     Raises:
         ObjectNotFoundError: Raised when the specified object ID is not stored in the database.
     """
-    cn = _connect()
-    cur:MySQLCursor = cn.cursor()
-
     reports:list[int] = []
 
     #query to find all reports with alias in body or title
     find_query = ("select atelNum"
             " from Reports"
-            " where title like concat('%', %s, '%')"
-            " or body like concat('%', %s, '%');")
+            " where ")
 
     add_query = ("insert into ObjectRefs"
                 " (atelNumFK, objectIDFK)"
                 " values (%s, %s);")
 
     if (object_exists(object_id)):
-        try:
-            #loop through every alias and the main id
-            aliases.append(object_id)
-            for alias in aliases:
-                find_data = (alias, alias)
+        with _cursor(commit=True) as cur:
+            try:
+                #loop through every alias and the main id
+                aliases.append(object_id)
+                for alias in aliases:
+                    term_clause, find_data = _build_term_clause(alias)
                 
-                cur.execute(find_query, find_data)
-                for row in cur.fetchall():
-                    #extract data
-                    atel_num = row[0]
-                    #add to list of reports to link
-                    reports.append(atel_num)
-
-            #TODO: link by coords? This is in SRS but not specified where implemented in SAS.
-
-            #loop through each report found and add a record relating it to the specified object
-            for atel_num in reports:
-                add_data = (atel_num, object_id)
-                cur.execute(add_query, add_data)
-        except mysql.connector.Error as e:
-            if e.errno == errorcode.ER_DUP_ENTRY:
-                pass  # ignore any duplicate entries
-            else:
-                raise e
-        finally:
-            cn.commit()
-            cur.close()
-            cn.close()
+                    cur.execute(find_query + term_clause, find_data)
+                    for row in cur.fetchall():
+                        #extract data
+                        atel_num = row[0]
+                        #add to list of reports to link
+                        reports.append(atel_num)
+
+                #TODO: link by coords? This is in SRS but not specified where implemented in SAS.
+
+                #loop through each report found and add a record relating it to the specified object
+                for atel_num in reports:
+                    add_data = (atel_num, object_id)
+                    cur.execute(add_query, add_data)
+            except mysql.connector.Error as e:
+                if e.errno == errorcode.ER_DUP_ENTRY:
+                    pass  # ignore any duplicate entries
+                else:
+                    raise e
     else:
         raise ObjectNotFoundError("The specified object ID is not stored in the database.")
 
 
+def _report_row(report: ImportedReport) -> tuple:
+    """
+    Formats the fields of the given report for insertion into the Reports table.
+
+    Args:
+        report (ImportedReport): The report to format.
+
+    Returns:
+        tuple: The data to inject into the report insert query.
+    """
+    # Format keywords
+    sep = ','
+    keywords = sep.join(report.keywords)
+    sub_date = report.submission_date.strftime("%Y-%m-%d %H:%M:%S")
+
+    return (report.atel_num, report.title, report.authors, report.body, sub_date, keywords)
+
+
+def _insert_report_relations(cur: MySQLCursor, reports: list[ImportedReport]):
+    """
+    Adds the records relating each of the given reports to objects, observation dates, coordinates and other reports.
+    Each table is written with multi-row inserts, ignoring any duplicate records. Does not commit.
+
+    Args:
+        cur (MySQLCursor): Cursor on the connection holding the current transaction.
+        reports (list[ImportedReport]): The reports to add relations for. Must already be inserted.
+    """
+    object_refs = []
+    ob_dates = []
+    coords = []
+    report_refs = []
+    report_keywords = []
+
+    for report in reports:
+        for object_id in report.objects:
+            object_refs.append((report.atel_num, object_id))
+
+        for date in report.observation_dates:
+            ob_dates.append((report.atel_num, date))
+
+        for coord in report.coordinates:
+            dec = round(coord.dec.deg, 10)
+            coords.append((report.atel_num, round(coord.ra.deg, 10), dec, _dec_zone(dec)))
+
+        for keyword in report.keywords:
+            report_keywords.append((report.atel_num, _keyword_id(keyword)))
+
+        # Add referenced reports and referenced by
+        for other_report in report.referenced_reports:
+            report_refs.append((report.atel_num, other_report))
+        for other_report in report.referenced_by:
+            report_refs.append((other_report, report.atel_num))
+
+    _insert_many(cur, ("insert ignore into ObjectRefs "
+                       "(atelNumFK, objectIDFK) "
+                       "values (%s, %s)"), object_refs)
+
+    _insert_many(cur, ("insert ignore into ObservationDates "
+                       "(atelNumFK, obDate) "
+                       "values (%s, %s)"), ob_dates)
+
+    _insert_many(cur, ("insert ignore into ReportCoords "
+                       "(atelNumFK, ra, declination, decZone) "
+                       "values (%s, %s, %s, %s)"), coords)
+
+    _insert_many(cur, ("insert ignore into ReportKeywords "
+                       "(atelNumFK, keywordID) "
+                       "values (%s, %s)"), report_keywords)
+
+    _insert_many(cur, ("insert ignore into ReportRefs "
+                       "(atelNum, refReport) "
+                       "values (%s, %s)"), report_refs)
+
+
+def _add_to_alias_matcher(object_id: str, aliases: list[str]):
+    """
+    Adds newly stored aliases to this process's alias matcher, if it has been loaded.
+
+    Args:
+        object_id (str): The object’s main ID from SIMBAD.
+        aliases (list[str]): The aliases stored for the object.
+    """
+    with _alias_matcher_lock:
+        if _alias_matcher is not None:
+            for alias in aliases:
+                _alias_matcher.add(alias, object_id)
+
+
+def _queue_enrichment(cur: MySQLCursor, reports: list[ImportedReport]):
+    """
+    Adds the coordinates of each of the given reports to the enrichment queue, so the objects near them are looked up on SIMBAD.
+    Coordinates that are already queued are not queued again. Does not commit.
+
+    Args:
+        cur (MySQLCursor): Cursor on the connection holding the current transaction.
+        reports (list[ImportedReport]): The reports whose coordinates should be enriched.
+    """
+    coords = []
+
+    for report in reports:
+        for coord in report.coordinates:
+            coords.append((round(coord.ra.deg, 10), round(coord.dec.deg, 10)))
+
+    _insert_many(cur, ("insert ignore into EnrichmentQueue "
+                       "(ra, declination) "
+                       "values (%s, %s)"), coords)
+
+
+def _insert_many(cur: MySQLCursor, query: str, rows: list[tuple]):
+    """
+    Executes an insert query for many rows, using one multi-row statement per _SQL_BATCH_SIZE rows.
+
+    Args:
+        cur (MySQLCursor): Cursor on the connection holding the current transaction.
+        query (str): An insert query ending in a single values clause of %s placeholders.
+        rows (list[tuple]): The data for each row to insert.
+    """
+    if not rows:
+        return
+
+    # Split off the placeholder group so it can be repeated for each row.
+    values_index = query.rindex("values ")
+    prefix = query[:values_index + len("values ")]
+    placeholders = query[values_index + len("values "):]
+
+    for i in range(0, len(rows), _SQL_BATCH_SIZE):
+        batch = rows[i:i + _SQL_BATCH_SIZE]
+        batch_query = prefix + ", ".join([placeholders] * len(batch))
+        batch_data = tuple(value for row in batch for value in row)
+        cur.execute(batch_query, batch_data)
+
+
+def _build_in_list(length: int) -> str:
+    """
+    Builds a parenthesised list of placeholders for an SQL "in" clause.
+
+    Args:
+        length (int): The number of values in the list.
+
+    Returns:
+        str: The placeholder list, eg. "(%s, %s, %s)".
+    """
+    return "(" + ", ".join(["%s"] * length) + ")"
+
+
+def _existing_atel_nums(cur: MySQLCursor, atel_nums: list[int]) -> set[int]:
+    """
+    Finds which of the given ATel numbers are already stored in the Reports table.
+
+    Args:
+        cur (MySQLCursor): Cursor on the connection to query with.
+        atel_nums (list[int]): The ATel numbers to check.
+
+    Returns:
+        set[int]: The ATel numbers which are already stored.
+    """
+    existing = set()
+
+    for i in range(0, len(atel_nums), _SQL_BATCH_SIZE):
+        batch = atel_nums[i:i + _SQL_BATCH_SIZE]
+        query = ("select atelNum from Reports "
+                 f"where atelNum in {_build_in_list(len(batch))}")
+        cur.execute(query, tuple(batch))
+        for row in cur.fetchall():
+            existing.add(int(row[0]))
+
+    return existing
+
+
+class _CountedConnectionPool(MySQLConnectionPool):
+    """
+    Connection pool which counts the connections taken from and returned to it in the process's pool statistics.
+    Connections are counted as returned however they are closed, so connections taken by _connect() and closed by the caller are included.
+    """
+
+    def get_connection(self):
+        cn = super().get_connection()
+        _count_pool_stat("checkouts")
+        return cn
+
+    def add_connection(self, cnx=None):
+        super().add_connection(cnx)
+
+        # Connections are only passed in when they are returned, new ones are created by the pool
+        if cnx is not None:
+            _count_pool_stat("returns")
+
+
+def _get_pool() -> MySQLConnectionPool:
+    """
+    Returns the connection pool for the current process, creating it if needed.
+    A new pool is created whenever the process ID changes, so each gunicorn worker and forked background import process holds its own connections instead of sharing sockets inherited from its parent.
+    The pool holds _POOL_SIZE connections, or the size set by set_pool_size().
+
+    Returns:
+        MySQLConnectionPool: The connection pool for the current process.
+    """
+    global _pool, _pool_pid, _pool_stats
+
+    pid = os.getpid()
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = _CountedConnectionPool(
+                pool_name=f"atel_lookup_{pid}",
+                pool_size=_pool_size,
+                pool_reset_session=True,
+                host=os.getenv("MYSQL_HOST"),
+                user=os.getenv("MYSQL_USER"),
+                password=os.getenv("MYSQL_PASSWORD"),
+                database=os.getenv("MYSQL_DB"),
+            )
+            _pool_pid = pid
+            _pool_stats = {
+                "checkouts": 0,
+                "returns": 0,
+                "waits": 0,
+                "timeouts": 0,
+                "failed_health_checks": 0,
+            }
+
+    return _pool
+
+
 def _connect() -> MySQLConnection:
     """
-    Connects to the MySQL server and database and returns the connection object.
+    Takes a connection to the MySQL server and database from the process's connection pool.
+    The pool checks each connection is still alive when it is taken and reconnects it if it is not.
+    If every connection is in use this waits up to _POOL_TIMEOUT seconds for one to be returned.
+
+    Prefer the _connection() or _cursor() context managers, which always return the connection to the pool.
 
     Returns:
-        MySQLConnection: Connection to the MySQL Server. Must be closed by the calling method once finished.
+        MySQLConnection: Pooled connection to the MySQL Server. Must be closed by the calling method once finished, which returns it to the pool.
+
+    Raises:
+        PoolError: When no connection becomes available within _POOL_TIMEOUT seconds.
+        InterfaceError: When a dead connection taken from the pool fails to reconnect.
+    """
+    pool = _get_pool()
+    deadline = time.monotonic() + _POOL_TIMEOUT
+    waited = False
+
+    while True:
+        try:
+            cn = pool.get_connection()
+            break
+        except mysql.connector.errors.PoolError:
+            # Pool exhausted, wait for a connection to be returned.
+            if time.monotonic() >= deadline:
+                _count_pool_stat("timeouts")
+                raise
+            if not waited:
+                _count_pool_stat("waits")
+                waited = True
+            time.sleep(_POOL_RETRY_DELAY)
+        except mysql.connector.errors.InterfaceError:
+            _count_pool_stat("failed_health_checks")
+            raise
+
+    return cn
+
+
+@contextmanager
+def _connection() -> Iterator[MySQLConnection]:
+    """
+    Context manager which takes a connection from the pool and always returns it once the block exits, even if an error is raised.
+    Uncommitted changes are discarded when the connection is returned.
+
+    Yields:
+        MySQLConnection: Pooled connection to the MySQL Server.
+    """
+    cn = _connect()
+    try:
+        yield cn
+    finally:
+        cn.close()
+
+
+@contextmanager
+def _cursor(commit: bool = False) -> Iterator[MySQLCursor]:
+    """
+    Context manager which takes a connection from the pool and yields a cursor on it.
+    The cursor is closed and the connection returned to the pool once the block exits.
+
+    Args:
+        commit (bool, optional): Whether to commit the transaction if the block exits without raising an error. Defaults to False.
+
+    Yields:
+        MySQLCursor: Cursor on a pooled connection to the MySQL Server.
+    """
+    with _connection() as cn:
+        cur: MySQLCursor = cn.cursor()
+        try:
+            yield cur
+            if commit:
+                cn.commit()
+        finally:
+            cur.close()
+
+
+def _count_pool_stat(stat: str):
+    """
+    Increments one of the current process's pool statistics counters.
+
+    Args:
+        stat (str): Name of the counter to increment.
     """
-    return mysql.connector.connect(
-        host=os.getenv("MYSQL_HOST"),
-        user=os.getenv("MYSQL_USER"),
-        password=os.getenv("MYSQL_PASSWORD"),
-        database=os.getenv("MYSQL_DB"),
-    )
+    with _pool_lock:
+        _pool_stats[stat] = _pool_stats.get(stat, 0) + 1
 
 
 def _record_exists(table_name:str,primary_key:str,id:str)->bool:
@@ -789,44 +1526,50 @@ def _record_exists(table_name:str,primary_key:str,id:str)->bool:
         primary_key (str): Primary key of the table.
         id (str): ID of the record to check.
     """
-    cn = _connect()
-    cur: MySQLCursor = cn.cursor()
-
     query = (f"select count(*) from {table_name}"
              f" where {primary_key} = %s")
 
-    cur.execute(query, (id,))
-
-    result = cur.fetchone()
+    with _cursor() as cur:
+        cur.execute(query, (id,))
+        result = cur.fetchone()
 
     if result[0] >= 1:
         return True
     else:
         return False
 
-def _build_report_base_query()->tuple[str,str]:
+def _build_report_base_query(include_body:bool = True)->tuple[str,str]:
     """
     Builds the base query SQL query to select reports.
 
+    Args:
+        include_body (bool, optional): Whether to select the body column. If False, null is selected in its place so row layouts are unchanged. Defaults to True.
+
     Returns:
         select_clause: The select clause of the SQL query.
         from_clause: The from clause of the SQL query.
     """
 
     # Define base Select from Reports query
-    select_clause  = "select atelNum, title, authors, body, submissionDate "
+    if include_body:
+        select_clause  = "select atelNum, title, authors, body, submissionDate "
+    else:
+        select_clause  = "select atelNum, title, authors, null, submissionDate "
     from_clause = "from Reports "
 
     return select_clause, from_clause
 
 
-def _build_report_name_query(filters: SearchFilters = None, date_range: DateFilter = None, object_name: str = None):
+def _build_report_name_query(filters: SearchFilters = None, date_range: DateFilter = None, object_name: str = None, after: tuple[datetime, int] = None, include_body: bool = True):
     """
     Builds the SQL query to select reports based on the specified search filters and/or object name.
 
     Args:
         filters (SearchFilters, optional): A valid search filters object to build the query with.
         date_filters (DateFilters, optional): A valid search filters object to build the query with. Defaults to None.
+        object_name (str, optional): An object ID or alias to search by. Defaults to None.
+        after (tuple[datetime, int], optional): A (submission date, ATel number) cursor to select reports ordered after. Defaults to None.
+        include_body (bool, optional): Whether to select the body of each report. Defaults to True.
 
     Returns:
         str: The SQL where clause.
@@ -834,9 +1577,9 @@ def _build_report_name_query(filters: SearchFilters = None, date_range: DateFilt
     """
 
     #Build query clauses.
-    select_clause, from_clause = _build_report_base_query()
+    select_clause, from_clause = _build_report_base_query(include_body)
     join_clause, join_data = _build_name_join_clause(object_name)
-    where_clause, where_data = _build_where_clause(filters, date_range)
+    where_clause, where_data = _build_where_clause(filters, date_range, after)
 
     # Build final query and compile data
     query = select_clause + from_clause + join_clause + where_clause
@@ -845,7 +1588,7 @@ def _build_report_name_query(filters: SearchFilters = None, date_range: DateFilt
     return query, data
 
 
-def _build_report_coords_query(filters: SearchFilters = None, date_range: DateFilter = None, filter_coords:bool = False):
+def _build_report_coords_query(filters: SearchFilters = None, date_range: DateFilter = None, filter_coords:bool = False, coords:SkyCoord = None, radius:float = None, after:tuple[datetime, int] = None, include_body:bool = True):
     """
     Builds the SQL query to select reports based on the specified search filters and/or coords.
 
@@ -853,6 +1596,10 @@ def _build_report_coords_query(filters: SearchFilters = None, date_range: DateFi
         filters (SearchFilters, optional): A valid search filters object to build the query with.
         date_filters (DateFilters, optional): A valid search filters object to build the query with. Defaults to None.
         filter_coords (bool): Whether to include the join clause which filters for reports that have linked coords.
+        coords (SkyCoord, optional): The coordinates to search around. If given with radius, linked coords are limited to a bounding box around the search cone.
+        radius (float, optional): The radius of the search cone, in arcseconds.
+        after (tuple[datetime, int], optional): A (submission date, ATel number) cursor to select reports ordered after. Defaults to None.
+        include_body (bool, optional): Whether to select the body of each report. Defaults to True.
 
     Returns:
         str: The SQL where clause.
@@ -860,7 +1607,7 @@ def _build_report_coords_query(filters: SearchFilters = None, date_range: DateFi
     """
 
     #Build query clauses.
-    select_clause, from_clause = _build_report_base_query()
+    select_clause, from_clause = _build_report_base_query(include_body)
 
     if (filter_coords):
         select_coords_clause = ", ra, declination "
@@ -869,7 +1616,13 @@ def _build_report_coords_query(filters: SearchFilters = None, date_range: DateFi
         select_coords_clause = ""
         join_clause = ""
 
-    where_clause, where_data = _build_where_clause(filters, date_range)
+    where_clause, where_data = _build_where_clause(filters, date_range, after)
+
+    if (filter_coords and coords is not None and radius is not None):
+        box_clause, box_data = _build_coords_box_clause(coords, radius)
+        if box_clause:
+            where_clause = (where_clause + "and " if where_clause else "where ") + box_clause
+            where_data = where_data + box_data
 
     # Build final query and compile data
     query = select_clause + select_coords_clause + from_clause + join_clause + where_clause
@@ -877,13 +1630,14 @@ def _build_report_coords_query(filters: SearchFilters = None, date_range: DateFi
 
     return query, data
 
-def _build_where_clause(filters: SearchFilters = None, date_range: DateFilter = None)->tuple[str,tuple]:
+def _build_where_clause(filters: SearchFilters = None, date_range: DateFilter = None, after: tuple[datetime, int] = None)->tuple[str,tuple]:
     """
     Builds the where clause of the SQL query to select reports based on the specified search filters.
 
     Args:
         filters (SearchFilters, optional): A valid search filters object to build the query with.
         date_filters (DateFilters, optional): A valid search filters object to build the query with. Defaults to None.
+        after (tuple[datetime, int], optional): A (submission date, ATel number) cursor to select reports ordered after. Defaults to None.
 
     Returns:
         str: The SQL where clause.
@@ -908,33 +1662,22 @@ def _build_where_clause(filters: SearchFilters = None, date_range: DateFilter =
     if filters:
         # Append term clause and data
         if filters.term:
-            clauses.append(
-                "(title like concat('%', %s, '%') or body like concat('%', %s, '%')) ")
-            data = data + (filters.term, filters.term)
+            term_clause, term_data = _build_term_clause(filters.term)
+            clauses.append(term_clause)
+            data = data + term_data
 
-        # Append keyword clauses and data
+        # Append keyword clause and data
         if filters.keywords:
-            kw_clauses = []
-            if filters.keyword_mode == KeywordMode.NONE:
-                # Add a clause for each keyword in filters to not be in set
-                for kw in filters.keywords:
-                    kw_clauses.append("FIND_IN_SET(%s, keywords) = 0")  # If kw not in set
-                    data = data + (kw,)
-                kw_sep = " and "
-            else:
-                # Append a clause for each keyword to be in set
-                for kw in filters.keywords:
-                    kw_clauses.append("FIND_IN_SET(%s, keywords) > 0")  # If kw in set.
-                    data = data + (kw,)
-
-                # Set or/and condition
-                if filters.keyword_mode == KeywordMode.ALL:
-                    kw_sep = " and "
-                elif filters.keyword_mode == KeywordMode.ANY:
-                    kw_sep = " or "
-            # Join keyword clauses into one clause
-            kw_clause = "(" + kw_sep.join(kw_clauses)+") "
-            clauses.append(kw_clause)
+            kw_clause, kw_data = _build_keyword_clause(filters.keywords, filters.keyword_mode)
+            if kw_clause:
+                clauses.append(kw_clause)
+                data = data + kw_data
+
+    if after:
+        # Reports are ordered newest first, so continue from reports older than the cursor.
+        submission_date, atel_num = after
+        clauses.append("(submissionDate < %s or (submissionDate = %s and atelNum < %s)) ")
+        data = data + (submission_date, submission_date, atel_num)
 
     # Join where clauses together
     if clauses:
@@ -943,6 +1686,102 @@ def _build_where_clause(filters: SearchFilters = None, date_range: DateFilter =
 
     return where_clause, data
 
+def _build_order_clause(limit: int = None) -> tuple[str,tuple]:
+    """
+    Builds the order by clause of the SQL query to select reports, newest first, using the (submissionDate, atelNum) index.
+
+    Args:
+        limit (int, optional): The maximum number of reports to select. Defaults to None.
+
+    Returns:
+        str: The SQL order by and limit clauses.
+        tuple: The data to inject into the query on execution.
+    """
+    order_clause = "order by submissionDate desc, atelNum desc "
+
+    if limit is not None:
+        return order_clause + "limit %s ", (limit,)
+    else:
+        return order_clause, ()
+
+def _build_keyword_clause(keywords: list[str], keyword_mode: KeywordMode) -> tuple[str,tuple]:
+    """
+    Builds a clause matching reports with any, all or none of the specified keywords, using the indexed ReportKeywords table.
+
+    Args:
+        keywords (list[str]): The keywords to filter by. Invalid keywords are never associated with a report.
+        keyword_mode (KeywordMode): The mode to use for filtering on keywords.
+
+    Returns:
+        str: The SQL clause, or an empty string if it would not exclude any reports.
+        tuple: The data to inject into the query on execution.
+    """
+    # Keyword IDs to look up, without repeats.
+    keyword_ids = tuple(dict.fromkeys(_keyword_id(kw) for kw in keywords if valid_keyword(kw)))
+
+    if not keyword_ids:
+        # No report has any of the keywords.
+        if keyword_mode == KeywordMode.NONE:
+            return "", ()
+        else:
+            return "false ", ()
+
+    subquery = f"select atelNumFK from ReportKeywords where keywordID in {_build_in_list(len(keyword_ids))}"
+
+    if keyword_mode == KeywordMode.NONE:
+        return f"atelNum not in ({subquery}) ", keyword_ids
+    elif keyword_mode == KeywordMode.ALL:
+        # Reports must have a row for every keyword, including any invalid ones, which can never be matched.
+        num_keywords = len(set(kw.lower() for kw in keywords))
+        return f"atelNum in ({subquery} group by atelNumFK having count(*) = %s) ", keyword_ids + (num_keywords,)
+    else:
+        return f"atelNum in ({subquery}) ", keyword_ids
+
+def _keyword_id(keyword: str) -> int:
+    """
+    Retrieves the ID used to store the specified keyword in the ReportKeywords table, which is its index in FIXED_KEYWORDS.
+    Keywords must only be appended to FIXED_KEYWORDS, as this also defines the order of the Reports keywords set.
+
+    Args:
+        keyword (str): A valid fixed keyword. This is case insensitive.
+
+    Returns:
+        int: The keyword ID.
+    """
+    return FIXED_KEYWORDS.index(keyword.lower())
+
+def _build_term_clause(term: str) -> tuple[str,tuple]:
+    """
+    Builds a clause matching reports whose title or body contains the specified term.
+
+    In "fulltext" mode, the full-text index first narrows reports to those with a word starting with each of the term's indexed words,
+    then the substring match is checked on those reports only. A term found only partway through a word is not matched.
+    If the term has no indexed words (e.g. it is too short), or in "substring" mode, every report's title and body is scanned instead.
+
+    Args:
+        term (str): The term to search for.
+
+    Returns:
+        str: The SQL clause.
+        tuple: The data to inject into the query on execution.
+    """
+    substring_clause = "(title like concat('%', %s, '%') or body like concat('%', %s, '%'))"
+    substring_data = (term, term)
+
+    if _TERM_SEARCH_MODE == "substring":
+        return substring_clause + " ", substring_data
+
+    # Require each indexed word of the term as a word prefix, in boolean mode.
+    words = [word for word in _FULLTEXT_TOKEN_REGEX.findall(term)
+             if len(word) >= _FULLTEXT_MIN_TOKEN_SIZE and word.lower() not in _FULLTEXT_STOPWORDS]
+
+    if not words:
+        return substring_clause + " ", substring_data
+
+    match_query = " ".join(f"+{word}*" for word in words)
+
+    return f"(match(title, body) against (%s in boolean mode) and {substring_clause}) ", (match_query,) + substring_data
+
 def _build_name_join_clause(object_name:str = None)->tuple[str,tuple]:
     """
     Builds the join clause of the SQL query to select reports linked to the specified object.
@@ -986,6 +1825,96 @@ def _build_coords_join_clause() -> str:
 
     return join_clause
 
+def _build_coords_box_clause(coords:SkyCoord, radius:float)->tuple[str,tuple]:
+    """
+    Builds a where clause limiting linked coords to the declination zones and RA/Dec bounding box containing the search cone.
+    The zones are indexed, so this turns the cone search into index lookups, but exact separations must still be checked.
+
+    Args:
+        coords (SkyCoord): The centre of the search cone.
+        radius (float): The radius of the search cone, in arcseconds.
+
+    Returns:
+        str: The SQL where clause, without the leading "where".
+        tuple: The data to inject into the query on execution.
+    """
+    icrs = coords.icrs
+    ra = float(icrs.ra.deg)
+    dec = float(icrs.dec.deg)
+
+    # Pad the box slightly so coordinates rounded on storage are not cut off.
+    radius_deg = radius / 3600.0 + _COORDS_BOX_MARGIN
+
+    dec_min = max(dec - radius_deg, -90.0)
+    dec_max = min(dec + radius_deg, 90.0)
+
+    zones = tuple(range(_dec_zone(dec_min), _dec_zone(dec_max) + 1))
+
+    clause = f"decZone in {_build_in_list(len(zones))} and declination between %s and %s "
+    data = zones + (dec_min, dec_max)
+
+    # A cone covering a pole contains every right ascension.
+    if dec_min <= -90.0 or dec_max >= 90.0:
+        return clause, data
+
+    # Lines of right ascension converge towards the poles, so widen the RA range by the box's furthest declination.
+    ra_half_width = radius_deg / math.cos(math.radians(max(abs(dec_min), abs(dec_max))))
+    if ra_half_width >= 180.0:
+        return clause, data
+
+    ra_min = ra - ra_half_width
+    ra_max = ra + ra_half_width
+
+    # Wrap ranges crossing RA 0/360
+    if ra_min < 0.0:
+        clause += "and (ra >= %s or ra <= %s) "
+        data += (ra_min + 360.0, ra_max)
+    elif ra_max >= 360.0:
+        clause += "and (ra >= %s or ra <= %s) "
+        data += (ra_min, ra_max - 360.0)
+    else:
+        clause += "and ra between %s and %s "
+        data += (ra_min, ra_max)
+
+    return clause, data
+
+def _dec_zone(dec:float)->int:
+    """
+    Calculates the declination zone containing the given declination, used to index stored coordinates.
+    Zones are horizontal strips of the sky, 1/_COORDS_ZONES_PER_DEGREE degrees high, numbered upwards from the south pole.
+
+    Args:
+        dec (float): The declination, in degrees.
+
+    Returns:
+        int: The declination zone ID.
+    """
+    return math.floor((float(dec) + 90.0) * _COORDS_ZONES_PER_DEGREE)
+
+def _angular_separation(coords:SkyCoord, ras:np.ndarray, decs:np.ndarray)->np.ndarray:
+    """
+    Calculates the angular separation between the given coordinates and arrays of ICRS coordinates using the haversine formula.
+
+    Args:
+        coords (SkyCoord): The coordinates to measure from.
+        ras (np.ndarray): Right ascensions to measure to, in degrees.
+        decs (np.ndarray): Declinations to measure to, in degrees.
+
+    Returns:
+        np.ndarray: The separation to each of the coordinates, in arcseconds.
+    """
+    icrs = coords.icrs
+    ra0 = np.radians(float(icrs.ra.deg))
+    dec0 = np.radians(float(icrs.dec.deg))
+    ra1 = np.radians(ras)
+    dec1 = np.radians(decs)
+
+    sin_ddec = np.sin((dec1 - dec0) / 2)
+    sin_dra = np.sin((ra1 - ra0) / 2)
+    hav = sin_ddec**2 + np.cos(dec0) * np.cos(dec1) * sin_dra**2
+
+    return np.degrees(2 * np.arcsin(np.sqrt(np.clip(hav, 0.0, 1.0)))) * 3600.0
+
 def _populate_referenced_reports(reports:list[ReportResult])->list[ReportResult]:
     """
     Populates the referenced reports fields of each returned report in the given list from the database.
@@ -996,23 +1925,26 @@ def _populate_referenced_reports(reports:list[ReportResult])->list[ReportResult]
     Returns:
         list[ReportResult]: The same list of reports with the referenced reports field populated from the database.
     """
-    cn = _connect()
+    if not reports:
+        return reports
+
+    atel_nums = list(dict.fromkeys(report.atel_num for report in reports))
+    ref_reports: dict[int, list[int]] = {atel_num: [] for atel_num in atel_nums}
 
-    query = ("select refReport "
-             "from ReportRefs "
-             "where atelNum = %s;")
+    # Fetch the references of every report with one query per batch of ATel numbers.
+    with _cursor() as cur:
+        for i in range(0, len(atel_nums), _SQL_BATCH_SIZE):
+            batch = atel_nums[i:i + _SQL_BATCH_SIZE]
+            query = ("select atelNum, refReport "
+                     "from ReportRefs "
+                     f"where atelNum in {_build_in_list(len(batch))};")
+
+            cur.execute(query, tuple(batch))
+            for result in cur.fetchall():
+                ref_reports[int(result[0])].append(int(result[1]))
 
     for report in reports:
-        cur:MySQLCursor = cn.cursor()
-        try:
-            cur.execute(query,(report.atel_num,))
-            results = cur.fetchall()
-            ref_reports = []
-            for result in results:
-                ref_reports.append(int(result[0]))
-            report.referenced_reports = ref_reports
-        finally:
-            cur.close()
+        report.referenced_reports = list(ref_reports[report.atel_num])
 
     return reports
 
@@ -1035,10 +1967,7 @@ def _get_object_id(alias:str)->str:
              "or objectIDFK like %s "
              "limit 1;")
 
-    cn = _connect()
-    cur:MySQLCursor = cn.cursor()
-
-    try:
+    with _cursor() as cur:
         cur.execute(query, (alias, alias))
         result = cur.fetchone()
         if result is None:
@@ -1054,10 +1983,5 @@ def _get_object_id(alias:str)->str:
                 object_id = result[0]
         else:
             object_id = result[0]
-    except mysql.connector.Error as e:
-        raise e
-    finally:
-        cur.close()
-        cn.close()
 
     return object_id
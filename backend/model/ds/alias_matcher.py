@@ -0,0 +1,144 @@
+"""
+Contains the AliasMatcher data structure, which finds every known alias and object ID mentioned in a piece of text in a single pass.
+
+Author:
+    Rohan Khayech
+
+License Terms and Copyright:
+    Copyright (C) 2021 Rohan Khayech
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import re
+
+from model.ds.alias_result import AliasResult
+
+_TOKEN_REGEX = re.compile(r"([\d|^a-z]+)|[^\d|^a-z]")
+"""
+Splits lowercase text into runs of word characters, captured by the group, and single separator characters.
+An alias is only found in text when the characters either side of it are separators, so every match starts and ends on one of these tokens.
+"""
+
+class AliasMatcher:
+    """
+    Finds the objects whose aliases or object IDs appear as whole words in a piece of text, ignoring case.
+    Aliases are indexed by their first token and their length in tokens, so text is scanned once however many aliases are known.
+    """
+
+    def __init__(self, aliases: list[AliasResult] = []):
+        """
+        Creates a matcher for the given aliases.
+
+        Args:
+            aliases (list[AliasResult], optional): The aliases to find, along with the objects they refer to.
+        """
+        self._object_IDs = []
+        self._first_rows = {}
+        self._patterns = {}
+        self._lengths = {}
+
+        for alias in aliases:
+            self.add(alias.alias, alias.object_ID)
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: The number of aliases added to the matcher.
+        """
+        return len(self._object_IDs)
+
+    def add(self, alias: str, object_ID: str):
+        """
+        Adds an alias to the matcher. Text mentioning either the alias or the object ID will match the object.
+        Empty aliases are never found.
+
+        Args:
+            alias (str): Alternative name of the object.
+            object_ID (str): Main ID of the object the alias refers to.
+        """
+        object_ID = str(object_ID).lower()
+        row = len(self._object_IDs)
+        self._object_IDs.append(object_ID)
+
+        # Objects are reported in the order their first alias was added
+        first_row = self._first_rows.setdefault(object_ID, row)
+
+        self._add_pattern(str(alias).lower(), row)
+
+        if first_row == row:
+            self._add_pattern(object_ID, row)
+
+    def find(self, text: str) -> list[str]:
+        """
+        Finds the objects mentioned in the text.
+
+        Args:
+            text (str): The text to search.
+
+        Returns:
+            list[str]: The lowercase object IDs found, without duplicates, in the order their aliases were added.
+        """
+        lowered = f" {text.lower()} "
+        starts = []
+        ends = []
+        words = []
+        separators = []
+
+        for token in _TOKEN_REGEX.finditer(lowered):
+            starts.append(token.start())
+            ends.append(token.end())
+            words.append(token.group())
+            separators.append(token.group(1) is None)
+
+        matched = set()
+        num_tokens = len(words)
+
+        for i in range(1, num_tokens - 1):
+            lengths = self._lengths.get(words[i])
+
+            if lengths is None or not separators[i - 1]:
+                continue
+
+            # Each set bit is the length in tokens of an alias starting with this token
+            length = 1
+
+            while lengths and i + length < num_tokens:
+                if lengths & 1 and separators[i + length]:
+                    rows = self._patterns.get(lowered[starts[i]:ends[i + length - 1]])
+
+                    if rows is not None:
+                        matched.update(rows)
+
+                lengths >>= 1
+                length += 1
+
+        return list(dict.fromkeys(self._object_IDs[row] for row in sorted(matched)))
+
+    def _add_pattern(self, pattern: str, row: int):
+        """
+        Indexes a lowercase alias or object ID.
+
+        Args:
+            pattern (str): The text to find.
+            row (int): The alias the text belongs to.
+        """
+        tokens = [token.group() for token in _TOKEN_REGEX.finditer(pattern)]
+
+        if len(tokens) == 0:
+            return
+
+        rows = self._patterns.get(pattern)
+        self._patterns[pattern] = (row,) if rows is None else rows + (row,)
+        self._lengths[tokens[0]] = self._lengths.get(tokens[0], 0) | (1 << (len(tokens) - 1))
@@ -46,7 +46,7 @@ class ReportResult:
             atel_num (int): The ATel number associated with the report.
             title (str): The title of the report.
             authors (str): A string representing the authors of the report.
-            body (str): The body text of the report. Must be <= 5120 characters.
+            body (str): The body text of the report. Must be <= 5120 characters. None if the body was not retrieved.
             submission_date (datetime): A datetime object representing the date and time the report was submitted to The Astronomer's Telegram.
             referenced_reports (list[int], optional): List of ATel numbers of reports referenced by this report.
         """
@@ -62,7 +62,8 @@ class ReportResult:
         Returns:
             str: A description of the report.
         """
-        return f"ATel #{self.atel_num}: {self.title} ({self.authors}). Body length: {len(self.body)} chars. Submitted: {self.submission_date}. Referenced Reports: {self.referenced_reports}"
+        body_length = "not retrieved" if self.body is None else f"{len(self.body)} chars"
+        return f"ATel #{self.atel_num}: {self.title} ({self.authors}). Body length: {body_length}. Submitted: {self.submission_date}. Referenced Reports: {self.referenced_reports}"
 
     def __eq__(self, other)->bool:
         """
@@ -84,6 +85,14 @@ class ReportResult:
         else:
             return False
 
+    def __hash__(self)->int:
+        """
+        Hashes the report by its ATel number, which uniquely identifies a report. Reports that are equal always have the same ATel number, so this is consistent with __eq__.
+
+        Returns:
+            int: The hash of the report's ATel number.
+        """
+        return hash(self._atel_num)
 
     @property
     def atel_num(self)->int:
@@ -160,7 +169,7 @@ class ReportResult:
     @property
     def body(self)->str:
         """
-        The body text of the report.
+        The body text of the report, or None if it was not retrieved with a search result.
         """
         return self._body
 
@@ -170,11 +179,15 @@ class ReportResult:
         Sets the body text of the report.
 
         Args:
-            body (str): The body text of the report. Must be 5120 characters or less.
+            body (str): The body text of the report. Must be 5120 characters or less. None if the body was not retrieved.
 
         Raises:
             ValueError: When the given body text exceeds 5120 characters.
         """
+        if body is None:
+            self._body = None
+            return
+
         body_str = str(body)
 
         if (len(body_str)<=REPORT_BODY_CHAR_LIM):
@@ -302,6 +315,9 @@ class ImportedReport(ReportResult):
         else:
             return super().__eq__(other)
 
+    # Overriding __eq__ removes the inherited hash, restore it.
+    __hash__ = ReportResult.__hash__
+
     @property
     def referenced_by(self)->list[int]:
         """
@@ -433,3 +449,21 @@ class ImportedReport(ReportResult):
         else:
             raise TypeError(
                 "Coordinates must be a valid list of SkyCoord objects.")
+
+
+class ReportResults(list):
+    """
+    A list of ReportResult objects returned by a search, along with whether the search was degraded.
+    A search is degraded when it returned before every lookup on SIMBAD finished, so reports about objects it couldn't look up may be missing.
+    """
+
+    def __init__(self, reports:list[ReportResult]=[], degraded:bool=False):
+        """
+        Creates a ReportResults list with the specified reports.
+
+        Args:
+            reports (list[ReportResult], optional): The reports found by the search.
+            degraded (bool, optional): Whether the search was degraded.
+        """
+        super().__init__(reports)
+        self.degraded = degraded
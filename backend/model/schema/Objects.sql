@@ -2,5 +2,10 @@ create table if not exists Objects (
     objectID varchar(255) primary key,
     ra decimal(13,10) not null,
     declination decimal(13,10) not null,
-    lastUpdated timestamp not null default now()
+    decZone smallint unsigned,
+    lastUpdated timestamp not null default now(),
+    refreshRequested timestamp null default null,
+    refreshAfter timestamp null default null,
+    index (decZone, ra),
+    index (lastUpdated)
 )
\ No newline at end of file
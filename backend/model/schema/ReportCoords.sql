@@ -2,6 +2,8 @@ create table if not exists ReportCoords (
     atelNumFK int unsigned not null,
     ra decimal(13,10) not null,
     declination decimal(13,10) not null,
+    decZone smallint unsigned,
     foreign key (atelNumFK) references Reports(atelNum) on update cascade on delete cascade,
-    primary key (atelNumFK, ra, declination)
+    primary key (atelNumFK, ra, declination),
+    index (decZone, ra)
 )
\ No newline at end of file
@@ -0,0 +1,6 @@
+create table if not exists ReportKeywords (
+    atelNumFK int unsigned not null,
+    keywordID tinyint unsigned not null,
+    foreign key (atelNumFK) references Reports(atelNum) on update cascade on delete cascade,
+    primary key (keywordID, atelNumFK)
+)
\ No newline at end of file
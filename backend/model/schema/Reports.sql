@@ -4,5 +4,7 @@ create table if not exists Reports (
     authors varchar(8192) not null,
     body varchar(5120) not null,
     submissionDate timestamp not null,
-    keywords set('{}') not null default ''
+    keywords set('{}') not null default '',
+    fulltext (title, body),
+    index (submissionDate)
 )
\ No newline at end of file
@@ -0,0 +1,9 @@
+create table if not exists EnrichmentQueue (
+    ra decimal(13,10) not null,
+    declination decimal(13,10) not null,
+    attempts tinyint unsigned not null default 0,
+    nextAttempt timestamp null default current_timestamp,
+    lastError varchar(1024),
+    primary key (ra, declination),
+    index (nextAttempt)
+)
\ No newline at end of file
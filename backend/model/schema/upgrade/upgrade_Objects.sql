@@ -0,0 +1,6 @@
+alter table Objects
+add column decZone smallint unsigned after declination,
+add column refreshRequested timestamp null default null,
+add column refreshAfter timestamp null default null,
+add index (decZone, ra),
+add index (lastUpdated);
\ No newline at end of file
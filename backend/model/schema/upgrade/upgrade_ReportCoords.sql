@@ -0,0 +1,3 @@
+alter table ReportCoords
+add column decZone smallint unsigned after declination,
+add index (decZone, ra);
\ No newline at end of file
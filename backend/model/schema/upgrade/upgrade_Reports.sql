@@ -1,2 +1,3 @@
 alter table Reports
-modify column authors varchar(8192) not null;
\ No newline at end of file
+add fulltext (title, body),
+add index (submissionDate);
\ No newline at end of file
@@ -0,0 +1,7 @@
+create table if not exists SimbadCache (
+    cacheKey varchar(255) not null,
+    response mediumtext not null,
+    expires timestamp not null,
+    primary key (cacheKey),
+    index (expires)
+)
\ No newline at end of file
@@ -0,0 +1,25 @@
+import argparse
+from NamedAtomicLock import NamedAtomicLock
+from controller.importer.reparser import reparse_reports
+
+if __name__ == "__main__":
+    my_parser = argparse.ArgumentParser(description="Rebuild stored ATel reports from saved pages")
+    my_parser.add_argument("--source", action="store", type=str, help="directory of saved 'atel<number>.html' pages, defaults to the archive in ATEL_ARCHIVE_DIR")
+    my_parser.add_argument("--processes", action="store", type=int, help="number of parsing processes, defaults to the number of CPUs, up to 4")
+    my_parser.add_argument("--chunk-size", action="store", type=int, help="number of pages parsed by a process at once")
+    my_parser.add_argument("--batch-size", action="store", type=int, help="number of reports written to the database at once")
+    my_parser.add_argument("--enrich", action="store_true", help="look up objects near each report's coordinates on SIMBAD")
+    my_parser.add_argument("--dry-run", action="store_true", help="only parse the pages and report the parsing speed")
+
+    args = my_parser.parse_args()
+
+    # Holds the importer lock so a background import can't write the same reports
+    lock = NamedAtomicLock("importer")
+
+    if lock.acquire(timeout=30):
+        try:
+            reparse_reports(args.source, args.processes, args.chunk_size, args.batch_size, args.enrich, not args.dry_run)
+        finally:
+            lock.release()
+    else:
+        print("ERROR: Could not acquire the importer lock, an import may be running")
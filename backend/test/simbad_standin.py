@@ -0,0 +1,428 @@
+""" Local stand-in for the SIMBAD sim-script service.
+
+Answers the subset of SIMBAD's script language used by astroquery's Simbad
+class (query_object, query_objectids and query_region) from a fixture
+catalog, so the search and enrichment paths can be tested and benchmarked
+without network access. Latency and errors can be injected into every
+response.
+
+Point query_simbad at it with the SIMBAD_MIRROR environment variable:
+
+    python -m test.simbad_standin --port 8081 --latency 0.2 --error-rate 0.05
+    SIMBAD_MIRROR=http://127.0.0.1:8081/simbad/sim-script
+
+astroquery caches responses on disk, including injected errors, so disable
+its cache (Simbad._cache_active = False) when injecting errors.
+
+Only the sim-script protocol used by the astroquery version pinned in
+requirements.txt is spoken. astroquery 0.4.7 and later query SIMBAD over TAP.
+
+Author:
+    Ryan Martin
+
+License Terms and Copyright:
+    Copyright (C) 2021 Ryan Martin
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published
+    by the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+import astropy.units as u
+import numpy as np
+from astropy.coordinates import Angle, SkyCoord
+from astropy.io.votable import from_table
+from astropy.table import Table
+
+
+######################
+# Stand-in constants #
+######################
+
+
+# The fixture catalog served by default.
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), "res", "simbad_catalog.json")
+
+
+# The path the stand-in answers scripts on, matching SIMBAD's.
+SCRIPT_PATH = "/simbad/sim-script"
+
+
+# The columns returned for each supported votable field.
+VOTABLE_COLUMNS = {
+    "main_id": ["MAIN_ID"],
+    "coordinates": ["RA", "DEC", "RA_PREC", "DEC_PREC"],
+    "ids": ["IDS"],
+}
+
+
+# Matches a region query, eg.
+# "query coo 5:34:31.9392 +22:00:52.2 radius=10.0s frame=ICRS equi=2000.0".
+_REGION_REGEX = re.compile(r"^query coo\s+(?P<ra>\S+)\s+(?P<dec>\S+)(?P<options>(\s+\w+=\S+)*)\s*$")
+
+
+# Units of the radius suffixes astroquery sends.
+_RADIUS_UNITS = {"d": u.deg, "m": u.arcmin, "s": u.arcsec}
+
+
+#####################
+# Private functions #
+#####################
+
+
+def _normalise(identifier: str) -> str:
+    ''' Normalise an identifier for matching, ignoring case and spacing,
+        so "m1" matches "M   1" as it does on SIMBAD.
+    '''
+    return "".join(identifier.split()).lower()
+
+
+def _section(name: str, content: str) -> str:
+    ''' Format a section of a sim-script response.
+    '''
+    return f"::{name}{':' * (70 - len(name))}\n\n{content}\n"
+
+
+def _parse_region(match: re.Match) -> tuple[SkyCoord, Angle]:
+    ''' Parse the centre and radius of a region query.
+
+    Raises:
+        ValueError: if the coordinates, frame or radius are invalid.
+    '''
+    options = dict(option.split("=", 1) for option in match.group("options").split())
+    frame = options.get("frame", "ICRS").upper()
+    radius = options.get("radius", "2m")
+
+    if frame == "GAL":
+        centre = SkyCoord(match.group("ra"), match.group("dec"), frame="galactic", unit=("deg", "deg"))
+    elif frame in ("ICRS", "FK5", "FK4"):
+        centre = SkyCoord(match.group("ra"), match.group("dec"), frame=frame.lower(), unit=("hourangle", "deg"))
+    else:
+        raise ValueError(f"Unknown frame: {frame}")
+
+    if radius[-1:] not in _RADIUS_UNITS:
+        raise ValueError(f"Invalid radius: {radius}")
+
+    return centre.icrs, Angle(float(radius[:-1]), unit=_RADIUS_UNITS[radius[-1]])
+
+
+#################
+# Stand-in core #
+#################
+
+
+def load_catalog(path: str = CATALOG_PATH) -> list[dict]:
+    """ Load a fixture catalog.
+
+    Args:
+        path (str, optional): A JSON list of objects, each with a "main_id",
+            "ra" and "dec" in degrees, and a list of "ids". The fixture
+            catalog by default.
+
+    Returns:
+        list[dict]: The objects in the catalog.
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def crowded_region(ra: float, dec: float, count: int, radius: float = 5.0, seed: int = 0) -> list[dict]:
+    """ Generate objects scattered within a region, for benchmarking crowded
+        region queries.
+
+    Args:
+        ra (float): Right ascension of the centre of the region in degrees.
+        dec (float): Declination of the centre of the region in degrees.
+        count (int): The number of objects.
+        radius (float, optional): Radius of the region in arcseconds.
+        seed (int, optional): Seed for the positions of the objects.
+
+    Returns:
+        list[dict]: The objects, named "Object <n>" with the alias "Alias <n>".
+    """
+    rng = np.random.default_rng(seed)
+    centre = SkyCoord(ra, dec, unit=("deg", "deg"))
+    offsets = centre.directional_offset_by(rng.uniform(0, 360, count) * u.deg,
+                                           rng.uniform(0, radius, count) * u.arcsec)
+
+    return [{"main_id": f"Object {i}", "ra": float(offsets.ra.deg[i]), "dec": float(offsets.dec.deg[i]),
+             "ids": [f"Object {i}", f"Alias {i}"]} for i in range(count)]
+
+
+class SimbadStandIn:
+    """ A local SIMBAD sim-script service, serving objects, aliases and
+        regions from a catalog with injected latency and errors.
+        Run it with start() and stop(), or as a context manager.
+    """
+
+    def __init__(self,
+                 catalog: list[dict] = None,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 error_status: int = 503,
+                 seed: int = 0,
+                 host: str = "127.0.0.1",
+                 port: int = 0
+    ):
+        """ Create a stand-in.
+
+        Args:
+            catalog (list[dict], optional): The objects served, see
+                load_catalog(). The fixture catalog by default.
+            latency (float, optional): Seconds every response is delayed by.
+            jitter (float, optional): Up to this many more seconds are added
+                to the delay at random.
+            error_rate (float, optional): Fraction of requests answered with
+                an HTTP error instead of a result.
+            error_status (int, optional): HTTP status of injected errors.
+                503 by default. SIMBAD answers 403 when it is rate limiting.
+            seed (int, optional): Seed for the injected jitter and errors, so
+                runs are repeatable.
+            host (str, optional): Address to listen on.
+            port (int, optional): Port to listen on. A free port by default.
+        """
+        self.catalog = load_catalog() if catalog is None else catalog
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stats = {"requests": 0, "errors": 0}
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+        # Index the catalog by every identifier, and its coordinates for
+        # region queries.
+        self._by_id = {}
+        for index, entry in enumerate(self.catalog):
+            for identifier in [entry["main_id"]] + entry["ids"]:
+                self._by_id.setdefault(_normalise(identifier), index)
+
+        self._coords = SkyCoord([entry["ra"] for entry in self.catalog],
+                                [entry["dec"] for entry in self.catalog], unit=("deg", "deg"))
+
+
+    @property
+    def url(self) -> str:
+        """ The sim-script URL to set SIMBAD_MIRROR to.
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{SCRIPT_PATH}"
+
+
+    def start(self):
+        """ Start answering requests in a background thread.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, name="simbad-standin", daemon=True)
+        self._thread.start()
+
+
+    def stop(self):
+        """ Stop answering requests and close the socket.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+    def answer(self, script: str) -> str:
+        """ Run a sim-script, without any injected latency or errors.
+
+        Args:
+            script (str): The script, as sent by astroquery.
+
+        Returns:
+            str: The response, with the script, console, error and data
+                sections SIMBAD returns. The data section is left out if
+                nothing was found.
+        """
+        start = time.perf_counter()
+        fields = None
+        idlist = False
+        limit = 0
+        rows = []
+        errors = []
+
+        for number, line in enumerate(script.splitlines(), 1):
+            line = line.strip()
+
+            if not line or line == "votable open" or line == "votable close":
+                continue
+            elif line.startswith("set limit "):
+                limit = int(line[len("set limit "):])
+            elif line.startswith("votable {") and line.endswith("}"):
+                fields = [field.strip() for field in line[len("votable {"):-1].split(",")]
+                unknown = [field for field in fields if field not in VOTABLE_COLUMNS]
+                if unknown:
+                    errors.append((number, f"Unknown votable field(s): {', '.join(unknown)}"))
+                    fields = [field for field in fields if field in VOTABLE_COLUMNS]
+            elif line == 'format object "%IDLIST"':
+                idlist = True
+            elif line.startswith("query id "):
+                name = line[len("query id "):].strip()
+                index = self._by_id.get(_normalise(name))
+                if index is None:
+                    errors.append((number, f"Identifier not found in the database : {name}"))
+                else:
+                    rows.append(index)
+            elif _REGION_REGEX.match(line):
+                try:
+                    centre, radius = _parse_region(_REGION_REGEX.match(line))
+                except ValueError as e:
+                    errors.append((number, str(e)))
+                    continue
+
+                separations = centre.separation(self._coords)
+                found = np.flatnonzero(separations <= radius)
+                found = found[np.argsort(separations[found])]
+                if len(found) == 0:
+                    errors.append((number, "No astronomical object found : "))
+                rows.extend(int(index) for index in found)
+            else:
+                errors.append((number, f"Unsupported command: {line}"))
+
+        if limit > 0:
+            rows = rows[:limit]
+
+        if not rows:
+            data = None
+        elif idlist:
+            data = "\n".join(self.catalog[rows[0]]["ids"])
+        else:
+            data = self._votable(rows, fields or ["main_id", "coordinates"])
+
+        console = (f"C.D.S.  -  SIMBAD4 rel 1.7  -  local stand-in\n"
+                   f"total execution time: {time.perf_counter() - start:.3f} secs")
+        response = _section("script", script.strip()) + _section("console", console)
+
+        if errors:
+            response += _section("error", "\n".join(f"[{number}] {message}" for number, message in errors))
+        if data is not None:
+            response += _section("data", data)
+
+        return response
+
+
+    def _votable(self, rows: list[int], fields: list[str]) -> str:
+        ''' Format catalog objects as a VOTable with the columns of the given
+            votable fields.
+        '''
+        entries = [self.catalog[index] for index in rows]
+        coords = self._coords[rows]
+        columns = {
+            "MAIN_ID": [entry["main_id"] for entry in entries],
+            "RA": list(coords.ra.to_string(unit=u.hourangle, sep=" ", precision=4, pad=True)),
+            "DEC": list(coords.dec.to_string(unit=u.deg, sep=" ", precision=3, pad=True, alwayssign=True)),
+            "RA_PREC": [8] * len(entries),
+            "DEC_PREC": [8] * len(entries),
+            "IDS": ["|".join(entry["ids"]) for entry in entries],
+        }
+
+        table = Table({name: columns[name] for field in fields for name in VOTABLE_COLUMNS[field]})
+        output = BytesIO()
+        from_table(table).to_xml(output)
+        return output.getvalue().decode("utf-8")
+
+
+    def _inject(self) -> bool:
+        ''' Delay a request by the configured latency, and decide whether
+            to answer it with an error.
+
+        Returns:
+            bool: True if the request should be answered with an error.
+        '''
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+            self.stats["errors"] += failed
+
+        time.sleep(delay)
+        return failed
+
+
+    def _handler(self) -> type:
+        ''' Create the request handler class for this stand-in.
+        '''
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._answer(urlparse(self.path).query)
+
+            def do_POST(self):
+                self._answer(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8"))
+
+            def _answer(self, query: str):
+                if urlparse(self.path).path != SCRIPT_PATH:
+                    self._send(404, "Not Found")
+                elif standin._inject():
+                    self._send(standin.error_status, "Injected error")
+                else:
+                    self._send(200, standin.answer(parse_qs(query).get("script", [""])[0]))
+
+            def _send(self, status: int, body: str):
+                content = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the SIMBAD sim-script service")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8081, help="port to listen on")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help="JSON catalog of objects to serve")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every response is delayed by")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many more seconds added to the delay at random")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with an HTTP error")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected errors")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the injected jitter and errors")
+
+    args = parser.parse_args()
+    standin = SimbadStandIn(load_catalog(args.catalog), args.latency, args.jitter, args.error_rate,
+                            args.error_status, args.seed, args.host, args.port)
+
+    print(f"Serving {len(standin.catalog)} objects, set SIMBAD_MIRROR={standin.url}", flush=True)
+    standin._server.serve_forever()
@@ -27,6 +27,7 @@ import unittest
 from astropy.coordinates.sky_coordinate import SkyCoord
 
 from model.ds.alias_result import AliasResult
+from model.ds.alias_matcher import AliasMatcher
 from model.ds.search_filters import SearchFilters, DateFilter, KeywordMode
 from model.ds.report_types import ImportedReport, ReportResult
 from model.constants import valid_keyword
@@ -72,6 +73,34 @@ class TestAliasResult(unittest.TestCase):
         ar4 = AliasResult("name","OBJ")
         self.assertNotEqual(self.ar, ar4)
 
+class TestAliasMatcher(unittest.TestCase):
+
+    #Setup
+    def setUp(self):
+        self.am = AliasMatcher([AliasResult("V404 Cyg","V* V404 Cyg"),AliasResult("GS 2023+338","V* V404 Cyg"),AliasResult("Sco X-1","Sco X-1"),AliasResult("4U 1617-15","Sco X-1")])
+
+    #Test constructor
+    def test_creation(self):
+        self.assertEqual(len(self.am),4)
+        self.assertEqual(len(AliasMatcher()),0)
+
+    #Test whole word matching
+    def test_find(self):
+        self.assertListEqual(self.am.find("Outburst of GS 2023+338 (V404 Cyg)"),["v* v404 cyg"])
+        self.assertListEqual(self.am.find("v* v404 cyg"),["v* v404 cyg"])
+        self.assertListEqual(self.am.find("SCO X-1 and V404 CYG"),["v* v404 cyg","sco x-1"])
+        self.assertListEqual(self.am.find("V404 Cygni, GS 2023+3381 and Sco X-12"),[])
+        self.assertListEqual(self.am.find(""),[])
+
+    #Test adding aliases after creation
+    def test_add(self):
+        self.am.add("Cyg X-1","Cyg X-1")
+        self.am.add("HDE 226868","Cyg X-1")
+        self.assertEqual(len(self.am),6)
+        self.assertListEqual(self.am.find("HDE 226868 and 4U 1617-15"),["sco x-1","cyg x-1"])
+        self.am.add("","Empty")
+        self.assertListEqual(self.am.find("  "),[])
+
 class TestSearchFilters(unittest.TestCase):
     def setUp(self):
         self.sf = SearchFilters("term",["key", "word"],KeywordMode.ALL)
@@ -209,6 +238,25 @@ class TestReportTypes(unittest.TestCase):
         ir4 = ImportedReport(14000, "ATel Title", "R. Khayech", "Body text", datetime(2021, 7, 30), [14001], [datetime(2021, 8, 30)], ["Radio", "sTAR"], [], [], [13000])
         self.assertNotEqual(self.ir,ir4)
 
+    def test_hash(self):
+        rr = ReportResult(14000, "ATel Title", "R. Khayech", "Body text", datetime(2021, 7, 30), [14001])
+        rr2 = ReportResult(14001, "ATel Title", "R. Khayech", "Body text", datetime(2021, 7, 30), [14001])
+
+        # Equal reports have equal hashes, including across subclasses.
+        self.assertEqual(self.ir, rr)
+        self.assertEqual(hash(self.ir), hash(rr))
+        self.assertNotEqual(hash(rr), hash(rr2))
+
+        # Reports can be used in sets and as dictionary keys.
+        self.assertEqual(len({self.ir, rr, rr2}), 2)
+        self.assertIn(rr, {self.ir: True})
+
+    def test_no_body(self):
+        # Summary search results are returned without their body.
+        rr = ReportResult(14000, "ATel Title", "R. Khayech", None, datetime(2021, 7, 30), [14001])
+        self.assertIsNone(rr.body)
+        self.assertIn("Body length: not retrieved", str(rr))
+
     def test_invalid_atel_num(self):
         with self.assertRaises(ValueError):
             self.ir.atel_num = 0
@@ -21,6 +21,7 @@ License Terms and Copyright:
     along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 import unittest
+from unittest import mock
 from datetime import datetime, timedelta
 from astropy import coordinates
 
@@ -28,6 +29,7 @@ import mysql.connector
 from mysql.connector.cursor import MySQLCursor
 from astropy.coordinates.sky_coordinate import SkyCoord
 
+from model.db import db_init
 from model.db import db_interface as db
 from model.ds.alias_result import AliasResult
 from model.ds.report_types import ImportedReport
@@ -46,7 +48,10 @@ class TestInitTables(unittest.TestCase):
         _verifyTable(self,"ObjectRefs")
         _verifyTable(self, "ReportRefs")
         _verifyTable(self, "ReportCoords")
+        _verifyTable(self, "ReportKeywords")
         _verifyTable(self, "ObservationDates")
+        _verifyTable(self, "EnrichmentQueue")
+        _verifyTable(self, "SimbadCache")
 
 def _verifyTable(self:TestInitTables, table_name):
     cn = db._connect()
@@ -61,6 +66,115 @@ def _verifyTable(self:TestInitTables, table_name):
 
     self.assertTrue(result)
 
+class TestUpgradeSchema(unittest.TestCase):
+    def setUp(self):
+        # Return the database to the v8 schema
+        cn = db._connect()
+        cur:MySQLCursor = cn.cursor()
+        cur.execute("drop table if exists ReportKeywords")
+        cur.execute("drop table if exists EnrichmentQueue")
+        cur.execute("drop table if exists SimbadCache")
+        cur.execute("alter table Reports drop index title, drop index submissionDate")
+        cur.execute("alter table ReportCoords drop index decZone, drop column decZone")
+        cur.execute("alter table Objects drop index decZone, drop index lastUpdated, drop column decZone, drop column refreshRequested, drop column refreshAfter")
+        cur.execute("update Metadata set schemaVersion = 8")
+
+        # Add data stored before the upgrade
+        cur.execute("delete from Reports where atelNum = 99999")
+        cur.execute("delete from Objects where objectID = 'test_upgrade_id'")
+        cur.execute("insert into Reports (atelNum, title, authors, body, submissionDate, keywords) values (99999, 'upgrade title', 'authors', 'upgrade body', '2021-10-01', 'radio,x-ray')")
+        cur.execute("insert into ReportCoords (atelNumFK, ra, declination) values (99999, 204.2, 30.34)")
+        cur.execute("insert into Objects (objectID, ra, declination) values ('test_upgrade_id', 204.2, -30.34)")
+        cn.commit()
+        cur.close()
+        cn.close()
+
+    def testUpgradeFromV8(self):
+        with (self.assertWarns(db_init.SchemaUpgradedWarning)):
+            db_init.init_db()
+
+        self.assertEqual(db_init._get_schema_version(), db_init._LATEST_SCHEMA_VERSION)
+        _verifyTable(self, "ReportKeywords")
+        _verifyTable(self, "EnrichmentQueue")
+        _verifyTable(self, "SimbadCache")
+
+        cn = db._connect()
+        cur:MySQLCursor = cn.cursor()
+
+        # Stored coordinates and keywords are indexed
+        cur.execute("select decZone from ReportCoords where atelNumFK = 99999")
+        self.assertEqual(cur.fetchone()[0], db._dec_zone(30.34))
+        cur.execute("select decZone, refreshRequested, refreshAfter from Objects where objectID = 'test_upgrade_id'")
+        self.assertTupleEqual(cur.fetchone(), (db._dec_zone(-30.34), None, None))
+        cur.execute("select keywordID from ReportKeywords where atelNumFK = 99999 order by keywordID")
+        self.assertListEqual([row[0] for row in cur.fetchall()], sorted([db._keyword_id("radio"), db._keyword_id("x-ray")]))
+
+        # New indexes were added
+        cur.execute("select title from Reports where match (title, body) against ('upgrade' in boolean mode)")
+        self.assertIn(("upgrade title",), cur.fetchall())
+        cur.execute("show index from Reports where Column_name = 'submissionDate'")
+        self.assertTrue(cur.fetchall())
+        cur.execute("show index from Objects where Column_name = 'lastUpdated'")
+        self.assertTrue(cur.fetchall())
+
+        cur.close()
+        cn.close()
+
+    def tearDown(self):
+        cn = db._connect()
+        cur:MySQLCursor = cn.cursor()
+        cur.execute("delete from Reports where atelNum = 99999")
+        cur.execute("delete from Objects where objectID = 'test_upgrade_id'")
+        cn.commit()
+        cur.close()
+        cn.close()
+
+class TestConnectionPool(unittest.TestCase):
+    def testConnectionsReturned(self):
+        before = db.get_pool_stats()
+
+        # Paths that previously leaked their connection
+        db.user_exists("test")
+        db.object_exists("test-pool-alias")
+        with (self.assertRaises(db.UserNotFoundError)):
+            db.get_hashed_password("test-pool-user")
+
+        after = db.get_pool_stats()
+        self.assertEqual(after["in_use"], before["in_use"])
+        self.assertEqual(after["checkouts"] - before["checkouts"], after["returns"] - before["returns"])
+
+        # Connections closed by the caller are counted as returned too
+        cn = db._connect()
+        self.assertEqual(db.get_pool_stats()["in_use"], before["in_use"] + 1)
+        cn.close()
+        self.assertEqual(db.get_pool_stats()["in_use"], before["in_use"])
+
+    def testContextManagerReturnsOnError(self):
+        before = db.get_pool_stats()
+
+        with (self.assertRaises(mysql.connector.Error)):
+            with db._cursor() as cur:
+                cur.execute("select * from NotATable")
+
+        self.assertEqual(db.get_pool_stats()["in_use"], before["in_use"])
+
+    def testPoolNotExhausted(self):
+        # More sequential calls than connections in the pool should reuse them.
+        for i in range(db._POOL_SIZE * 3):
+            db.get_next_atel_num()
+
+        stats = db.get_pool_stats()
+        self.assertEqual(stats["in_use"], 0)
+        self.assertLessEqual(stats["pool_size"], 32)
+
+    def testHelperPoolSize(self):
+        # Pools created after the size is set hold that many connections
+        with mock.patch.object(db, "_pool", None), mock.patch.object(db, "_pool_size", db._pool_size), mock.patch.object(db, "_pool_stats", {}):
+            db.set_pool_size(1)
+            db.get_next_atel_num()
+            db.get_next_atel_num()
+            self.assertEqual(db.get_pool_stats()["pool_size"], 1)
+
 class TestAuth(unittest.TestCase):
     
     def testAddUser(self):
@@ -164,11 +278,17 @@ class TestReports(unittest.TestCase):
             self.assertIn(("test_main_id",),results)
 
             #test linking coords
-            cur.execute("select ra, declination from ReportCoords where atelNumFK = 19999")
+            cur.execute("select ra, declination, decZone from ReportCoords where atelNumFK = 19999")
             results = cur.fetchall()
             result = results[0]
             self.assertAlmostEqual(float(result[0]), self.ex_coords.ra.deg, 10)
             self.assertAlmostEqual(float(result[1]), self.ex_coords.dec.deg, 10)
+            self.assertEqual(result[2], db._dec_zone(self.ex_coords.dec.deg))
+
+            #test linking keywords
+            cur.execute("select keywordID from ReportKeywords where atelNumFK = 19999 order by keywordID")
+            results = cur.fetchall()
+            self.assertListEqual(results, [(0,), (44,)])
 
         finally:
             # clean up test data
@@ -179,8 +299,80 @@ class TestReports(unittest.TestCase):
             cn.commit()
             cn.close()
 
+    def testAddReports(self):
+        coords = SkyCoord("13h36m50s", "30d20m20s", frame="icrs", unit=("hourangle", "deg"))
+
+        report1 = ImportedReport(19997,"db_test_batch1","A","B",datetime(2021,8,12),referenced_reports=[19996],referenced_by=[19998],observation_dates=[datetime(2021,8,10)],keywords=["star"],coordinates=[coords])
+        report2 = ImportedReport(19998,"db_test_batch2","A","B",datetime(2021,8,13),referenced_reports=[19997],keywords=["radio"])
+
+        db.add_report(report1)
+
+        try:
+            # Stored reports and repeats within the batch are skipped.
+            added = db.add_reports([report1, report2, report2])
+            self.assertListEqual(added, [19998])
+            self.assertListEqual(db.add_reports([]), [])
+
+            results = db.find_reports_by_object(SearchFilters(term="db_test_batch"))
+            self.assertIn(report1, results)
+            self.assertIn(report2, results)
+
+            with db._cursor() as cur:
+                cur.execute("select refReport from ReportRefs where atelNum = 19998")
+                self.assertListEqual(cur.fetchall(), [(19997,)])
+
+                cur.execute("select obDate from ObservationDates where atelNumFK = 19997")
+                self.assertListEqual(cur.fetchall(), [(datetime(2021,8,10),)])
+
+                cur.execute("select count(*) from ReportCoords where atelNumFK = 19997")
+                self.assertEqual(cur.fetchone()[0], 1)
+
+            with self.assertRaises(db.ExistingReportError):
+                db.add_report(report2)
+        finally:
+            with db._cursor(commit=True) as cur:
+                cur.execute("delete from Reports where atelNum between 19997 and 19998")
+                cur.execute("delete from ReportRefs where atelNum between 19996 and 19998")
+
+    def testReplaceReports(self):
+        coords = SkyCoord("13h36m50s", "30d20m20s", frame="icrs", unit=("hourangle", "deg"))
+
+        report1 = ImportedReport(19995,"db_test_replace1","A","B",datetime(2021,8,12),referenced_reports=[19994],observation_dates=[datetime(2021,8,10)],keywords=["star"],coordinates=[coords])
+        report2 = ImportedReport(19996,"db_test_replace2","A","B",datetime(2021,8,13),keywords=["radio"])
+
+        db.add_report(report1)
+
+        try:
+            # Reparsed report drops its old relations.
+            reparsed1 = ImportedReport(19995,"db_test_replace1","A","C",datetime(2021,8,12),referenced_reports=[19993],keywords=["radio"])
+            self.assertEqual(db.replace_reports([reparsed1, report2]), 1)
+            self.assertEqual(db.replace_reports([]), 0)
+
+            results = db.find_reports_by_object(SearchFilters(term="db_test_replace"))
+            self.assertIn(reparsed1, results)
+            self.assertIn(report2, results)
+            self.assertEqual(db.get_report(19995).body, "C")
+
+            with db._cursor() as cur:
+                cur.execute("select refReport from ReportRefs where atelNum = 19995")
+                self.assertListEqual(cur.fetchall(), [(19993,)])
+
+                cur.execute("select count(*) from ObservationDates where atelNumFK = 19995")
+                self.assertEqual(cur.fetchone()[0], 0)
+
+                cur.execute("select count(*) from ReportCoords where atelNumFK = 19995")
+                self.assertEqual(cur.fetchone()[0], 0)
+
+                cur.execute("select keywordID from ReportKeywords where atelNumFK = 19995")
+                self.assertListEqual(cur.fetchall(), [(db._keyword_id("radio"),)])
+        finally:
+            with db._cursor(commit=True) as cur:
+                cur.execute("delete from Reports where atelNum between 19995 and 19996")
+                cur.execute("delete from ReportRefs where atelNum between 19993 and 19996")
+
     def testBuildBaseQuery(self):
         self.assertEqual(db._build_report_base_query(), ("select atelNum, title, authors, body, submissionDate ","from Reports "))
+        self.assertEqual(db._build_report_base_query(include_body=False), ("select atelNum, title, authors, null, submissionDate ","from Reports "))
 
     def testBuildWhereClause(self):
         #Test full query
@@ -188,19 +380,19 @@ class TestReports(unittest.TestCase):
         df = DateFilter(datetime(2021, 8, 17), datetime(2021, 8, 17))
         query, data = db._build_where_clause(sf,df)
         self.maxDiff = None
-        self.assertEqual(query, "where submissionDate >= %s and submissionDate < %s and (title like concat('%', %s, '%') or body like concat('%', %s, '%')) and (FIND_IN_SET(%s, keywords) > 0 or FIND_IN_SET(%s, keywords) > 0) ")
-        self.assertTupleEqual(data,(df.start_date,df.end_date+timedelta(days=1),sf.term,sf.term,sf.keywords[0],sf.keywords[1]))
+        self.assertEqual(query, "where submissionDate >= %s and submissionDate < %s and (match(title, body) against (%s in boolean mode) and (title like concat('%', %s, '%') or body like concat('%', %s, '%'))) and atelNum in (select atelNumFK from ReportKeywords where keywordID in (%s, %s)) ")
+        self.assertTupleEqual(data,(df.start_date,df.end_date+timedelta(days=1),"+term*",sf.term,sf.term,44,37))
 
         #Test keyword modes / single filter
         sf2 = SearchFilters(term=None, keywords=["star","planet"], keyword_mode=KeywordMode.ALL)
         query2, data2 = db._build_where_clause(sf2)
-        self.assertEqual(query2,"where (FIND_IN_SET(%s, keywords) > 0 and FIND_IN_SET(%s, keywords) > 0) ")
-        self.assertTupleEqual(data2,(sf.keywords[0],sf.keywords[1]))
+        self.assertEqual(query2,"where atelNum in (select atelNumFK from ReportKeywords where keywordID in (%s, %s) group by atelNumFK having count(*) = %s) ")
+        self.assertTupleEqual(data2,(44,37,2))
 
         sf2.keyword_mode = KeywordMode.NONE
         query3, data3 = db._build_where_clause(sf2)
-        self.assertEqual(query3,"where (FIND_IN_SET(%s, keywords) = 0 and FIND_IN_SET(%s, keywords) = 0) ")
-        self.assertTupleEqual(data3,(sf.keywords[0],sf.keywords[1]))
+        self.assertEqual(query3,"where atelNum not in (select atelNumFK from ReportKeywords where keywordID in (%s, %s)) ")
+        self.assertTupleEqual(data3,(44,37))
 
         #Test empty query
         sf = None
@@ -209,6 +401,87 @@ class TestReports(unittest.TestCase):
         self.assertEqual(query,"")
         self.assertTupleEqual(data,())
 
+    def testBuildPageClauses(self):
+        after = (datetime(2021, 8, 17, 12, 30), 14000)
+
+        # Test cursor clause
+        query, data = db._build_where_clause(after=after)
+        self.assertEqual(query, "where (submissionDate < %s or (submissionDate = %s and atelNum < %s)) ")
+        self.assertTupleEqual(data, (after[0], after[0], after[1]))
+
+        # Test order clause
+        query, data = db._build_order_clause()
+        self.assertEqual(query, "order by submissionDate desc, atelNum desc ")
+        self.assertTupleEqual(data, ())
+
+        query, data = db._build_order_clause(20)
+        self.assertEqual(query, "order by submissionDate desc, atelNum desc limit %s ")
+        self.assertTupleEqual(data, (20,))
+
+    def testBuildKeywordClause(self):
+        # Test keywords are case insensitive and repeats are removed
+        query, data = db._build_keyword_clause(["Star", "star", "radio"], KeywordMode.ALL)
+        self.assertEqual(query, "atelNum in (select atelNumFK from ReportKeywords where keywordID in (%s, %s) group by atelNumFK having count(*) = %s) ")
+        self.assertTupleEqual(data, (44, 0, 2))
+
+        # Test invalid keywords can never be matched
+        query, data = db._build_keyword_clause(["star", "not a keyword"], KeywordMode.ALL)
+        self.assertTupleEqual(data, (44, 2))
+
+        query, data = db._build_keyword_clause(["star", "not a keyword"], KeywordMode.ANY)
+        self.assertEqual(query, "atelNum in (select atelNumFK from ReportKeywords where keywordID in (%s)) ")
+        self.assertTupleEqual(data, (44,))
+
+        query, data = db._build_keyword_clause(["not a keyword"], KeywordMode.ANY)
+        self.assertEqual(query, "false ")
+
+        query, data = db._build_keyword_clause(["not a keyword"], KeywordMode.NONE)
+        self.assertEqual(query, "")
+        self.assertTupleEqual(data, ())
+
+    def testFindPaged(self):
+        reports = [ImportedReport(atel_num, "db_test_paged", "A", "B", datetime(2021, 8, 12 if atel_num < 20013 else 13)) for atel_num in range(20010, 20016)]
+        db.add_reports(reports)
+        try:
+            # Newest first, ties broken by descending ATel number
+            results = db.find_reports_by_object(SearchFilters(term="db_test_paged"), limit=4)
+            self.assertListEqual([r.atel_num for r in results], [20015, 20014, 20013, 20012])
+
+            last = results[-1]
+            results = db.find_reports_by_object(SearchFilters(term="db_test_paged"), limit=4, after=(last.submission_date, last.atel_num))
+            self.assertListEqual([r.atel_num for r in results], [20011, 20010])
+
+            self.assertEqual(db.count_reports(SearchFilters(term="db_test_paged")), 6)
+            self.assertEqual(db.count_reports(SearchFilters(term="db_test_paged"), object_names=["not-an-object"]), 0)
+        finally:
+            with db._cursor(commit=True) as cur:
+                cur.execute("delete from Reports where atelNum between 20010 and 20015")
+
+    def testBuildTermClause(self):
+        # Test full-text search
+        query, data = db._build_term_clause("GX 339-4")
+        self.assertEqual(query, "(match(title, body) against (%s in boolean mode) and (title like concat('%', %s, '%') or body like concat('%', %s, '%'))) ")
+        self.assertTupleEqual(data, ("+339*", "GX 339-4", "GX 339-4"))
+
+        # Test stopwords and short words are not required
+        query, data = db._build_term_clause("the Crab Nebula")
+        self.assertTupleEqual(data, ("+Crab* +Nebula*", "the Crab Nebula", "the Crab Nebula"))
+
+        # Test term without indexed words
+        query, data = db._build_term_clause("B")
+        self.assertEqual(query, "(title like concat('%', %s, '%') or body like concat('%', %s, '%')) ")
+        self.assertTupleEqual(data, ("B", "B"))
+
+        # Test substring compatibility mode
+        mode = db._TERM_SEARCH_MODE
+        db._TERM_SEARCH_MODE = "substring"
+        try:
+            query, data = db._build_term_clause("GX 339-4")
+            self.assertEqual(query, "(title like concat('%', %s, '%') or body like concat('%', %s, '%')) ")
+            self.assertTupleEqual(data, ("GX 339-4", "GX 339-4"))
+        finally:
+            db._TERM_SEARCH_MODE = mode
+
     def testFindGeneric(self):
         report = ImportedReport(20001,"db_test_report","db_test_authors_text","db_test_body_text", datetime(2021,8,12), keywords=["star","radio"])
 
@@ -224,6 +497,17 @@ class TestReports(unittest.TestCase):
             result = results[0]
             self.assertEqual(report,result)
 
+            #test search without bodies
+            results = db.find_reports_by_object(SearchFilters(term="db_test_report"), include_body=False)
+            result = results[0]
+            self.assertEqual(result.atel_num, report.atel_num)
+            self.assertIsNone(result.body)
+
+            #test get single report
+            self.assertEqual(db.get_report(20001), report)
+            with self.assertRaises(db.ReportNotFoundError):
+                db.get_report(20002)
+
             #Test search author (not possible)
             results = db.find_reports_by_object(SearchFilters(term="db_test_authors"))
             self.assertListEqual(results,[])
@@ -295,6 +579,144 @@ class TestReports(unittest.TestCase):
             cn.commit()
             cn.close()
 
+class TestEnrichmentQueue(unittest.TestCase):
+    def testEnrichmentQueue(self):
+        coords1 = SkyCoord(1.0000000001, -89.5, frame="icrs", unit=("deg", "deg"))
+        coords2 = SkyCoord(2.0000000001, -89.5, frame="icrs", unit=("deg", "deg"))
+
+        report1 = ImportedReport(19997,"db_test_enrich1","A","B",datetime(2021,8,12),coordinates=[coords1, coords2])
+        report2 = ImportedReport(19998,"db_test_enrich2","A","B",datetime(2021,8,13),coordinates=[coords1])
+
+        def queued():
+            with db._cursor() as cur:
+                cur.execute("select ra, attempts, nextAttempt is null, lastError from EnrichmentQueue where declination = -89.5 order by ra")
+                return [(float(row[0]), row[1], bool(row[2]), row[3]) for row in cur.fetchall()]
+
+        try:
+            # Identical coordinates are only queued once, and only when asked for on replacement.
+            db.add_report(report1)
+            db.add_reports([report2])
+            db.replace_reports([report2])
+            self.assertEqual(queued(), [(1.0000000001, 0, False, None), (2.0000000001, 0, False, None)])
+
+            # Claimed coordinates are hidden from other workers until their lease runs out.
+            claimed = [entry for entry in db.claim_enrichments(1000, 600) if entry[1] == -89.5]
+            self.assertCountEqual(claimed, [(1.0000000001, -89.5, 0), (2.0000000001, -89.5, 0)])
+            self.assertEqual([entry for entry in db.claim_enrichments(1000, 600) if entry[1] == -89.5], [])
+
+            db.complete_enrichment(1.0000000001, -89.5)
+            db.fail_enrichment(2.0000000001, -89.5, "SIMBAD timed out")
+            self.assertEqual(queued(), [(2.0000000001, 1, True, "SIMBAD timed out")])
+            self.assertGreaterEqual(db.get_enrichment_queue_stats()["failed"], 1)
+
+            self.assertGreaterEqual(db.retry_failed_enrichments(), 1)
+            self.assertEqual(queued(), [(2.0000000001, 0, False, "SIMBAD timed out")])
+
+            db.fail_enrichment(2.0000000001, -89.5, "SIMBAD timed out", 600)
+            self.assertEqual(queued(), [(2.0000000001, 1, False, "SIMBAD timed out")])
+            self.assertEqual([entry for entry in db.claim_enrichments(1000, 600) if entry[1] == -89.5], [])
+        finally:
+            with db._cursor(commit=True) as cur:
+                cur.execute("delete from Reports where atelNum between 19997 and 19998")
+                cur.execute("delete from EnrichmentQueue where declination = -89.5")
+
+
+class TestSimbadCache(unittest.TestCase):
+    def testSimbadCache(self):
+        try:
+            self.assertIsNone(db.get_simbad_cache("test:db_test_cache"))
+
+            db.put_simbad_cache("test:db_test_cache", "[\"a\"]", 600)
+            response, ttl_seconds = db.get_simbad_cache("test:db_test_cache")
+            self.assertEqual(response, "[\"a\"]")
+            self.assertTrue(590 <= ttl_seconds <= 600)
+
+            # Caching a query again replaces the response.
+            db.put_simbad_cache("test:db_test_cache", "[]", 600)
+            self.assertEqual(db.get_simbad_cache("test:db_test_cache")[0], "[]")
+
+            # Expired responses are never returned.
+            db.put_simbad_cache("test:db_test_cache", "[]", -1)
+            self.assertIsNone(db.get_simbad_cache("test:db_test_cache"))
+        finally:
+            with db._cursor(commit=True) as cur:
+                cur.execute("delete from SimbadCache where cacheKey = 'test:db_test_cache'")
+
+
+class TestCoordsIndex(unittest.TestCase):
+    def testBuildCoordsBoxClause(self):
+        self.maxDiff = None
+
+        # Test box around the search cone
+        coords = SkyCoord(180, 30.05, frame="icrs", unit=("deg", "deg"))
+        clause, data = db._build_coords_box_clause(coords, 360)
+        self.assertEqual(clause, "decZone in (%s, %s, %s) and declination between %s and %s and ra between %s and %s ")
+        self.assertTupleEqual(data[:3], (1199, 1200, 1201))
+        self.assertAlmostEqual(data[3], 29.95, places=4)
+        self.assertAlmostEqual(data[4], 30.15, places=4)
+        self.assertLess(data[5], 179.9)
+        self.assertGreater(data[6], 180.1)
+
+        # Test box wrapping around RA 0
+        coords = SkyCoord(0.1, 0, frame="icrs", unit=("deg", "deg"))
+        clause, data = db._build_coords_box_clause(coords, 3600)
+        self.assertTrue(clause.endswith("and declination between %s and %s and (ra >= %s or ra <= %s) "))
+        self.assertAlmostEqual(data[-2], 359.1, places=2)
+        self.assertAlmostEqual(data[-1], 1.1, places=2)
+
+        # Test cone covering a pole
+        coords = SkyCoord(0, 89.9, frame="icrs", unit=("deg", "deg"))
+        clause, data = db._build_coords_box_clause(coords, 3600)
+        self.assertTrue(clause.endswith("and declination between %s and %s "))
+        self.assertTupleEqual(data[:-2], tuple(range(1788, 1801)))
+        self.assertEqual(data[-1], 90.0)
+
+        # Test query with box
+        coords = SkyCoord(180, 30.05, frame="icrs", unit=("deg", "deg"))
+        query, data = db._build_report_coords_query(filter_coords=True, coords=coords, radius=360)
+        self.assertEqual(query, "select atelNum, title, authors, body, submissionDate , ra, declination from Reports inner join ReportCoords on Reports.atelNum = ReportCoords.atelNumFK where decZone in (%s, %s, %s) and declination between %s and %s and ra between %s and %s ")
+        self.assertEqual(len(data), 7)
+
+    def testDecZone(self):
+        self.assertEqual(db._dec_zone(-90), 0)
+        self.assertEqual(db._dec_zone(-89.95), 0)
+        self.assertEqual(db._dec_zone(0), 900)
+        self.assertEqual(db._dec_zone(30.34), 1203)
+        self.assertEqual(db._dec_zone(90), 1800)
+
+    def testAngularSeparation(self):
+        coords = SkyCoord("13h36m50s", "30d20m20s", frame="icrs", unit=("hourangle", "deg"))
+        others = SkyCoord([204.2, 0.0, 204.208, 24.0], [30.34, -89.0, 30.3391, 30.0], frame="icrs", unit=("deg", "deg"))
+
+        separation = db._angular_separation(coords, others.ra.deg, others.dec.deg)
+        expected = coords.separation(others).arcsecond
+
+        for actual, exp in zip(separation, expected):
+            self.assertAlmostEqual(actual, exp, delta=1e-6)
+
+
+class TestAliasMatcher(unittest.TestCase):
+    @mock.patch("model.db.db_interface._alias_matcher", None)
+    @mock.patch("model.db.db_interface.get_all_aliases")
+    def testGetAliasMatcher(self, mock_get_all_aliases):
+        mock_get_all_aliases.return_value = [AliasResult("test-alias-1", "test_main_id"), AliasResult("test-alias-2", "test_main_id")]
+
+        matcher = db.get_alias_matcher()
+        self.assertIs(db.get_alias_matcher(), matcher)
+        self.assertEqual(mock_get_all_aliases.call_count, 1)
+        self.assertListEqual(matcher.find("Observations of TEST-ALIAS-2"), ["test_main_id"])
+
+        # Newly stored aliases are added to the loaded matcher
+        db._add_to_alias_matcher("test_add_aliases", ["test-alias-3"])
+        self.assertIs(db.get_alias_matcher(), matcher)
+        self.assertListEqual(matcher.find("test-alias-3 and test-alias-1"), ["test_main_id", "test_add_aliases"])
+
+        # Reloaded once it is too old
+        with mock.patch("model.db.db_interface._ALIAS_MATCHER_MAX_AGE", -1):
+            self.assertIsNot(db.get_alias_matcher(), matcher)
+        self.assertEqual(mock_get_all_aliases.call_count, 2)
+
+
 class TestObjects(unittest.TestCase):
     def setUp(self):
         # clean up test objects and aliases if already exists
@@ -319,6 +741,7 @@ class TestObjects(unittest.TestCase):
         self.assertEqual(result[0], "test_main_id")
         self.assertAlmostEqual(float(result[1]), self.ex_coords.ra.deg,10)
         self.assertAlmostEqual(float(result[2]), self.ex_coords.dec.deg,10)
+        self.assertEqual(result[3], db._dec_zone(self.ex_coords.dec.deg))
 
         cur.execute("select * from Aliases where objectIDFK like 'test_main_id'")
         results = cur.fetchall()
@@ -385,6 +808,11 @@ class TestObjects(unittest.TestCase):
         exists, updated = db.object_exists("test_add_aliases")
         self.assertNotEqual(updated, datetime(2020,1,1))
 
+        # Check the stored aliases were added to the alias matcher, and duplicates were not reassigned
+        db.add_aliases("test_add_aliases", ["test-alias-1"])
+        self.assertListEqual(db.get_alias_matcher().find("test-alias-4"), ["test_add_aliases"])
+        self.assertListEqual(db.get_alias_matcher().find("test-alias-1"), ["test_main_id"])
+
         with self.assertRaises(db.ObjectNotFoundError):
             db.add_aliases("test-invalid-id",["test-alias"])
 
@@ -422,6 +850,38 @@ class TestObjects(unittest.TestCase):
         with self.assertRaises(db.ObjectNotFoundError):
             db.get_object_coords("test-other-alias")
 
+    def testObjectRefresh(self):
+        db.add_object("test_add_aliases", self.ex_coords, ["test-alias-3"])
+
+        with db._cursor(commit=True) as cur:
+            cur.execute("update Objects set lastUpdated = %s where objectID = 'test_add_aliases'", (datetime(2020, 1, 1),))
+
+        def claim():
+            return [entry for entry in db.claim_object_refreshes(1000, 60 * 24 * 60 * 60, 600) if entry[0] == "test_add_aliases"]
+
+        # Requested by alias, keeping the time it was first requested.
+        db.request_object_refresh("test-alias-3")
+        stats = db.get_object_refresh_stats(60 * 24 * 60 * 60)
+        self.assertGreaterEqual(stats["requested"], 1)
+        self.assertGreater(stats["max_lag_seconds"], 0)
+
+        # Claimed objects are hidden from other workers until their lease runs out.
+        claimed = claim()
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(claimed[0][1], datetime(2020, 1, 1))
+        self.assertIsNotNone(claimed[0][2])
+        self.assertEqual(claim(), [])
+
+        db.fail_object_refresh("test_add_aliases", -1)
+        self.assertEqual(len(claim()), 1)
+
+        # Adding aliases completes the refresh.
+        db.add_aliases("test_add_aliases", ["test-alias-4"])
+        self.assertEqual(claim(), [])
+
+        with self.assertRaises(db.ObjectNotFoundError):
+            db.request_object_refresh("test-other-alias")
+
     def testLinkReports(self):
         #Test case - alias in title
         db.add_report(ImportedReport(99999, "test-db-title-about:test-alias-1, findings","db-test-authors","db-test-body",datetime(2021,9,18)))
@@ -501,13 +961,13 @@ class TestObjects(unittest.TestCase):
 
         # Test only filters
         query, data = db._build_report_name_query(sf,df)
-        self.assertEqual(query, "select atelNum, title, authors, body, submissionDate from Reports where submissionDate >= %s and submissionDate < %s and (title like concat('%', %s, '%') or body like concat('%', %s, '%')) and (FIND_IN_SET(%s, keywords) > 0 or FIND_IN_SET(%s, keywords) > 0) ")
-        self.assertTupleEqual(data, (df.start_date, df.end_date+timedelta(days=1), sf.term, sf.term, sf.keywords[0], sf.keywords[1]))
+        self.assertEqual(query, "select atelNum, title, authors, body, submissionDate from Reports where submissionDate >= %s and submissionDate < %s and (match(title, body) against (%s in boolean mode) and (title like concat('%', %s, '%') or body like concat('%', %s, '%'))) and atelNum in (select atelNumFK from ReportKeywords where keywordID in (%s, %s)) ")
+        self.assertTupleEqual(data, (df.start_date, df.end_date+timedelta(days=1), "+term*", sf.term, sf.term, 44, 37))
 
         # Test full query
         query, data = db._build_report_name_query(sf,df,"test_main_id")
-        self.assertEqual(query, "select atelNum, title, authors, body, submissionDate from Reports inner join ObjectRefs on Reports.atelNum = ObjectRefs.atelNumFK and ObjectRefs.objectIDFK = %s where submissionDate >= %s and submissionDate < %s and (title like concat('%', %s, '%') or body like concat('%', %s, '%')) and (FIND_IN_SET(%s, keywords) > 0 or FIND_IN_SET(%s, keywords) > 0) ")
-        self.assertTupleEqual(data, ("test_main_id", df.start_date, df.end_date+timedelta(days=1), sf.term, sf.term, sf.keywords[0], sf.keywords[1]))
+        self.assertEqual(query, "select atelNum, title, authors, body, submissionDate from Reports inner join ObjectRefs on Reports.atelNum = ObjectRefs.atelNumFK and ObjectRefs.objectIDFK = %s where submissionDate >= %s and submissionDate < %s and (match(title, body) against (%s in boolean mode) and (title like concat('%', %s, '%') or body like concat('%', %s, '%'))) and atelNum in (select atelNumFK from ReportKeywords where keywordID in (%s, %s)) ")
+        self.assertTupleEqual(data, ("test_main_id", df.start_date, df.end_date+timedelta(days=1), "+term*", sf.term, sf.term, 44, 37))
 
     def testBuildReportCoordsQuery(self):
         self.maxDiff = None
@@ -529,15 +989,15 @@ class TestObjects(unittest.TestCase):
 
         # Test only filters
         query, data = db._build_report_coords_query(sf, df)
-        self.assertEqual(query, "select atelNum, title, authors, body, submissionDate from Reports where submissionDate >= %s and submissionDate < %s and (title like concat('%', %s, '%') or body like concat('%', %s, '%')) and (FIND_IN_SET(%s, keywords) > 0 or FIND_IN_SET(%s, keywords) > 0) ")
+        self.assertEqual(query, "select atelNum, title, authors, body, submissionDate from Reports where submissionDate >= %s and submissionDate < %s and (match(title, body) against (%s in boolean mode) and (title like concat('%', %s, '%') or body like concat('%', %s, '%'))) and atelNum in (select atelNumFK from ReportKeywords where keywordID in (%s, %s)) ")
         self.assertTupleEqual(data, (df.start_date, df.end_date+timedelta(days=1),
-                              sf.term, sf.term, sf.keywords[0], sf.keywords[1]))
+                              "+term*", sf.term, sf.term, 44, 37))
 
         # Test full query
         query, data = db._build_report_coords_query(sf, df, filter_coords=True)
-        self.assertEqual(query, "select atelNum, title, authors, body, submissionDate , ra, declination from Reports inner join ReportCoords on Reports.atelNum = ReportCoords.atelNumFK where submissionDate >= %s and submissionDate < %s and (title like concat('%', %s, '%') or body like concat('%', %s, '%')) and (FIND_IN_SET(%s, keywords) > 0 or FIND_IN_SET(%s, keywords) > 0) ")
+        self.assertEqual(query, "select atelNum, title, authors, body, submissionDate , ra, declination from Reports inner join ReportCoords on Reports.atelNum = ReportCoords.atelNumFK where submissionDate >= %s and submissionDate < %s and (match(title, body) against (%s in boolean mode) and (title like concat('%', %s, '%') or body like concat('%', %s, '%'))) and atelNum in (select atelNumFK from ReportKeywords where keywordID in (%s, %s)) ")
         self.assertTupleEqual(data, (df.start_date,
-                              df.end_date+timedelta(days=1), sf.term, sf.term, sf.keywords[0], sf.keywords[1]))
+                              df.end_date+timedelta(days=1), "+term*", sf.term, sf.term, 44, 37))
 
     def testFindByObject(self):
         report = ImportedReport(99999, "db_test_report", "db_test_authors_text","db_test_body_text", datetime(2021, 8, 12), keywords=["star", "radio"], objects=["test_main_id"])
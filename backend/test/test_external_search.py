@@ -24,24 +24,33 @@ License Terms and Copyright:
 """
 
 
+import json
+import mysql.connector
+import re
 import requests
+import time
 import unittest as ut
 import numpy as np
 import random as r
 from enum import Enum 
 from unittest import mock
 
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from unittest.mock import MagicMock
 
 from controller.search import query_simbad
 from controller.search.query_simbad import QuerySimbadError
 from model.constants import DEFAULT_RADIUS
 
+from astropy.io.votable import parse_single_table
 from astropy.table import Table
 from astropy.table.column import Column
 from astropy.coordinates.sky_coordinate import SkyCoord
 from requests.adapters import ReadTimeout
 
+from test.simbad_standin import SimbadStandIn
+
 
 class TableType(Enum):
     QUERY_OBJECT=1
@@ -230,10 +239,27 @@ def mocked_region_table(*args, **kwargs):
     return create_mock_table(TableType.QUERY_REGION)[0]
 
 
+def use_memory_cache(test: ut.TestCase):
+    '''
+        Caches SIMBAD responses in memory only for the rest of the test, 
+        starting with an empty cache, so tests neither see responses cached 
+        by earlier tests nor write to the database. 
+    '''
+    patcher = mock.patch.object(query_simbad, '_CACHE_STORE', 'memory')
+    patcher.start()
+    test.addCleanup(patcher.stop)
+    query_simbad.clear_simbad_cache()
+    test.addCleanup(query_simbad.clear_simbad_cache)
+
+
 ########################################
 # Unit testing: query_simbad_by_name() #
 ########################################
 class TestNameSearch(ut.TestCase):
+    def setUp(self):
+        use_memory_cache(self)
+
+
     # Test network error (no connection, mocked). 
     @mock.patch('controller.search.query_simbad.Simbad._request', new=mocked_no_network)
     def test_no_network(self):
@@ -284,6 +310,12 @@ class TestCoordSearch(ut.TestCase):
         self.sample_coords = SkyCoord("20 54 05.689", "+37 01 17.38", unit=('hourangle','deg'))
         # 20.0 arcseconds. 
         self.sample_radius = 20.0
+        use_memory_cache(self)
+
+        # The mocked tables don't have the aliases votable field. 
+        patcher = mock.patch('controller.search.query_simbad.Simbad.add_votable_fields')
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
 
     @mock.patch('controller.search.query_simbad.Simbad.query_region', new=mocked_region_table)
@@ -359,6 +391,354 @@ class TestCoordSearch(ut.TestCase):
             self.fail(f"Function raised ValueError for valid radius: ${str(e)}")
 
 
+# The public functions of query_simbad, saved before any test runs. 
+# Other test suites replace them with mocks without restoring them. 
+QUERY_SIMBAD_FUNCTIONS = {name: getattr(query_simbad, name) for name in ("get_aliases", "query_simbad_region", "query_simbad_by_coords", "query_simbad_by_name")}
+
+
+class FakeSimbad:
+    '''
+        Stand-in for the astroquery Simbad class, answering queries from a 
+        small catalogue and counting how often each query reaches it. 
+    '''
+    def __init__(self):
+        self.objects = {
+            "m 1": ("M   1", "05 34 31.94", "+22 00 52.2", ["M 1", "NGC 1952", "Crab Nebula"]),
+            "m 31": ("M  31", "00 42 44.330", "+41 16 07.50", ["M 31", "NGC 224", "Andromeda"]),
+        }
+        self.regions = {(83.63308, 22.01450): ["M   1"], (10.68471, 41.26875): ["M  31", "M   1"]}
+        self.fields = ["main_id", "coordinates"]
+        self.queries = []
+        self.error = None
+
+    def get_votable_fields(self) -> list[str]:
+        return list(self.fields)
+
+    def add_votable_fields(self, *fields):
+        self.fields.extend(fields)
+
+    def _query(self, kind: str, value):
+        self.queries.append((kind, value))
+
+        if self.error is not None:
+            raise self.error
+
+    def _find(self, name: str):
+        key = ' '.join(name.split()).lower()
+
+        for entry in self.objects.values():
+            if key in (' '.join(entry[0].split()).lower(), *[alias.lower() for alias in entry[3]]):
+                return entry
+
+        return None
+
+    def query_object(self, name: str) -> Table:
+        self._query("object", name)
+        entry = self._find(name)
+
+        if entry is None:
+            return None
+
+        return Table({"MAIN_ID": [entry[0]], "RA": [entry[1]], "DEC": [entry[2]]})
+
+    def query_objectids(self, name: str) -> Table:
+        self._query("aliases", name)
+        entry = self._find(name)
+
+        if entry is None:
+            # Astroquery raises a UserWarning when nothing is found. 
+            raise UserWarning("No known catalog could be found")
+
+        return Table({"ID": entry[3]})
+
+    def query_region(self, coords: SkyCoord, radius) -> Table:
+        self._query("region", (coords.ra.deg, coords.dec.deg, radius.arcsec))
+
+        for (ra, dec), main_ids in self.regions.items():
+            if coords.separation(SkyCoord(ra, dec, unit=('deg', 'deg'))).arcsec <= radius.arcsec:
+                entries = [self._find(main_id) for main_id in main_ids]
+                table = Table({"MAIN_ID": main_ids, "RA": [entry[1] for entry in entries], "DEC": [entry[2] for entry in entries]})
+
+                if "ids" in self.fields:
+                    table["IDS"] = ["|".join(entry[3]) for entry in entries]
+
+                return table
+
+        return None
+
+
+#######################################
+# Unit testing: SIMBAD response cache #
+#######################################
+class TestSimbadCache(ut.TestCase):
+    def setUp(self):
+        self.simbad = FakeSimbad()
+        patcher = mock.patch.multiple(query_simbad, Simbad=self.simbad, **QUERY_SIMBAD_FUNCTIONS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        use_memory_cache(self)
+
+
+    # Names differing only by case and spacing share a cache entry. 
+    def test_name_cached(self):
+        first = query_simbad.query_simbad_by_name("M 31")
+        second = query_simbad.query_simbad_by_name("m  31")
+
+        self.assertEqual(first[0], "M  31")
+        self.assertEqual(first[0], second[0])
+        self.assertEqual(first[2], second[2])
+        self.assertTrue(first[1].separation(second[1]).arcsec < 1e-9)
+        self.assertEqual(self.simbad.queries, [("object", "M 31"), ("aliases", "M 31")])
+
+        stats = query_simbad.get_simbad_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 2))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+
+    # Cached results can't be changed by the caller. 
+    def test_cached_results_copied(self):
+        query_simbad.get_aliases("M 1").append("changed")
+        self.assertNotIn("changed", query_simbad.get_aliases("M 1"))
+
+
+    # Unknown names, objects without aliases and empty regions are cached 
+    # as negative entries, which expire sooner. 
+    def test_negative_cached(self):
+        self.assertIsNone(query_simbad.query_simbad_by_name("unknown"))
+        self.assertIsNone(query_simbad.query_simbad_by_name("Unknown"))
+        self.assertEqual(query_simbad.get_aliases("unknown"), [])
+        self.assertEqual(query_simbad.get_aliases("unknown"), [])
+        self.assertEqual(len(self.simbad.queries), 2)
+        self.assertEqual(query_simbad.get_simbad_cache_stats()["negative_hits"], 2)
+
+        # Negative entries expire after a day, positive ones after 60. 
+        query_simbad.query_simbad_by_name("M 1", False)
+        later = time.time() + 2 * 24 * 60 * 60
+
+        with mock.patch('controller.search.query_simbad.time.time', return_value=later):
+            self.assertIsNone(query_simbad.query_simbad_by_name("unknown"))
+            query_simbad.query_simbad_by_name("M 1", False)
+
+        self.assertEqual(self.simbad.queries[3:], [("object", "unknown")])
+
+
+    # Regions are cached by their rounded coordinates and radius. 
+    def test_region_cached(self):
+        crab = SkyCoord(83.63308, 22.01450, unit=('deg', 'deg'))
+        nudged = SkyCoord(83.63308 + 1e-7, 22.01450, unit=('deg', 'deg'))
+
+        self.assertEqual(list(query_simbad.query_simbad_by_coords(crab, 10.0)), ["M   1"])
+        self.assertEqual(list(query_simbad.query_simbad_by_coords(nudged, 10.0)), ["M   1"])
+        self.assertEqual(list(query_simbad.query_simbad_by_coords(crab, 5.0)), ["M   1"])
+        self.assertEqual(query_simbad.query_simbad_by_coords(SkyCoord(0.0, 0.0, unit=('deg', 'deg'))), {})
+
+        # Aliases are returned by the region query. 
+        self.assertEqual([query[0] for query in self.simbad.queries], ["region"] * 3)
+        self.assertEqual(query_simbad.get_aliases("M   1"), ["M 1", "NGC 1952", "Crab Nebula"])
+        self.assertEqual(len(self.simbad.queries), 3)
+
+
+    # Region results come back with the coordinates and aliases of every object
+    # from a single query. 
+    def test_region_batched(self):
+        result = query_simbad.query_simbad_region(SkyCoord(10.68471, 41.26875, unit=('deg', 'deg')))
+
+        self.assertEqual([main_id for main_id, _, _ in result], ["M  31", "M   1"])
+        self.assertEqual([aliases for _, _, aliases in result], [["M 31", "NGC 224", "Andromeda"], ["M 1", "NGC 1952", "Crab Nebula"]])
+        self.assertAlmostEqual(result[0][1].ra.deg, 10.684708, places=5)
+        self.assertAlmostEqual(result[1][1].dec.deg, 22.014500, places=5)
+        self.assertEqual(len(self.simbad.queries), 1)
+        self.assertIn("ids", self.simbad.fields)
+
+        # Objects already found by the region don't need to be queried by name. 
+        self.assertEqual(query_simbad.query_simbad_by_coords(SkyCoord(10.68471, 41.26875, unit=('deg', 'deg'))), 
+                         {main_id: aliases for main_id, _, aliases in result})
+        self.assertEqual(len(self.simbad.queries), 1)
+
+
+    # Aliases missing from region results are looked up by a bounded pool. 
+    def test_region_aliases_missing(self):
+        self.simbad.add_votable_fields = lambda *fields: None
+        pool = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(pool.shutdown)
+
+        with mock.patch('controller.search.query_simbad._get_alias_pool', return_value=pool):
+            result = query_simbad.query_simbad_by_coords(SkyCoord(10.68471, 41.26875, unit=('deg', 'deg')))
+
+        self.assertEqual(result, {"M  31": ["M 31", "NGC 224", "Andromeda"], "M   1": ["M 1", "NGC 1952", "Crab Nebula"]})
+        self.assertCountEqual(self.simbad.queries[1:], [("aliases", "M  31"), ("aliases", "M   1")])
+
+
+    # Refreshing aliases skips the cache and replaces the cached response.
+    def test_aliases_refreshed(self):
+        self.assertEqual(query_simbad.get_aliases("M 1"), ["M 1", "NGC 1952", "Crab Nebula"])
+        self.assertEqual(query_simbad.get_aliases("M 1", refresh=True), ["M 1", "NGC 1952", "Crab Nebula"])
+        self.assertEqual(query_simbad.get_aliases("M 1"), ["M 1", "NGC 1952", "Crab Nebula"])
+        self.assertEqual(self.simbad.queries, [("aliases", "M 1"), ("aliases", "M 1")])
+
+
+    # Errors are never cached.
+    def test_errors_not_cached(self):
+        self.simbad.error = requests.exceptions.ConnectionError("Mocked error message.")
+
+        with self.assertRaises(QuerySimbadError):
+            query_simbad.query_simbad_by_name("M 1")
+
+        self.simbad.error = None
+        self.assertEqual(query_simbad.query_simbad_by_name("M 1")[0], "M   1")
+
+
+    # Timeouts looking up aliases are SIMBAD errors, and are not cached either.
+    def test_aliases_timeout(self):
+        self.simbad.error = requests.exceptions.ReadTimeout("Mocked timeout.")
+
+        with self.assertRaises(QuerySimbadError):
+            query_simbad.get_aliases("M 1")
+
+        self.simbad.error = None
+        self.assertEqual(query_simbad.get_aliases("M 1"), ["M 1", "NGC 1952", "Crab Nebula"])
+
+
+    # Responses are shared through the database, and cached in memory once read. 
+    @mock.patch('controller.search.query_simbad.put_simbad_cache')
+    @mock.patch('controller.search.query_simbad.get_simbad_cache')
+    def test_database_store(self, mock_get, mock_put):
+        stored = {}
+        mock_get.side_effect = lambda key: (stored[key], 3600) if key in stored else None
+        mock_put.side_effect = lambda key, response, ttl_seconds: stored.__setitem__(key, response)
+
+        with mock.patch.object(query_simbad, '_CACHE_STORE', 'mysql'):
+            query_simbad.query_simbad_by_name("M 1", False)
+            self.assertEqual(json.loads(stored["object:m 1"])["main_id"], "M   1")
+            self.assertAlmostEqual(mock_put.call_args[0][2], 60 * 24 * 60 * 60)
+
+            # Another process finds the response in the database. 
+            query_simbad.clear_simbad_cache()
+            self.assertEqual(query_simbad.query_simbad_by_name("M 1", False)[0], "M   1")
+            self.assertEqual(query_simbad.query_simbad_by_name("M 1", False)[0], "M   1")
+
+        self.assertEqual(len(self.simbad.queries), 1)
+        self.assertEqual(mock_get.call_count, 2)
+
+        stats = query_simbad.get_simbad_cache_stats()
+        self.assertEqual((stats["hits"], stats["store_hits"], stats["misses"]), (1, 1, 0))
+
+
+    # SIMBAD is still queried when the database can't be reached. 
+    @mock.patch('controller.search.query_simbad.put_simbad_cache')
+    @mock.patch('controller.search.query_simbad.get_simbad_cache', side_effect=mysql.connector.Error("Mocked error message."))
+    def test_database_unavailable(self, mock_get, mock_put):
+        with mock.patch.object(query_simbad, '_CACHE_STORE', 'mysql'):
+            self.assertEqual(query_simbad.query_simbad_by_name("M 1", False)[0], "M   1")
+            self.assertEqual(query_simbad.query_simbad_by_name("M 1", False)[0], "M   1")
+
+        mock_put.assert_not_called()
+        self.assertEqual(len(self.simbad.queries), 1)
+        self.assertEqual(query_simbad.get_simbad_cache_stats()["store_errors"], 1)
+
+
+    # Caching can be turned off. 
+    def test_cache_off(self):
+        with mock.patch.object(query_simbad, '_CACHE_STORE', 'off'):
+            query_simbad.get_aliases("M 1")
+            query_simbad.get_aliases("M 1")
+
+        self.assertEqual(len(self.simbad.queries), 2)
+
+
+def parse_sections(response: str) -> dict[str, str]:
+    '''
+        Split a sim-script response into its sections, keyed by name. 
+    '''
+    parts = re.split(r"(?m)^::(\w+):+$", response)
+    return {name: content.strip() for name, content in zip(parts[1::2], parts[2::2])}
+
+
+# astroquery 0.4.7 and later query SIMBAD over TAP, which the stand-in 
+# doesn't speak. 
+SIM_SCRIPT = not hasattr(query_simbad.Simbad, "query_tap")
+
+
+class TestSimbadStandIn(ut.TestCase):
+    def setUp(self):
+        self.standin = SimbadStandIn()
+
+
+    # Objects are found by any identifier, ignoring case and spacing. 
+    def test_query_object(self):
+        sections = parse_sections(self.standin.answer("votable {main_id,coordinates}\nvotable open\nquery id  crab  nebula \nvotable close"))
+        table = parse_single_table(BytesIO(sections["data"].encode("utf-8"))).to_table()
+
+        self.assertNotIn("error", sections)
+        self.assertEqual(list(table["MAIN_ID"]), ["M   1"])
+        self.assertEqual(list(table["RA"]), ["05 34 31.9392"])
+        self.assertEqual(list(table["DEC"]), ["+22 00 52.200"])
+
+
+    def test_query_objectids(self):
+        sections = parse_sections(self.standin.answer('format object "%IDLIST"\nquery id M 1'))
+        self.assertEqual(sections["data"].splitlines(), ["M 1", "NGC 1952", "Crab Nebula", "SNR G184.6-05.8"])
+
+
+    # Regions are answered nearest first, with the aliases of each object. 
+    def test_query_region(self):
+        script = ("votable {main_id,coordinates,ids}\nvotable open\n"
+                  "query coo 5:34:31.9728 +22:00:52.056 radius=10.0s frame=ICRS equi=2000.0\nvotable close")
+        table = parse_single_table(BytesIO(parse_sections(self.standin.answer(script))["data"].encode("utf-8"))).to_table()
+
+        self.assertEqual(list(table["MAIN_ID"]), ["PSR B0531+21", "M   1"])
+        self.assertEqual(table["IDS"][1], "M 1|NGC 1952|Crab Nebula|SNR G184.6-05.8")
+
+        limited = parse_single_table(BytesIO(parse_sections(self.standin.answer("set limit 1\n" + script))["data"].encode("utf-8"))).to_table()
+        self.assertEqual(len(limited), 1)
+
+
+    # Nothing found is reported as an error, without a data section. 
+    def test_not_found(self):
+        sections = parse_sections(self.standin.answer("votable {main_id,coordinates}\nvotable open\nquery id unknown\nvotable close"))
+        self.assertEqual(sections["error"], "[3] Identifier not found in the database : unknown")
+        self.assertNotIn("data", sections)
+
+        sections = parse_sections(self.standin.answer("query coo 0:00:00 +00:00:00 radius=10.0s frame=ICRS equi=2000.0"))
+        self.assertNotIn("data", sections)
+
+
+    # Latency and errors are injected into every request. 
+    def test_injected_faults(self):
+        self.standin.latency = 0.1
+
+        with self.standin:
+            start = time.perf_counter()
+            response = requests.post(self.standin.url, data={"script": 'format object "%IDLIST"\nquery id M 31'})
+            self.assertGreaterEqual(time.perf_counter() - start, 0.1)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("NGC 224", parse_sections(response.text)["data"])
+
+            self.standin.error_rate = 1.0
+            self.assertEqual(requests.post(self.standin.url, data={"script": "query id M 31"}).status_code, 503)
+
+        self.assertEqual(self.standin.stats, {"requests": 2, "errors": 1})
+
+
+    # query_simbad works against the stand-in through SIMBAD_MIRROR. 
+    @ut.skipUnless(SIM_SCRIPT, "the installed astroquery queries SIMBAD over TAP")
+    def test_query_simbad(self):
+        patcher = mock.patch.multiple(query_simbad, SIMBAD_MIRROR=self.standin.url, **QUERY_SIMBAD_FUNCTIONS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        use_memory_cache(self)
+
+        with self.standin, mock.patch.object(query_simbad.Simbad, "_cache_active", False):
+            main_id, coords, aliases = query_simbad.query_simbad_by_name("Crab Nebula", True)
+            self.assertEqual(main_id, "M   1")
+            self.assertIn("NGC 1952", aliases)
+            self.assertEqual([key for key, _, _ in query_simbad.query_simbad_region(coords)], ["M   1", "PSR B0531+21"])
+
+            self.standin.error_rate = 1.0
+            with self.assertRaises(QuerySimbadError):
+                query_simbad.get_aliases("SS 433")
+
+
 # Run suite. 
 if __name__ == '__main__':
     ut.main()
\ No newline at end of file
@@ -21,12 +21,21 @@ License Terms and Copyright:
     along with this program. If not, see <https://www.gnu.org/licenses/>.
 """
 
+import json
 import os
+import tempfile
+import threading
+import time
 import unittest
 
 from model.ds.alias_result import AliasResult
+from model.ds.alias_matcher import AliasMatcher
 from model.ds.report_types import ImportedReport
-from model.db.db_interface import ExistingReportError
+from model.db.db_interface import ExistingObjectError, ExistingReportError
+from controller.importer import archive, importer
+from controller.importer.reparser import reparse_reports
+from controller.importer.enricher import drain_enrichment_queue, enrich_coord
+from controller.search.query_simbad import QuerySimbadError
 from controller.importer.importer import *
 from controller.importer.parser import *
 
@@ -34,6 +43,8 @@ from unittest.mock import call
 from unittest import mock
 from bs4 import BeautifulSoup
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 from astropy.coordinates import SkyCoord
 from requests.exceptions import ConnectionError, HTTPError
 from pyppeteer.errors import TimeoutError
@@ -68,51 +79,61 @@ class TestImporterFunctions(unittest.TestCase):
         mock_add_report.assert_called_with(parse_report(10000, html_string))
 
     # Tests import_all_reports function
+    @mock.patch('controller.importer.importer._FETCH_MODE', 'render')
     @mock.patch('controller.importer.importer.set_next_atel_num')
-    @mock.patch('controller.importer.importer.import_report')
+    @mock.patch('controller.importer.importer.add_reports')
+    @mock.patch('controller.importer.importer.parse_report')
+    @mock.patch('controller.importer.importer.download_report')
+    @mock.patch('controller.importer.importer.report_exists')
     @mock.patch('controller.importer.importer.get_next_atel_num')
-    def test_auto_import(self, mock_get_next_atel_num, mock_import_report, mock_set_next_atel_num):
-        # Expected function calls
-        expected_import_report_calls = [call(1), call(2), call(3), call(4), call(5)]
-        expected_set_next_atel_num_calls = [call(2), call(3), call(4), call(5)]
+    def test_auto_import(self, mock_get_next_atel_num, mock_report_exists, mock_download_report, mock_parse_report, mock_add_reports, mock_set_next_atel_num):
+        def parse_report(atel_num, html_string):
+            if(atel_num >= 5):
+                raise NonexistentReportError
+
+            return mock.Mock(atel_num=atel_num)
+
+        mock_parse_report.side_effect = parse_report
+        mock_add_reports.side_effect = lambda reports: [report.atel_num for report in reports]
+
+        # Returns the ATel numbers passed to add_reports
+        def added_atel_nums():
+            return sorted(report.atel_num for args in mock_add_reports.call_args_list for report in args[0][0])
 
+        # ATel #3 is already imported and ATel #5 onwards do not exist
         mock_get_next_atel_num.return_value = 1
-        mock_import_report.side_effect = [None, None, ReportAlreadyExistsError, None, ReportNotFoundError]
-
-        # Checks for expected import_report and set_next_atel_num function calls
-        import_all_reports()
-        mock_import_report.assert_has_calls(expected_import_report_calls)
-        mock_set_next_atel_num.assert_has_calls(expected_set_next_atel_num_calls)
-
-        # Checks that import_report was not called with the argument 6
-        try:
-            mock_import_report.assert_has_calls([call(6)], any_order=True)
-            raise Exception('\'import_report\' was called with the argument \'6\'')
-        except AssertionError:
-            pass
-        except Exception as err:
-            raise AssertionError(f'{str(err)}')
-
-        # Expected function calls
-        expected_import_report_calls = [call(6), call(7), call(8)]
-        expected_set_next_atel_num_calls = [call(7), call(8)]
+        mock_report_exists.side_effect = lambda atel_num: atel_num == 3
+        mock_download_report.side_effect = lambda atel_num: 'Test'
 
+        # Checks for expected add_reports and set_next_atel_num function calls
+        import_all_reports(workers=2, parse_processes=0, batch_size=2)
+        self.assertEqual(added_atel_nums(), [1, 2, 4])
+        self.assertEqual(mock_set_next_atel_num.call_args, call(5))
+
+        # ATel #6 is missing important data and ATel #8 fails to download
+        mock_add_reports.reset_mock()
         mock_get_next_atel_num.return_value = 6
-        mock_import_report.side_effect = [MissingReportElementError, None, ImportFailError]
-
-        # Checks for expected import_report and set_next_atel_num function calls
-        import_all_reports()
-        mock_import_report.assert_has_calls(expected_import_report_calls)
-        mock_set_next_atel_num.assert_has_calls(expected_set_next_atel_num_calls)
-
-        # Checks that import_report was not called with the argument 9
-        try:
-            mock_import_report.assert_has_calls([call(9)], any_order=True)
-            raise Exception('\'import_report\' was called with the argument \'9\'')
-        except AssertionError:
-            pass
-        except Exception as err:
-            raise AssertionError(f'{str(err)}')
+        mock_report_exists.side_effect = lambda atel_num: False
+
+        def download_report(atel_num):
+            if(atel_num == 8):
+                raise NetworkError
+
+            return 'Test'
+
+        def parse_report(atel_num, html_string):
+            if(atel_num == 6):
+                raise MissingReportElementError
+
+            return mock.Mock(atel_num=atel_num)
+
+        mock_download_report.side_effect = download_report
+        mock_parse_report.side_effect = parse_report
+
+        # Checks that nothing from ATel #8 onwards is imported
+        import_all_reports(workers=2, parse_processes=0, batch_size=2)
+        self.assertEqual(added_atel_nums(), [7])
+        self.assertEqual(mock_set_next_atel_num.call_args, call(8))
 
     # Tests download_report function
     def test_html_download(self):
@@ -127,7 +148,348 @@ class TestImporterFunctions(unittest.TestCase):
         
         # Tests HTML downloader for non-existing ATel report
         html_string = download_report(9999999999)
-        self.assertIsNone(html_string, 'Detecting non-existing ATel report has failed')
+        with self.assertRaises(NonexistentReportError, msg='Detecting non-existing ATel report has failed'):
+            parse_report(9999999999, html_string)
+
+# Download modes
+class TestFetchModes(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('controller.importer.importer._rate_limiter', importer._RateLimiter(0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    # Reads the saved HTML of an ATel report
+    def read_page(self, atel_num: int) -> bytes:
+        with open(os.path.join('test', 'res', f'atel{atel_num}.html'), 'rb') as f:
+            return f.read()
+
+    # Tests that saved pages are downloaded without rendering
+    @mock.patch('controller.importer.importer._fetch_rendered')
+    @mock.patch('requests.Session.get')
+    def test_static_download(self, mock_get, mock_fetch_rendered):
+        for atel_num in [400, 932, 1000, 10000, 12000, 14000]:
+            mock_get.return_value = mock.Mock(content=self.read_page(atel_num), raise_for_status=mock.Mock())
+            self.assertEqual(download_report(atel_num, 'static'), self.read_page(atel_num))
+            self.assertEqual(mock_get.call_args[0][0], f'https://www.astronomerstelegram.org/?read={atel_num}')
+
+        mock_fetch_rendered.assert_not_called()
+
+        # Tests that non-existing ATel reports are detected when the raw HTML is parsed
+        mock_get.return_value = mock.Mock(content=b'<p>Header</p><p>This ATel does not appear to exist.</p>', raise_for_status=mock.Mock())
+        with self.assertRaises(NonexistentReportError):
+            parse_report(9999999999, download_report(9999999999, 'static'))
+
+    # Tests that pages are only rendered when the raw HTML fails to parse
+    @mock.patch('controller.importer.importer.add_report')
+    @mock.patch('controller.importer.importer.parse_report')
+    @mock.patch('controller.importer.importer._fetch_rendered')
+    @mock.patch('controller.importer.importer._fetch_static')
+    @mock.patch('controller.importer.importer.report_exists')
+    @mock.patch('controller.importer.importer._FETCH_MODE', 'static')
+    def test_render_fallback(self, mock_report_exists, mock_fetch_static, mock_fetch_rendered, mock_parse_report, mock_add_report):
+        mock_report_exists.return_value = False
+        mock_fetch_static.return_value = self.read_page(1000)
+        mock_fetch_rendered.return_value = self.read_page(1000)
+        fallbacks = get_fetch_stats()['render_fallbacks']
+
+        # Raw HTML parses
+        mock_parse_report.side_effect = None
+        mock_parse_report.return_value = 'Report'
+        import_report(1000)
+        mock_fetch_rendered.assert_not_called()
+        mock_add_report.assert_called_with('Report')
+        self.assertEqual(get_fetch_stats()['render_fallbacks'], fallbacks)
+
+        # Raw HTML is missing the report body
+        mock_parse_report.side_effect = [MissingReportElementError, 'Rendered report']
+        import_report(1000)
+        mock_fetch_rendered.assert_called_once_with('https://www.astronomerstelegram.org/?read=1000')
+        mock_add_report.assert_called_with('Rendered report')
+        self.assertEqual(get_fetch_stats()['render_fallbacks'], fallbacks + 1)
+
+    # Tests that download times are recorded separately for each mode
+    @mock.patch('controller.importer.importer._fetch_rendered')
+    @mock.patch('controller.importer.importer._fetch_static')
+    def test_fetch_stats(self, mock_fetch_static, mock_fetch_rendered):
+        mock_fetch_static.return_value = self.read_page(10000)
+        mock_fetch_rendered.return_value = self.read_page(10000)
+        before = get_fetch_stats()
+
+        download_report(10000, 'static')
+        download_report(10000, 'static')
+        download_report(10000, 'render')
+
+        mock_fetch_static.side_effect = NetworkError
+        with self.assertRaises(NetworkError):
+            download_report(10000, 'static')
+
+        stats = get_fetch_stats()
+        self.assertEqual(stats['static']['count'], before['static']['count'] + 3)
+        self.assertEqual(stats['static']['failures'], before['static']['failures'] + 1)
+        self.assertEqual(stats['render']['count'], before['render']['count'] + 1)
+        self.assertEqual(stats['render']['failures'], before['render']['failures'])
+        self.assertGreaterEqual(stats['static']['max_seconds'], stats['static']['mean_seconds'])
+        self.assertEqual(stats['pid'], os.getpid())
+
+        with self.assertRaises(ValueError):
+            download_report(10000, 'headless')
+
+# Bulk import against a local stand-in for the ATel website
+class TestBulkImport(unittest.TestCase):
+    # Saved pages served as consecutive ATel numbers
+    PAGES = {1: 'atel400.html', 2: 'atel932.html', 3: 'atel1000.html', 4: 'atel10000.html', 5: 'atel12000.html', 6: 'atel14000.html'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.requests = []
+        cls.delays = {}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                atel_num = int(parse_qs(urlparse(self.path).query)['read'][0])
+                cls.requests.append(atel_num)
+                time.sleep(cls.delays.get(atel_num, 0))
+
+                if(atel_num in cls.PAGES):
+                    with open(os.path.join('test', 'res', cls.PAGES[atel_num]), 'rb') as f:
+                        page = f.read()
+                else:
+                    page = b'<p>ATel</p><p>This ATel does not appear to exist.</p>'
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html;charset=utf-8')
+                self.send_header('Content-Length', str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+
+            def log_message(self, *args):
+                pass
+
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.requests.clear()
+        self.delays.clear()
+
+        patches = [
+            mock.patch('controller.importer.importer._ATEL_URL', f'http://127.0.0.1:{self.server.server_port}/?read={{}}'),
+            mock.patch('controller.importer.importer._FETCH_MODE', 'static'),
+            mock.patch('controller.importer.importer._rate_limiter', importer._RateLimiter(0)),
+            mock.patch('controller.importer.importer.report_exists', return_value=False),
+            mock.patch('controller.importer.importer.get_next_atel_num', return_value=1),
+            mock.patch('controller.importer.parser.extract_known_aliases', return_value=[]),
+            mock.patch('controller.importer.parser.parse_coords', return_value=[]),
+        ]
+
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    # Returns the expected ImportedReport objects for the served pages
+    def expected_reports(self) -> list:
+        reports = []
+
+        for atel_num, page in self.PAGES.items():
+            with open(os.path.join('test', 'res', page), 'rb') as f:
+                reports.append(parse_report(atel_num, f.read()))
+
+        return reports
+
+    # Tests that every served page is downloaded once and imported
+    @mock.patch('controller.importer.importer.set_next_atel_num')
+    @mock.patch('controller.importer.importer.add_reports')
+    def test_bulk_import(self, mock_add_reports, mock_set_next_atel_num):
+        mock_add_reports.side_effect = lambda reports: [report.atel_num for report in reports]
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            with mock.patch('controller.importer.archive._ARCHIVE_DIR', archive_dir):
+                import_all_reports(workers=3, parse_processes=0, batch_size=2)
+
+                # Downloaded pages are archived
+                self.assertEqual(archive.archived_atel_nums(), list(self.PAGES))
+
+                with open(os.path.join('test', 'res', self.PAGES[4]), 'rb') as f:
+                    self.assertEqual(archive.load_page(4), f.read())
+
+        added = sorted((report for args in mock_add_reports.call_args_list for report in args[0][0]), key=lambda report: report.atel_num)
+        self.assertEqual(added, self.expected_reports())
+        self.assertEqual(mock_set_next_atel_num.call_args, call(7))
+
+        # Pages are fetched without rendering, and nothing past the first missing ATel number is requested
+        self.assertEqual(sorted(set(self.requests) & set(self.PAGES)), list(self.PAGES))
+        self.assertEqual(len(self.requests), len(set(self.requests)))
+
+    # Tests that pages are parsed in separate processes using this process's alias matcher
+    @mock.patch('controller.importer.importer.get_alias_matcher')
+    @mock.patch('controller.importer.importer.set_next_atel_num')
+    @mock.patch('controller.importer.importer.add_reports')
+    def test_parse_processes(self, mock_add_reports, mock_set_next_atel_num, mock_get_alias_matcher):
+        mock_add_reports.side_effect = lambda reports: [report.atel_num for report in reports]
+        mock_get_alias_matcher.return_value = AliasMatcher([AliasResult('Swift', 'test-object')])
+
+        import_all_reports(workers=3, parse_processes=2, batch_size=2)
+
+        added = {report.atel_num: report for args in mock_add_reports.call_args_list for report in args[0][0]}
+        self.assertEqual(sorted(added), list(self.PAGES))
+        self.assertEqual(mock_set_next_atel_num.call_args, call(7))
+        mock_get_alias_matcher.assert_called_once_with()
+
+        # The parsing processes found aliases with the matcher they were given, without loading one from the database
+        self.assertEqual([atel_num for atel_num, report in sorted(added.items()) if report.objects == ['test-object']], [2, 5])
+
+    # Tests that the checkpoint never moves past a report that hasn't been written
+    @mock.patch('controller.importer.importer.set_next_atel_num')
+    @mock.patch('controller.importer.importer.add_reports')
+    def test_contiguous_checkpoint(self, mock_add_reports, mock_set_next_atel_num):
+        added = set()
+
+        def add_reports(reports):
+            added.update(report.atel_num for report in reports)
+            return [report.atel_num for report in reports]
+
+        def set_next_atel_num(next_num):
+            self.assertTrue(all(atel_num in added for atel_num in range(1, next_num)), f'Checkpoint moved to {next_num} before all earlier reports were written')
+
+        mock_add_reports.side_effect = add_reports
+        mock_set_next_atel_num.side_effect = set_next_atel_num
+
+        # ATel #2 is slow to download, so later reports are written before it
+        self.delays[2] = 0.5
+        import_all_reports(workers=3, parse_processes=0, batch_size=1)
+
+        self.assertEqual(added, set(self.PAGES))
+        self.assertEqual(mock_set_next_atel_num.call_args, call(7))
+        self.assertGreater(mock_add_reports.call_count, 1)
+
+    # Tests that requests to the same host are spaced out
+    def test_rate_limiter(self):
+        rate_limiter = importer._RateLimiter(20)
+
+        start = time.perf_counter()
+        for _ in range(5):
+            rate_limiter.wait('www.astronomerstelegram.org')
+        self.assertGreaterEqual(time.perf_counter() - start, 0.19)
+
+        # Other hosts are not held up
+        start = time.perf_counter()
+        rate_limiter.wait('simbad.u-strasbg.fr')
+        self.assertLess(time.perf_counter() - start, 0.05)
+
+# Archive of downloaded pages
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.archive_dir = temp_dir.name
+        self.addCleanup(temp_dir.cleanup)
+
+    # Tests that pages are stored compressed and sharded by ATel number
+    def test_save_and_load(self):
+        with open(os.path.join('test', 'res', 'atel10000.html'), 'rb') as f:
+            page = f.read()
+
+        archive.save_page(10000, page, self.archive_dir)
+        archive.save_page(932, 'Test', self.archive_dir)
+        archive.save_page(932, 'Replaced', self.archive_dir)
+
+        self.assertEqual(archive.load_page(10000, self.archive_dir), page)
+        self.assertEqual(archive.load_page(932, self.archive_dir), b'Replaced')
+        self.assertIsNone(archive.load_page(1, self.archive_dir))
+        self.assertEqual(archive.archived_atel_nums(self.archive_dir), [932, 10000])
+
+        path = os.path.join(self.archive_dir, '00010', 'atel10000.html.gz')
+        self.assertTrue(os.path.isfile(path))
+        self.assertLess(os.path.getsize(path), len(page))
+
+        # No temporary files are left behind
+        self.assertEqual(os.listdir(os.path.join(self.archive_dir, '00000')), ['atel932.html.gz'])
+
+    # Tests that nothing is archived without an archive directory
+    @mock.patch('controller.importer.archive._ARCHIVE_DIR', None)
+    def test_disabled(self):
+        self.assertFalse(archive.archive_enabled())
+        archive.save_page(1, 'Test')
+        self.assertIsNone(archive.load_page(1))
+        self.assertEqual(archive.archived_atel_nums(), [])
+
+    # Tests that archived pages replace the stored reports
+    @mock.patch('controller.importer.reparser.replace_reports')
+    @mock.patch('controller.importer.parser.parse_coords')
+    @mock.patch('controller.importer.parser.extract_known_aliases')
+    def test_reparse(self, mock_extract_known_aliases, mock_parse_coords, mock_replace_reports):
+        mock_extract_known_aliases.return_value = []
+        mock_parse_coords.return_value = []
+        mock_replace_reports.side_effect = lambda reports, enrich: len(reports)
+
+        expected = []
+
+        for atel_num in [400, 932, 1000, 10000, 12000, 14000]:
+            with open(os.path.join('test', 'res', f'atel{atel_num}.html'), 'rb') as f:
+                page = f.read()
+
+            archive.save_page(atel_num, page, self.archive_dir)
+            expected.append(parse_report(atel_num, page))
+
+        archive.save_page(20000, '<h1 class=\'title\'>Test</h1>', self.archive_dir)
+
+        with mock.patch('controller.importer.archive._ARCHIVE_DIR', self.archive_dir):
+            stats = reparse_reports(processes=0, chunk_size=3, batch_size=4)
+
+        reparsed = [report for args in mock_replace_reports.call_args_list for report in args[0][0]]
+        self.assertEqual(reparsed, expected)
+        self.assertEqual(mock_replace_reports.call_count, 2)
+        self.assertEqual(stats['pages'], 7)
+        self.assertEqual(stats['reports'], 6)
+        self.assertEqual(stats['replaced'], 6)
+        self.assertEqual(stats['failed'], 1)
+        self.assertGreater(stats['reports_per_second'], 0)
+
+    # Tests reparsing a directory of saved pages
+    @mock.patch('controller.importer.reparser.drain_enrichment_queue')
+    @mock.patch('controller.importer.reparser.replace_reports')
+    @mock.patch('controller.importer.parser.extract_known_aliases')
+    def test_reparse_directory(self, mock_extract_known_aliases, mock_replace_reports, mock_drain_enrichment_queue):
+        mock_extract_known_aliases.return_value = []
+        mock_replace_reports.side_effect = lambda reports, enrich: 0
+
+        # Only parses the pages
+        stats = reparse_reports(os.path.join('test', 'res'), processes=0, write=False)
+        self.assertEqual(stats['pages'], 6)
+        self.assertEqual(stats['reports'], 6)
+        mock_replace_reports.assert_not_called()
+        mock_drain_enrichment_queue.assert_not_called()
+
+        # Coordinates are queued as the reports are written and enriched afterwards
+        stats = reparse_reports(os.path.join('test', 'res'), processes=0, enrich=True)
+        reparsed = [report for args in mock_replace_reports.call_args_list for report in args[0][0]]
+        self.assertEqual([report.atel_num for report in reparsed], [400, 932, 1000, 10000, 12000, 14000])
+
+        for args in mock_replace_reports.call_args_list:
+            self.assertEqual(args, call(mock.ANY, True))
+
+        mock_drain_enrichment_queue.assert_called_once_with()
+
+    # Tests reparsing in separate processes using this process's alias matcher
+    @mock.patch('controller.importer.reparser.replace_reports')
+    @mock.patch('controller.importer.reparser.get_alias_matcher')
+    def test_reparse_processes(self, mock_get_alias_matcher, mock_replace_reports):
+        mock_get_alias_matcher.return_value = AliasMatcher([AliasResult('Swift', 'test-object')])
+        mock_replace_reports.side_effect = lambda reports, enrich: len(reports)
+
+        stats = reparse_reports(os.path.join('test', 'res'), processes=2, chunk_size=2)
+        self.assertEqual(stats['reports'], 6)
+        self.assertEqual(stats['replaced'], 6)
+        mock_get_alias_matcher.assert_called_once_with()
+
+        # The parsing processes found aliases with the matcher they were given, without loading one from the database
+        reparsed = [report for args in mock_replace_reports.call_args_list for report in args[0][0]]
+        self.assertEqual(sorted(report.atel_num for report in reparsed if report.objects == ['test-object']), [932, 12000])
 
 # Parser functions
 class TestParserFunctions(unittest.TestCase):
@@ -284,6 +646,34 @@ class TestParserFunctions(unittest.TestCase):
         self.assertCountEqual(imported_report.coordinates, [])
         self.assertCountEqual(imported_report.referenced_by, [989])
 
+    # Tests that the lxml backend extracts the same reports as the original BeautifulSoup backend
+    @mock.patch('controller.importer.parser.parse_coords', return_value=[])
+    @mock.patch('controller.importer.parser.extract_known_aliases', return_value=[])
+    def test_parse_backends(self, mock_extract_known_aliases, mock_parse_coords):
+        for atel_num in [400, 932, 1000, 10000, 12000, 14000]:
+            with open(os.path.join('test', 'res', f'atel{atel_num}.html'), 'rb') as f:
+                page = f.read()
+
+            with self.subTest(atel_num):
+                expected = parse_report(atel_num, page, 'soup')
+                self.assertEqual(parse_report(atel_num, page, 'lxml'), expected)
+                self.assertEqual(parse_report(atel_num, page.decode('utf-8'), 'lxml'), expected)
+
+                # Carriage returns are kept, as html.parser keeps them
+                page = page.replace(b'\n', b'\r\n')
+                self.assertEqual(parse_report(atel_num, page, 'lxml'), parse_report(atel_num, page, 'soup'))
+
+        # Pages of unused ATel numbers are detected while parsing
+        for backend in PARSE_BACKENDS:
+            with self.assertRaises(NonexistentReportError):
+                parse_report(1, b'<p>ATel</p><p>This ATel does not appear to exist.</p>', backend)
+
+            with self.assertRaises(MissingReportElementError):
+                parse_report(1, '', backend)
+
+        with self.assertRaises(ValueError):
+            parse_report(1, '', 'html5lib')
+
     # Tests extract_coords function
     def test_coords_extractor(self):
         self.assertCountEqual(extract_coords('There is no coordinates'), [])
@@ -313,15 +703,7 @@ class TestParserFunctions(unittest.TestCase):
         self.assertCountEqual(extract_coords('R.A. = -34.5  DECL. = 09.3 and RA = -18.44, Decl. = +85.6'), ['r.a. = -34.5  decl. = 09.3', 'ra = -18.44, decl. = +85.6'])
 
     # Tests parse_coords function
-    @mock.patch('controller.importer.parser.add_object')
-    @mock.patch('controller.importer.parser.query_simbad_by_name')
-    @mock.patch('controller.importer.parser.check_object_updates')
-    @mock.patch('controller.importer.parser.object_exists')
-    @mock.patch('controller.importer.parser.query_simbad_by_coords')
-    def test_coords_parser(self, mock_query_simbad_by_coords, mock_object_exists, mock_check_object_updates, mock_query_simbad_by_name, mock_add_object):
-        mock_query_simbad_by_coords.return_value = dict()
-
-        # Tests without querying SIMBAD
+    def test_coords_parser(self):
         self.assertCountEqual(parse_coords([]), [])
         self.assertCountEqual(parse_coords(['No coordinates', 'ra: 15:33:44, dec: 95:42:16']), [])
         self.assertCountEqual(parse_coords(['ra: 10.0, dec: 20.0', 'ra: 224, dec: -25.8']), [SkyCoord(10.0, 20.0, unit=('deg', 'deg')), SkyCoord(224.0, -25.8, unit=('deg', 'deg'))])
@@ -347,35 +729,29 @@ class TestParserFunctions(unittest.TestCase):
         self.assertCountEqual(parse_coords(['r.a. = 18:58:41.51, decl. = +22o 39\' 30\".2', 'ra. = -77.44, decl. = -22.0']), [SkyCoord('18h58m41.51s', '+22d39m30.2s', unit=('hourangle', 'deg')), SkyCoord(-77.44, -22.0, unit=('deg', 'deg'))])
         self.assertCountEqual(parse_coords(['ra=17.44; dec= -63.5', 'ra  (j2000)      =    +000.5551; dec (j2000)   ,   +87.555']), [SkyCoord(17.44, -63.5, unit=('deg', 'deg')), SkyCoord(0.5551, 87.555, unit=('deg', 'deg'))])
         self.assertCountEqual(parse_coords(['r.a. = -34.5  decl. = 09.3', 'ra = -18.44, decl. = +85.6']), [SkyCoord(-34.5, 9.3, unit=('deg', 'deg')), SkyCoord(-18.44, 85.6, unit=('deg', 'deg'))])
-
-        expected_query_simbad_by_coords_calls = [call(SkyCoord(50.0, 60.0, unit=('deg', 'deg'))),
-                                                 call(SkyCoord(120.0, 30.0, unit=('deg', 'deg')))
-        ]
-
-        expected_object_exists_calls = [call('main object 1'), call('main object 2'), call('main object 3'), call('main object 4')]
-        
-        expected_check_object_updates_calls = [call('main object 1', datetime(1999, 1, 1)),
-                                               call('main object 2', datetime(1999, 1, 1)),
-                                               call('main object 4', datetime(1999, 1, 1))
-        ]
-
-        expected_query_simbad_by_name_call = [call('main object 3', False)]
-        expected_add_object_call = [call('main object 3', SkyCoord(10.0, 10.0, unit=('deg', 'deg')), ['alias 5', 'alias 6'])]
-        
-        mock_query_simbad_by_coords.side_effect = [dict([('main object 1', ['alias 1', 'alias 2']), ('main object 2', ['alias 3', 'alias 4'])]),
-                                                   dict([('main object 3', ['alias 5', 'alias 6']), ('main object 4', ['alias 7', 'alias 8'])])
-        ]
-
-        mock_object_exists.side_effect = [(True, datetime(1999, 1, 1)), (True, datetime(1999, 1, 1)), (False, None), (True, datetime(1999, 1, 1))]
-        mock_query_simbad_by_name.side_effect = [('main object 3', SkyCoord(10.0, 10.0, unit=('deg', 'deg')), [])]
-
-        # Tests with querying SIMBAD
-        self.assertCountEqual(parse_coords(['ra: 50.0, dec: 60.0', 'ra: 120.0, dec: 30.0']), [SkyCoord(50.0, 60.0, unit=('deg', 'deg')), SkyCoord(120.0, 30.0, unit=('deg', 'deg'))])
-        mock_query_simbad_by_coords.assert_has_calls(expected_query_simbad_by_coords_calls)
-        mock_object_exists.assert_has_calls(expected_object_exists_calls)
-        mock_check_object_updates.assert_has_calls(expected_check_object_updates_calls)
-        mock_query_simbad_by_name.assert_has_calls(expected_query_simbad_by_name_call)
-        mock_add_object.assert_has_calls(expected_add_object_call)
+        self.assertListEqual(parse_coords(['ra: 10.0, dec: 20.0', 'ra: 24:00:00, dec: 10:60:00', 'ra 13h26m59s, dec +32d06m33.4s', 'ra: 12:30:00, dec: 10:61:00', 'ra: 5.5, dec: 91']), [SkyCoord(10.0, 20.0, unit=('deg', 'deg')), SkyCoord('24h00m00s', '10d60m00s', unit=('hourangle', 'deg')), SkyCoord('13h26m59s', '+32d06m33.4s', unit=('hourangle', 'deg'))])
+
+    # Tests coordinate, date and keyword extraction and date parsing against results recorded from the original functions
+    def test_extraction_corpus(self):
+        with open(os.path.join('test', 'res', 'extraction_corpus.json'), 'r') as f:
+            corpus = json.load(f)
+
+        for name, expected in corpus.items():
+            if(name.startswith('extraction_samples.txt:')):
+                with open(os.path.join('test', 'res', 'extraction_samples.txt'), 'r', encoding='utf-8') as f:
+                    text = f.read().splitlines()[int(name.split(':')[1]) - 1]
+            elif(name.endswith('.html')):
+                with open(os.path.join('test', 'res', name), 'rb') as f:
+                    text = BeautifulSoup(f.read(), 'html.parser').get_text()
+            else:
+                with open(os.path.join('test', 'res', name), 'r', encoding='utf-8') as f:
+                    text = f.read()
+
+            with self.subTest(name):
+                self.assertListEqual(extract_coords(text), expected['coords'])
+                self.assertListEqual(extract_dates(text), expected['dates'])
+                self.assertListEqual([parsed.isoformat() for parsed in parse_dates(expected['dates'])], expected['parsed_dates'])
+                self.assertListEqual(extract_keywords(text), expected['keywords'])
 
     # Tests extract_dates function
     def test_dates_extractor(self):
@@ -412,16 +788,19 @@ class TestParserFunctions(unittest.TestCase):
         self.assertCountEqual(parse_dates(['mjd=50000.0', 'jd=2455000.0']), [datetime(year=1995, month=10, day=10), datetime(year=2009, month=6, day=17)])
         self.assertCountEqual(parse_dates(['11/11/2000', 'mjd=48550']), [datetime(year=2000, month=11, day=11), datetime(year=1991, month=10, day=21)])
         self.assertCountEqual(parse_dates(['jd=2450000', '1984-03-29']), [datetime(year=1995, month=10, day=9), datetime(year=1984, month=3, day=29)])
+        self.assertCountEqual(parse_dates(['31/02/99', '12-10-11', '1 may 99']), [datetime(year=2011, month=10, day=12), datetime(year=1999, month=5, day=1)])
+        self.assertCountEqual(parse_dates(['mjd=59000.9999999999', 'jd=2459000.4999999999', 'mjd=99999999']), [datetime(year=2020, month=6, day=1), datetime(year=2020, month=5, day=31)])
+        self.assertCountEqual(parse_dates(['1 Jan 99', '20 February 2022']), [datetime(year=1999, month=1, day=1), datetime(year=2022, month=2, day=20)])
     
     # Tests extract_known_aliases function
-    @mock.patch('controller.importer.parser.get_all_aliases')
-    def test_aliases_extractor(self, mock_get_all_aliases):
-        mock_get_all_aliases.return_value = []
+    @mock.patch('controller.importer.parser.get_alias_matcher')
+    def test_aliases_extractor(self, mock_get_alias_matcher):
+        mock_get_alias_matcher.return_value = AliasMatcher([])
 
         self.assertCountEqual(extract_known_aliases('This is a test'), [])
         self.assertCountEqual(extract_known_aliases('Double check that an empty list is returned'), [])
 
-        mock_get_all_aliases.return_value = [AliasResult('Test', 'x'), AliasResult('alias-for-object', 'object'), AliasResult('another alias', 'object'), AliasResult('test', 'y'), AliasResult('s.p\ecial\ char+ac()ters', '.(z)+')]
+        mock_get_alias_matcher.return_value = AliasMatcher([AliasResult('Test', 'x'), AliasResult('alias-for-object', 'object'), AliasResult('another alias', 'object'), AliasResult('test', 'y'), AliasResult(r's.p\ecial\ char+ac()ters', '.(z)+')])
 
         self.assertCountEqual(extract_known_aliases('No alias to be found here'), [])
         self.assertCountEqual(extract_known_aliases('This is a test'), ['x', 'y'])
@@ -438,9 +817,14 @@ class TestParserFunctions(unittest.TestCase):
         self.assertCountEqual(extract_known_aliases('x'), ['x'])
         self.assertCountEqual(extract_known_aliases('x, y and alias-for-object'), ['x', 'object', 'y'])
         self.assertCountEqual(extract_known_aliases('object and y'), ['object', 'y'])
-        self.assertCountEqual(extract_known_aliases('s.p\ecial\ char+ac()ters and y'), ['y', '.(z)+'])
+        self.assertCountEqual(extract_known_aliases(r's.p\ecial\ char+ac()ters and y'), ['y', '.(z)+'])
         self.assertCountEqual(extract_known_aliases('alias-for-object and .(z)+'), ['object', '.(z)+'])
-        self.assertCountEqual(extract_known_aliases('s.p\ecial\ char+ac()ters and .(z)+'), ['.(z)+'])
+        self.assertCountEqual(extract_known_aliases(r's.p\ecial\ char+ac()ters and .(z)+'), ['.(z)+'])
+
+        # Aliases added after the matcher is built are found too
+        mock_get_alias_matcher.return_value.add('Swift J1234.5+6789', 'new object')
+        self.assertCountEqual(extract_known_aliases('The transient SWIFT J1234.5+6789 brightened'), ['new object'])
+        self.assertCountEqual(extract_known_aliases('The transient Swift J1234.5+67890 brightened'), [])
 
     # Tests extract_keywords function
     def test_keywords_extractor(self):
@@ -457,8 +841,74 @@ class TestParserFunctions(unittest.TestCase):
         self.assertCountEqual(extract_keywords('sub millimeter, suns, pre-MaiN Sequence stars and binaries'), ['millimeter', 'sub-millimeter', 'the sun', 'pre-main-sequence star', 'star', 'binary'])
         self.assertCountEqual(extract_keywords('supernovae and asteroids (binary)'), ['supernovae', 'asteroid', 'asteroid(binary)', 'binary'])
 
+# Enrichment queue
+class TestEnricher(unittest.TestCase):
+    # Tests enrich_coord function
+    @mock.patch('controller.importer.enricher.add_object')
+    @mock.patch('controller.importer.enricher.check_object_updates')
+    @mock.patch('controller.importer.enricher.object_exists')
+    @mock.patch('controller.importer.enricher.query_simbad_region')
+    def test_enrich_coord(self, mock_query_simbad_region, mock_object_exists, mock_check_object_updates, mock_add_object):
+        expected_object_exists_calls = [call('main object 1'), call('main object 2'), call('main object 3')]
+        expected_check_object_updates_calls = [call('main object 1', datetime(1999, 1, 1)), call('main object 3', datetime(1999, 1, 1))]
+        object_coord = SkyCoord(10.0, 10.0, unit=('deg', 'deg'))
+
+        mock_query_simbad_region.return_value = [('main object 1', object_coord, ['alias 1', 'alias 2']), ('main object 2', object_coord, ['alias 3', 'alias 4']), ('main object 3', object_coord, ['alias 5'])]
+        mock_object_exists.side_effect = [(True, datetime(1999, 1, 1)), (False, None), (True, datetime(1999, 1, 1))]
+
+        enrich_coord(SkyCoord(50.0, 60.0, unit=('deg', 'deg')))
+        mock_query_simbad_region.assert_called_once_with(SkyCoord(50.0, 60.0, unit=('deg', 'deg')))
+        mock_object_exists.assert_has_calls(expected_object_exists_calls)
+        mock_check_object_updates.assert_has_calls(expected_check_object_updates_calls)
+        mock_add_object.assert_called_once_with('main object 2', object_coord, ['alias 3', 'alias 4'])
+
+        # Objects added by another worker in the meantime are skipped
+        mock_object_exists.side_effect = [(False, None), (False, None), (False, None)]
+        mock_add_object.side_effect = ExistingObjectError()
+        enrich_coord(SkyCoord(50.0, 60.0, unit=('deg', 'deg')))
+        self.assertEqual(mock_add_object.call_count, 4)
+
+        # Failed lookups are raised so they can be retried
+        mock_query_simbad_region.side_effect = QuerySimbadError('Test')
+        self.assertRaises(QuerySimbadError, enrich_coord, SkyCoord(50.0, 60.0, unit=('deg', 'deg')))
+
+    # Tests that the queue is drained, retrying failed lookups with backoff
+    @mock.patch('controller.importer.enricher.fail_enrichment')
+    @mock.patch('controller.importer.enricher.complete_enrichment')
+    @mock.patch('controller.importer.enricher.claim_enrichments')
+    @mock.patch('controller.importer.enricher.enrich_coord')
+    def test_drain_enrichment_queue(self, mock_enrich_coord, mock_claim_enrichments, mock_complete_enrichment, mock_fail_enrichment):
+        mock_claim_enrichments.side_effect = [[(10.0, 20.0, 0), (30.0, 40.0, 2), (50.0, 60.0, 4)], [(70.0, 80.0, 0)], []]
+
+        def enrich(coord):
+            if(coord.ra.deg == 30.0 or coord.ra.deg == 50.0):
+                raise QuerySimbadError('Test')
+            elif(coord.ra.deg == 70.0):
+                raise ValueError('Test')
+
+        mock_enrich_coord.side_effect = enrich
+
+        with mock.patch('controller.importer.enricher._ENRICH_MAX_ATTEMPTS', 5):
+            stats = drain_enrichment_queue(workers=2, batch_size=3)
+
+        self.assertEqual(stats['enriched'], 1)
+        self.assertEqual(stats['retrying'], 1)
+        self.assertEqual(stats['failed'], 2)
+        self.assertEqual(mock_claim_enrichments.call_count, 3)
+        self.assertEqual(mock_claim_enrichments.call_args_list[0][0][0], 3)
+        mock_complete_enrichment.assert_called_once_with(10.0, 20.0)
+
+        # Delays double with every failure, failures that won't go away are given up on straight away
+        mock_fail_enrichment.assert_has_calls([call(30.0, 40.0, 'Test', 240.0), call(50.0, 60.0, 'Test'), call(70.0, 80.0, 'ValueError: Test')], any_order=True)
+        self.assertEqual(mock_fail_enrichment.call_count, 3)
+
 # Custom exceptions
 class TestCustomExceptions(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('controller.importer.importer._rate_limiter', importer._RateLimiter(0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     # Tests that ReportAlreadyExistsError is being raised
     @mock.patch('controller.importer.importer.add_report')
     @mock.patch('controller.importer.importer.parse_report')
@@ -481,7 +931,7 @@ class TestCustomExceptions(unittest.TestCase):
     @mock.patch('controller.importer.importer.report_exists')
     def test_report_not_found_error(self, mock_report_exists, mock_download_report):
         mock_report_exists.return_value = False
-        mock_download_report.return_value = None
+        mock_download_report.return_value = b'<p>ATel</p><p>This ATel does not appear to exist.</p>'
         with self.assertRaises(ReportNotFoundError):
             import_report(1)
 
@@ -500,28 +950,31 @@ class TestCustomExceptions(unittest.TestCase):
             import_report(1)
 
     # Tests that NetworkError is being raised
-    @mock.patch('requests_html.HTMLSession.get')
+    @mock.patch('requests.Session.get')
     def test_network_error(self, mock_get):
-        mock_get.side_effect = ConnectionError
-        with self.assertRaises(NetworkError):
-            download_report(1)
-        
-        mock_get.side_effect = HTTPError
-        with self.assertRaises(NetworkError):
-            download_report(1)
+        for mode in FETCH_MODES:
+            mock_get.side_effect = ConnectionError
+            with self.assertRaises(NetworkError):
+                download_report(1, mode)
+
+            mock_get.side_effect = HTTPError
+            with self.assertRaises(NetworkError):
+                download_report(1, mode)
     
     # Tests that DownloadFailError is being raised
-    @mock.patch('requests_html.HTML.render')
-    @mock.patch('requests_html.HTMLSession.get')
-    def test_download_fail_error(self, mock_get, mock_render):
+    @mock.patch('controller.importer.importer.HTMLSession')
+    @mock.patch('requests.Session.get')
+    def test_download_fail_error(self, mock_get, mock_html_session):
         mock_get.side_effect = None
-        mock_render.side_effect = TimeoutError
+        mock_html_session.return_value.get.return_value.html.render.side_effect = TimeoutError
         with self.assertRaises(DownloadFailError):
-            download_report(1)
+            download_report(1, 'render')
         
-        mock_get.side_effect = Exception
-        with self.assertRaises(DownloadFailError):
-            download_report(1)
+        for mode in FETCH_MODES:
+            mock_get.side_effect = Exception
+            mock_html_session.return_value.get.side_effect = Exception
+            with self.assertRaises(DownloadFailError):
+                download_report(1, mode)
 
     # Tests that MissingReportElementError is being raised
     @mock.patch('controller.importer.importer.parse_report')
@@ -32,10 +32,11 @@ from astropy.coordinates import SkyCoord
 from model.ds.search_filters import SearchFilters
 from controller.search.query_simbad import QuerySimbadError
 from datetime import datetime, timedelta
+import threading
 import unittest as ut 
-from unittest.mock import MagicMock, call
+from unittest.mock import MagicMock, call, patch
 
-from controller.search import search
+from controller.search import refresher, search
 
 
 ###################################
@@ -61,12 +62,12 @@ class TestCheckObjectUpdates(ut.TestCase):
         mock = search
         mock.qs.get_aliases = MagicMock()
         mock.db.add_aliases = MagicMock()
+        mock.db.request_object_refresh = MagicMock()
 
         # dt_now and dt_almost are less than 60 days. 
         mock.check_object_updates("object", self.dt_now) 
-        mock.qs.get_aliases.assert_not_called()
-        mock.db.add_aliases.assert_not_called()
         mock.check_object_updates("object", self.dt_almost) 
+        mock.db.request_object_refresh.assert_not_called()
         mock.qs.get_aliases.assert_not_called()
         mock.db.add_aliases.assert_not_called()
 
@@ -74,41 +75,115 @@ class TestCheckObjectUpdates(ut.TestCase):
     def test_needs_update_no_network(self):
         '''
         Case 2: The date is >= 60 days and needs updating, but there is a network error
-        preventing the SIMBAD query. 
+        preventing the SIMBAD query. The object is served stale, as SIMBAD is only 
+        queried when the object is refreshed in the background. 
         '''
         mock = search 
 
         mock.qs.get_aliases = MagicMock(side_effect=QuerySimbadError("Error")) 
         mock.db.add_aliases = MagicMock() 
+        mock.db.request_object_refresh = MagicMock()
 
-        with self.assertRaises(QuerySimbadError):
-            mock.check_object_updates("object", self.dt_old)
-            mock.check_object_updates("object", self.dt_exact)
-            mock.qs.get_aliases.assert_called_with("object")
-            mock.db.add_aliases.assert_called_with("object", [])
+        mock.check_object_updates("object", self.dt_old)
+        mock.db.request_object_refresh.assert_called_once_with("object")
+        mock.qs.get_aliases.assert_not_called()
+        mock.db.add_aliases.assert_not_called()
 
 
     def test_needs_update(self):
         '''
-        Case 3: The date is >= 60 days and needs updating. 
+        Case 3: The date is >= 60 days and needs updating. The object is queued 
+        to be refreshed in the background. 
         '''
         mock = search 
-        
-        # Case 1: SIMBAD does not find any aliases for the object. 
+        mock.qs.get_aliases = MagicMock(return_value=["alias1", "alias2", "alias3"])
         mock.db.add_aliases = MagicMock() 
-        mock.qs.get_aliases = MagicMock(return_value=[])
+        mock.db.request_object_refresh = MagicMock()
 
         mock.check_object_updates("test1", self.dt_old)
-        mock.db.add_aliases.assert_called_once_with("test1", [])
-        mock.qs.get_aliases.assert_called_with("test1")
+        mock.check_object_updates("test2", self.dt_exact)
+        mock.db.request_object_refresh.assert_has_calls([call("test1"), call("test2")])
+        mock.qs.get_aliases.assert_not_called()
+        mock.db.add_aliases.assert_not_called()
 
-        # Case 2: SIMBAD query returns alias list 
-        mock.db.add_aliases = MagicMock() 
-        mock.qs.get_aliases = MagicMock(return_value=["alias1", "alias2", "alias3"])
 
-        mock.check_object_updates("test2", self.dt_old)
-        mock.db.add_aliases.assert_called_once_with("test2", ["alias1", "alias2", "alias3"])
-        mock.qs.get_aliases.assert_called_with("test2")
+##############################
+# Testing: refresh_objects() #
+##############################
+class TestRefreshObjects(ut.TestCase):
+    def setUp(self):
+        self.dt_stale = datetime.now() - timedelta(days=UPDATE_OBJECT_DAYS, hours=2)
+        self.dt_requested = datetime.now() - timedelta(hours=1)
+        self.dt_soon = datetime.now() - timedelta(days=UPDATE_OBJECT_DAYS - 0.5)
+
+        self.db = patch.multiple(refresher.db, claim_object_refreshes=MagicMock(), add_aliases=MagicMock(),
+                                 fail_object_refresh=MagicMock())
+        self.db.start()
+        self.addCleanup(self.db.stop)
+        self.get_aliases = patch.object(refresher.qs, "get_aliases", MagicMock(return_value=["alias1"]))
+        self.get_aliases.start()
+        self.addCleanup(self.get_aliases.stop)
+
+
+    def test_refresh(self):
+        '''
+        Case 1: The claimed objects are refreshed from SIMBAD, skipping the
+        cache, until there are no more due.
+        '''
+        refresher.db.claim_object_refreshes.side_effect = [
+            [("stale", self.dt_stale, self.dt_requested), ("soon", self.dt_soon, None)],
+            []
+        ]
+
+        stats = refresher.refresh_objects(workers=2, batch_size=2)
+
+        self.assertEqual((stats["refreshed"], stats["retrying"], stats["failed"]), (2, 0, 0))
+        self.assertAlmostEqual(stats["max_lag_seconds"], 2 * 60 * 60, delta=60)
+        self.assertAlmostEqual(stats["max_wait_seconds"], 60 * 60, delta=60)
+        refresher.db.claim_object_refreshes.assert_called_with(2, (UPDATE_OBJECT_DAYS - refresher.REFRESH_AHEAD_DAYS) * 24 * 60 * 60,
+                                                               refresher._REFRESH_LEASE_SECONDS)
+        refresher.qs.get_aliases.assert_has_calls([call("stale", refresh=True), call("soon", refresh=True)], any_order=True)
+        refresher.db.add_aliases.assert_has_calls([call("stale", ["alias1"]), call("soon", ["alias1"])], any_order=True)
+        refresher.db.fail_object_refresh.assert_not_called()
+
+
+    def test_refresh_failed(self):
+        '''
+        Case 2: SIMBAD can't be reached, so the object is tried again later,
+        and an object removed since it was claimed is skipped.
+        '''
+        refresher.db.claim_object_refreshes.side_effect = [
+            [("offline", self.dt_stale, None), ("removed", self.dt_stale, None)],
+            []
+        ]
+        refresher.qs.get_aliases.side_effect = lambda name, refresh: self._fail(name)
+
+        stats = refresher.refresh_objects(workers=1)
+
+        self.assertEqual((stats["refreshed"], stats["retrying"], stats["failed"]), (0, 1, 1))
+        refresher.db.fail_object_refresh.assert_called_once_with("offline", refresher._REFRESH_RETRY_SECONDS)
+
+
+    def test_start_scheduler(self):
+        '''
+        Case 3: The scheduler is started in a daemon process, unless refreshing
+        is turned off.
+        '''
+        with patch.object(refresher, "Process") as mock_process:
+            with patch.object(refresher, "REFRESH_INTERVAL_SECONDS", 0):
+                self.assertIsNone(refresher.start_refresh_scheduler())
+            mock_process.assert_not_called()
+
+            with patch.object(refresher, "REFRESH_INTERVAL_SECONDS", 300):
+                self.assertIs(refresher.start_refresh_scheduler(), mock_process.return_value)
+            mock_process.assert_called_once_with(target=refresher.run_refresh_scheduler, daemon=True)
+            mock_process.return_value.start.assert_called_once_with()
+
+
+    def _fail(self, name):
+        if name == "offline":
+            raise QuerySimbadError("Error")
+        raise refresher.db.ObjectNotFoundError()
 
 
 class TestSearch(ut.TestCase):
@@ -321,7 +396,7 @@ class TestSearchByCoords(TestSearch):
         '''
         mock = search 
 
-        mock.qs.query_simbad_by_coords = MagicMock() 
+        mock.qs.query_simbad_region = MagicMock() 
         mock.db.object_exists = MagicMock() 
         mock.check_object_updates = MagicMock() 
         mock.qs.query_simbad_by_name = MagicMock() 
@@ -330,7 +405,7 @@ class TestSearchByCoords(TestSearch):
 
         result = mock.search_reports_by_coords(self.filters, None, None)
 
-        mock.qs.query_simbad_by_coords.assert_not_called() 
+        mock.qs.query_simbad_region.assert_not_called() 
         mock.db.object_exists.assert_not_called() 
         mock.check_object_updates.assert_not_called()
         mock.qs.query_simbad_by_name.assert_not_called() 
@@ -346,26 +421,29 @@ class TestSearchByCoords(TestSearch):
         '''
         mock = search 
 
-        mock.qs.query_simbad_by_coords = MagicMock(return_value={
-            "main_1" : ["alias_1a", "alias_1b", "alias_1c"], 
-            "main_2" : ["alias_2a", "alias_2b"]
-        })
+        object_coords = SkyCoord(10.0, 10.0, unit=('deg', 'deg'))
+        mock.qs.query_simbad_region = MagicMock(return_value=[
+            ("main_1", object_coords, ["alias_1a", "alias_1b", "alias_1c"]), 
+            ("main_2", object_coords, ["alias_2a", "alias_2b"])
+        ])
         mock.db.object_exists = MagicMock(return_value=(False, None))
         mock.check_object_updates = MagicMock() 
-        mock.qs.query_simbad_by_name = MagicMock(return_value=("name", self.sample_coords, [])) 
+        mock.qs.query_simbad_by_name = MagicMock() 
         mock.db.add_object = MagicMock()
         mock.db.find_reports_by_object = MagicMock(return_value=[self.sample_report])
         mock.db.find_reports_in_coord_range = MagicMock(return_value=[])
 
         result = mock.search_reports_by_coords(self.filters, None, self.sample_coords) 
 
-        mock.db.object_exists.assert_has_calls([call("main_1"), call("main_2")])
-        mock.qs.query_simbad_by_name.assert_has_calls([call("main_1", False), call("main_2", False)])
+        mock.db.object_exists.assert_has_calls([call("main_1"), call("main_2")], any_order=True)
+        # The coordinates of each object are returned by the region search. 
+        mock.qs.query_simbad_by_name.assert_not_called()
         mock.db.add_object.assert_has_calls([
-            call("name", self.sample_coords, ["alias_1a", "alias_1b", "alias_1c"]), 
-            call("name", self.sample_coords, ["alias_2a", "alias_2b"])])
-        mock.db.find_reports_by_object.assert_has_calls([call(self.filters, None, "main_1"), call(self.filters, None, "main_2")])
-        mock.db.find_reports_in_coord_range.assert_called()
+            call("main_1", object_coords, ["alias_1a", "alias_1b", "alias_1c"]), 
+            call("main_2", object_coords, ["alias_2a", "alias_2b"])], any_order=True)
+        mock.db.find_reports_by_object.assert_has_calls([call(self.filters, None, "main_1"), call(self.filters, None, "main_2")], any_order=True)
+        # The reports near the searched coordinates are found, not those near the objects. 
+        mock.db.find_reports_in_coord_range.assert_called_with(self.filters, None, self.sample_coords, mock.DEFAULT_RADIUS)
         mock.check_object_updates.assert_not_called() 
 
         self.assertIsNotNone(result)
@@ -377,10 +455,10 @@ class TestSearchByCoords(TestSearch):
         '''
         mock = search 
 
-        mock.qs.query_simbad_by_coords = MagicMock(return_value={
-            "main_1" : ["alias_1a", "alias_1b", "alias_1c"], 
-            "main_2" : ["alias_2a", "alias_2b"]
-        })
+        mock.qs.query_simbad_region = MagicMock(return_value=[
+            ("main_1", self.sample_coords, ["alias_1a", "alias_1b", "alias_1c"]), 
+            ("main_2", self.sample_coords, ["alias_2a", "alias_2b"])
+        ])
         mock.db.object_exists = MagicMock(return_value=(True, self.dt_now))
         mock.check_object_updates = MagicMock() 
         mock.qs.query_simbad_by_name = MagicMock() 
@@ -390,12 +468,12 @@ class TestSearchByCoords(TestSearch):
 
         result = mock.search_reports_by_coords(self.filters, None, self.sample_coords) 
 
-        mock.db.object_exists.assert_has_calls([call("main_1"), call("main_2")])
+        mock.db.object_exists.assert_has_calls([call("main_1"), call("main_2")], any_order=True)
         mock.qs.query_simbad_by_name.assert_not_called()
         mock.db.add_object.assert_not_called()
-        mock.db.find_reports_by_object.assert_has_calls([call(self.filters, None, "main_1"), call(self.filters, None, "main_2")])
+        mock.db.find_reports_by_object.assert_has_calls([call(self.filters, None, "main_1"), call(self.filters, None, "main_2")], any_order=True)
         mock.db.find_reports_in_coord_range.assert_called()
-        mock.check_object_updates.assert_has_calls([call("main_1", self.dt_now), call("main_2", self.dt_now)]) 
+        mock.check_object_updates.assert_has_calls([call("main_1", self.dt_now), call("main_2", self.dt_now)], any_order=True) 
 
         self.assertIsNotNone(result)
 
@@ -406,7 +484,7 @@ class TestSearchByCoords(TestSearch):
         '''
         mock = search 
 
-        mock.qs.query_simbad_by_coords = MagicMock(return_value=dict()) # Returns empty dict. 
+        mock.qs.query_simbad_region = MagicMock(return_value=[]) # Returns empty list. 
         mock.db.object_exists = MagicMock() 
         mock.check_object_updates = MagicMock()
         mock.db.add_object = MagicMock()
@@ -418,6 +496,205 @@ class TestSearchByCoords(TestSearch):
 
         for f in [mock.db.object_exists, mock.check_object_updates, mock.db.add_object, mock.db.find_reports_by_object]:
             f.assert_not_called() 
+        self.assertFalse(result.degraded)
+
+
+    def test_slow_region(self):
+        '''
+        Case 6: SIMBAD doesn't answer the region query before the deadline. 
+        The objects already stored in the range are searched for instead. 
+        '''
+        mock = search 
+        release = threading.Event()
+        self.addCleanup(release.set)
+        report_2 = ReportResult(2, "title", "authors", "body", datetime(2021, 1, 1))
+
+        mock.qs.query_simbad_region = MagicMock(side_effect=lambda *args: release.wait())
+        mock.db.find_objects_in_coord_range = MagicMock(return_value=["main_1"])
+        mock.db.object_exists = MagicMock() 
+        mock.db.find_reports_by_object = MagicMock(return_value=[self.sample_report])
+        mock.db.find_reports_in_coord_range = MagicMock(return_value=[report_2]) 
+
+        with patch.object(search, "SEARCH_DEADLINE_SECONDS", 0.1):
+            result = mock.search_reports_by_coords(self.filters, None, self.sample_coords) 
+
+        self.assertTrue(result.degraded)
+        self.assertCountEqual(result, [self.sample_report, report_2])
+        mock.db.find_objects_in_coord_range.assert_called_with(self.sample_coords, mock.DEFAULT_RADIUS)
+        mock.db.find_reports_by_object.assert_called_once_with(self.filters, None, "main_1")
+        mock.db.object_exists.assert_not_called()
+
+
+    def test_slow_object(self):
+        '''
+        Case 7: Updating one of the objects takes longer than the deadline, and
+        updating another fails. Both are searched for by their stored aliases,
+        while the other objects are looked up concurrently. 
+        '''
+        mock = search 
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def check_object_updates(key, last_updated):
+            if key == "slow":
+                release.wait()
+            elif key == "failed":
+                raise QuerySimbadError("Error")
+
+        mock.qs.query_simbad_region = MagicMock(return_value=[
+            (key, self.sample_coords, []) for key in ("main_1", "slow", "failed", "main_2")
+        ])
+        mock.db.object_exists = MagicMock(return_value=(True, self.dt_now))
+        mock.check_object_updates = MagicMock(side_effect=check_object_updates)
+        mock.db.find_reports_by_object = MagicMock(return_value=[self.sample_report])
+        mock.db.find_reports_in_coord_range = MagicMock(return_value=[]) 
+
+        with patch.object(search, "SEARCH_DEADLINE_SECONDS", 0.5), patch.object(search, "SEARCH_WORKERS", 2):
+            result = mock.search_reports_by_coords(self.filters, None, self.sample_coords) 
+
+        self.assertTrue(result.degraded)
+        self.assertEqual(result, [self.sample_report])
+        mock.db.find_reports_by_object.assert_has_calls([call(self.filters, None, key) for key in ("main_1", "slow", "failed", "main_2")], any_order=True)
+
+
+    def test_object_added_concurrently(self):
+        '''
+        Case 8: Another search adds one of the new objects first, and looking
+        up another fails unexpectedly. The first is searched for as normal,
+        the other by its stored aliases.
+        '''
+        mock = search
+
+        def add_object(key, coords, aliases):
+            if key == "added":
+                raise ExistingObjectError("Object exists")
+            elif key == "broken":
+                raise ValueError("Invalid object")
+
+        mock.qs.query_simbad_region = MagicMock(return_value=[
+            (key, self.sample_coords, []) for key in ("added", "broken")
+        ])
+        mock.db.object_exists = MagicMock(return_value=(False, None))
+        mock.db.add_object = MagicMock(side_effect=add_object)
+        mock.db.find_reports_by_object = MagicMock(return_value=[self.sample_report])
+        mock.db.find_reports_in_coord_range = MagicMock(return_value=[])
+
+        result = mock.search_reports_by_coords(self.filters, None, self.sample_coords)
+
+        self.assertTrue(result.degraded)
+        self.assertEqual(result, [self.sample_report])
+        mock.db.find_reports_by_object.assert_has_calls([call(self.filters, None, "added"), call(self.filters, None, "broken")], any_order=True)
+
+        # Without the failure the search is complete.
+        mock.qs.query_simbad_region = MagicMock(return_value=[("added", self.sample_coords, [])])
+        self.assertFalse(mock.search_reports_by_coords(self.filters, None, self.sample_coords).degraded)
+
+
+
+#############################
+# Testing: _merge_reports() #
+#############################
+class TestMergeReports(TestSearch):
+    def test_merge(self):
+        '''
+        Case 1: Reports are deduplicated by ATel number, keeping the first
+        occurrence and insertion order. 
+        '''
+        first = ReportResult(1001, "Title", "Authors", "Body", self.dt_old, [1000])
+        duplicate = ReportResult(1001, "Title", "Authors", "Body", self.dt_old, [1000])
+        other = ReportResult(999, "Other", "Authors", "Body", self.dt_now, [])
+
+        merged = dict()
+        search._merge_reports(merged, [self.sample_report, first])
+        search._merge_reports(merged, [duplicate, other, self.sample_report])
+
+        self.assertEqual(list(merged.values()), [self.sample_report, first, other])
+        self.assertIs(merged[1001], first)
+
+
+    def test_merge_many(self):
+        '''
+        Case 2: 10k results, half of them duplicates, are deduplicated to 5k 
+        results, keeping the first occurrence of each. 
+        '''
+        reports = [ReportResult(i % 5000 + 1, "Title", "Authors", f"Body {i}", self.dt_old, [1, 2, 3])
+                   for i in range(10000)]
+
+        merged = dict()
+        search._merge_reports(merged, reports)
+
+        self.assertEqual(len(merged), 5000)
+        self.assertEqual(list(merged.values()), reports[:5000])
+        self.assertIs(merged[1], reports[0])
+
+
+###################################
+# Testing: paging search results  #
+###################################
+class TestSearchPaging(TestSearch):
+    def test_page_by_name(self):
+        '''
+        Case 1: A page of a name search. Each finder is asked for its own page, 
+        and the merged results are ordered newest first and trimmed to the limit. 
+        '''
+        newest = ReportResult(1003, "Title", "Authors", "Body", self.dt_now, [])
+        tied = ReportResult(1002, "Title", "Authors", "Body", self.dt_exact, [])
+        tied_lower = ReportResult(1001, "Title", "Authors", "Body", self.dt_exact, [])
+        cursor = (self.dt_now + timedelta(days=1), 2000)
+
+        mock = search 
+        mock.db.object_exists = MagicMock(return_value=(True, self.dt_now))
+        mock.check_object_updates = MagicMock()
+        mock.db.get_object_coords = MagicMock(return_value=self.sample_coords)
+        mock.db.find_reports_by_object = MagicMock(return_value=[tied_lower, self.sample_report])
+        mock.db.find_reports_in_coord_range = MagicMock(return_value=[newest, tied])
+
+        result = mock.search_reports_by_name(self.filters, None, "name", 3, cursor)
+
+        mock.db.find_reports_by_object.assert_called_with(self.filters, None, "name", limit=3, after=cursor)
+        mock.db.find_reports_in_coord_range.assert_called_with(self.filters, None, self.sample_coords, DEFAULT_RADIUS, limit=3, after=cursor)
+        self.assertEqual(result, [newest, tied, tied_lower])
+
+
+    def test_page_by_coords(self):
+        '''
+        Case 2: A page of a coordinate search. 
+        '''
+        mock = search 
+        mock.qs.query_simbad_region = MagicMock(return_value=[("main_1", self.sample_coords, [])])
+        mock.db.object_exists = MagicMock(return_value=(True, self.dt_now))
+        mock.check_object_updates = MagicMock()
+        mock.db.find_reports_by_object = MagicMock(return_value=[self.sample_report])
+        mock.db.find_reports_in_coord_range = MagicMock(return_value=[])
+
+        result = mock.search_reports_by_coords(self.filters, None, self.sample_coords, 5.0, 1)
+
+        mock.db.find_reports_by_object.assert_called_with(self.filters, None, "main_1", limit=1)
+        mock.db.find_reports_in_coord_range.assert_called_with(self.filters, None, self.sample_coords, 5.0, limit=1)
+        self.assertEqual(result, [self.sample_report])
+
+
+    def test_count(self):
+        '''
+        Case 3: Total estimates count reports linked to the object or the
+        stored objects in the region, and their coordinates. 
+        '''
+        mock = search 
+        mock.db.count_reports = MagicMock(return_value=12)
+        mock.db.get_object_coords = MagicMock(return_value=self.sample_coords)
+        mock.db.find_objects_in_coord_range = MagicMock(return_value=["main_1"])
+
+        self.assertEqual(mock.count_reports_by_name(self.filters, None, "name"), 12)
+        mock.db.count_reports.assert_called_with(self.filters, None, ["name"], self.sample_coords, DEFAULT_RADIUS)
+
+        self.assertEqual(mock.count_reports_by_coords(self.filters, None, self.sample_coords, 5.0), 12)
+        mock.db.find_objects_in_coord_range.assert_called_with(self.sample_coords, 5.0)
+        mock.db.count_reports.assert_called_with(self.filters, None, ["main_1"], self.sample_coords, 5.0)
+
+        # Unknown objects have no reports. 
+        mock.db.get_object_coords = MagicMock(side_effect=mock.db.ObjectNotFoundError)
+        self.assertEqual(mock.count_reports_by_name(self.filters, None, "unknown"), 0)
+
 
 
 if __name__ == '__main__':
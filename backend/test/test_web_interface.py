@@ -38,6 +38,8 @@ from view.web_interface import parse_radius
 from view.web_interface import valid_dec
 from view.web_interface import valid_ra
 from view.web_interface import parse_date_input, parse_search_coords
+from view.web_interface import parse_limit, parse_cursor, format_cursor
+from view.web_interface import parse_fields, format_report
 from model.ds.search_filters import KeywordMode
 from enum import Enum
 import re
@@ -409,6 +411,59 @@ class TestBasicParse(ut.TestCase):
         self.assertNotEqual(term_in, None)
 
 
+class TestPaging(ut.TestCase):
+    def test_parse_limit(self):
+        self.assertEqual(parse_limit(None), None)
+        self.assertEqual(parse_limit(""), None)
+        self.assertEqual(parse_limit(50), 50)
+        self.assertEqual(parse_limit("50"), 50)
+
+        with self.assertRaises(ValueError):
+            parse_limit(0)
+        with self.assertRaises(ValueError):
+            parse_limit(100000)
+        with self.assertRaises(ValueError):
+            parse_limit("fifty")
+
+    def test_cursor(self):
+        report = ReportResult(14000, "Title", "Authors", "Body", datetime(2021, 8, 17, 12, 30, 5))
+        cursor = format_cursor(report)
+        self.assertEqual(cursor, "2021-08-17T12:30:05_14000")
+        self.assertEqual(parse_cursor(cursor), (datetime(2021, 8, 17, 12, 30, 5), 14000))
+
+        self.assertEqual(parse_cursor(""), None)
+        self.assertEqual(parse_cursor(None), None)
+        with self.assertRaises(ValueError):
+            parse_cursor("2021-08-17_abc")
+        with self.assertRaises(ValueError):
+            parse_cursor("14000")
+
+
+class TestProjection(ut.TestCase):
+    def test_parse_fields(self):
+        self.assertTrue(parse_fields(None))
+        self.assertTrue(parse_fields(""))
+        self.assertTrue(parse_fields("full"))
+        self.assertFalse(parse_fields("summary"))
+
+        with self.assertRaises(ValueError):
+            parse_fields("bodies")
+
+    def test_format_report(self):
+        report = ReportResult(14000, "Title", "Authors", "Body", datetime(2021, 8, 17), [13999])
+        self.assertDictEqual(format_report(report), {
+            "atel_num": 14000,
+            "title": "Title",
+            "authors": "Authors",
+            "body": "Body",
+            "submission_date": "2021-08-17 00:00:00",
+            "referenced_reports": [13999],
+        })
+
+        report.body = None
+        self.assertNotIn("body", format_report(report))
+
+
         
 
 
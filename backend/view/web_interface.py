@@ -28,7 +28,8 @@ from typing import Tuple
 from model.ds.search_filters import KeywordMode
 from enum import Enum
 import re
-from model.constants import FIXED_KEYWORDS
+from model.constants import FIXED_KEYWORDS, MAX_PAGE_SIZE
+from model.ds.report_types import ReportResult
 
 class InvalidKeywordError(Exception):
     pass
@@ -403,4 +404,104 @@ def parse_term(term_in: str) -> str:
     if term_in == "":
         term_in = None
 
-    return term_in
\ No newline at end of file
+    return term_in
+
+
+def parse_limit(limit_in: int) -> int:
+    '''Validates and parses the number of reports requested per page of search results.
+
+    Args:
+        limit_in (int): The page size, or None/"" to return all results in one page.
+
+    Returns:
+        int: The page size, or None if not given.
+
+    '''
+    if limit_in == "" or limit_in == None:
+        return None
+
+    try:
+        limit = int(limit_in)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid page size.")
+
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValueError(f"Page size is out of range (1 to {MAX_PAGE_SIZE})")
+
+    return limit
+
+
+def parse_cursor(cursor_in: str) -> Tuple[datetime, int]:
+    '''Parses a cursor returned with a previous page of search results, see format_cursor().
+
+    Args:
+        cursor_in (str): The cursor, or None/"" for the first page.
+
+    Returns:
+        Tuple[datetime, int]: The submission date and ATel number of the last report of the previous page, or None if not given.
+
+    '''
+    if cursor_in == "" or cursor_in == None:
+        return None
+
+    try:
+        date_string, atel_num = str(cursor_in).rsplit("_", 1)
+        return datetime.strptime(date_string, "%Y-%m-%dT%H:%M:%S"), int(atel_num)
+    except ValueError:
+        raise ValueError("Invalid page cursor.")
+
+
+def format_cursor(report: ReportResult) -> str:
+    '''Creates the cursor to request the page of search results following the given report.
+
+    Args:
+        report (ReportResult): The last report of the current page.
+
+    Returns:
+        str: The cursor.
+
+    '''
+    return f"{report.submission_date.strftime('%Y-%m-%dT%H:%M:%S')}_{report.atel_num}"
+
+
+def parse_fields(fields_in: str) -> bool:
+    '''Parses which fields of each report to return with search results.
+
+    Args:
+        fields_in (str): "full" for complete reports, or "summary" to omit the body of each report. None/"" is the same as "full".
+
+    Returns:
+        bool: A boolean representing whether report bodies should be included.
+
+    '''
+    if fields_in == "" or fields_in == None or fields_in == "full":
+        return True
+    elif fields_in == "summary":
+        return False
+    else:
+        raise ValueError("Fields is not full or summary")
+
+
+def format_report(report: ReportResult) -> dict:
+    '''Converts a report into a dictionary to return as JSON. The body is omitted if it was not retrieved.
+
+    Args:
+        report (ReportResult): The report.
+
+    Returns:
+        dict: The report's fields.
+
+    '''
+    report_dict = {
+        "atel_num": report.atel_num,
+        "title": report.title,
+        "authors": report.authors,
+        "body": report.body,
+        "submission_date": str(report.submission_date),
+        "referenced_reports": report.referenced_reports,
+    }
+
+    if report.body is None:
+        del report_dict["body"]
+
+    return report_dict